@@ -0,0 +1,71 @@
+from typing import Iterator
+
+from dv_export_model import DVExportDataType, ColumnInfo
+from constants import DIFF_ACTION_COLUMN_NAME, DIFF_ACTION_INSERT
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+
+def check_pyarrow_installed():
+    if pa is None:
+        raise Exception("The pyarrow parse engine requires pyarrow. Install it with `pip install pyarrow`")
+
+
+def get_arrow_data_type(data_type: DVExportDataType) -> 'pa.DataType':
+    if data_type == DVExportDataType.Date or data_type == DVExportDataType.Integer:
+        return pa.int64()
+    elif data_type == DVExportDataType.String:
+        return pa.string()
+    elif data_type == DVExportDataType.Number:
+        return pa.float64()
+    elif data_type == DVExportDataType.Boolean:
+        return pa.bool_()
+    else:
+        raise NotImplementedError(f"data_type={data_type} has no corresponding Arrow data type")
+
+
+def convert_data_types_to_arrow_schema(column_infos: list[ColumnInfo]) -> 'pa.Schema':
+    return pa.schema([pa.field(column.name, get_arrow_data_type(column.data_type)) for column in column_infos])
+
+
+def read_record_batches(file_path: str,
+                        column_infos: list[ColumnInfo],
+                        streaming: bool,
+                        only_inserts: bool = True) -> Iterator['pa.RecordBatch']:
+    """
+    Read a part file with pyarrow's CSV reader and yield its rows as record batches.
+
+    Empty string values stay empty strings rather than becoming null, which matches how the pandas parse path
+    fills string columns.
+
+    :param file_path: Path to the part file
+    :param column_infos: Columns in the part file
+    :param streaming: If ``True``, read the file one block at a time so memory is bounded by the block size.
+        Otherwise, read the whole file with all available cores.
+    :param only_inserts: If ``True``, yield only the rows to insert and drop the ``_DiffAction_`` column.
+        Otherwise, yield every row with its ``_DiffAction_``.
+    """
+    schema = convert_data_types_to_arrow_schema(column_infos)
+    column_types = {field.name: field.type for field in schema}
+    column_types[DIFF_ACTION_COLUMN_NAME] = pa.string()
+    convert_options = pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=False)
+    read_options = pa_csv.ReadOptions(use_threads=True)
+
+    if streaming:
+        batches = pa_csv.open_csv(file_path, read_options=read_options, convert_options=convert_options)
+    else:
+        batches = pa_csv.read_csv(file_path, read_options=read_options, convert_options=convert_options).to_batches()
+
+    for batch in batches:
+        if only_inserts:
+            batch = batch.filter(pc.equal(batch.column(DIFF_ACTION_COLUMN_NAME), DIFF_ACTION_INSERT))
+            batch = batch.select(schema.names)
+        else:
+            batch = batch.select(schema.names + [DIFF_ACTION_COLUMN_NAME])
+        if batch.num_rows != 0:
+            yield batch
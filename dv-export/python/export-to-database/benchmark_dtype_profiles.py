@@ -0,0 +1,101 @@
+"""
+Compare the memory used to parse a part file with each DataFrame dtype profile.
+
+Generates a synthetic part file shaped like an HR export, with a unique key, low-cardinality strings such as
+location and job code, a high-cardinality name, and numeric columns. Each profile parses it in a fresh process so
+that peak RSS is measured independently. Requires pandas and pyarrow, and a Unix-like OS for peak RSS.
+
+    python benchmark_dtype_profiles.py --rows 1000000
+"""
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from constants import DTYPE_PROFILE_DEFAULT, DTYPE_PROFILE_COMPACT, DIFF_ACTION_COLUMN_NAME
+from dv_export_model import ColumnInfo, DVExportDataType
+
+COLUMN_INFOS = [
+    ColumnInfo('EmployeeID', DVExportDataType.String, False, True),
+    ColumnInfo('Validity_Start', DVExportDataType.Date, False, True),
+    ColumnInfo('Full_Name', DVExportDataType.String, True, False),
+    ColumnInfo('Location', DVExportDataType.String, True, False),
+    ColumnInfo('Gender', DVExportDataType.String, True, False),
+    ColumnInfo('Job_Code', DVExportDataType.String, True, False),
+    ColumnInfo('Department', DVExportDataType.String, True, False),
+    ColumnInfo('Employment_Type', DVExportDataType.String, True, False),
+    ColumnInfo('Age', DVExportDataType.Integer, True, False),
+    ColumnInfo('Salary', DVExportDataType.Number, True, False),
+    ColumnInfo('IsManager', DVExportDataType.Boolean, True, False),
+]
+
+
+def write_part_file(file_path: str, num_rows: int):
+    rng = random.Random(42)
+    locations = [f"Location {i}" for i in range(50)] + ['']
+    job_codes = [f"JOB-{i:04d}" for i in range(300)]
+    departments = [f"Department {i}" for i in range(40)]
+    with open(file_path, 'w') as f:
+        f.write(",".join([column.name for column in COLUMN_INFOS] + [DIFF_ACTION_COLUMN_NAME]) + "\n")
+        for i in range(num_rows):
+            f.write(f"E{i:08d},{1600000000000 + i},Person Number {i},{rng.choice(locations)},"
+                    f"{rng.choice(['Female', 'Male', 'Other'])},{rng.choice(job_codes)},{rng.choice(departments)},"
+                    f"{rng.choice(['Full-Time', 'Part-Time', 'Contractor'])},{rng.randint(18, 70)},"
+                    f"{rng.uniform(30000, 250000):.2f},{rng.choice(['true', 'false'])},+\n")
+
+
+def parse(file_path: str, dtype_profile: str) -> dict:
+    """Parse a part file with a dtype profile in this process and return its memory use."""
+    from pandas_csv import read_data_frames
+
+    baseline_rss = _peak_rss_bytes()
+    start = time.perf_counter()
+    dfs = list(read_data_frames(file_path, COLUMN_INFOS, None, dtype_profile=dtype_profile))
+    return {
+        'profile': dtype_profile,
+        'seconds': round(time.perf_counter() - start, 2),
+        'peak_rss_mb': round(_peak_rss_bytes() / (1024 * 1024), 1),
+        'parse_rss_mb': round((_peak_rss_bytes() - baseline_rss) / (1024 * 1024), 1),
+        'dataframe_mb': round(sum(df.memory_usage(deep=True).sum() for df in dfs) / (1024 * 1024), 1),
+        'dtypes': {name: str(dtype) for name, dtype in dfs[0].dtypes.items()},
+    }
+
+
+def _peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare memory use of the DataFrame dtype profiles.')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of rows in the generated part file.')
+    parser.add_argument('--parse', help=argparse.SUPPRESS)
+    parser.add_argument('--profile', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.parse:
+        print(json.dumps(parse(args.parse, args.profile)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = str(Path(tmp_dir) / 'part.csv')
+        write_part_file(file_path, args.rows)
+        print(f"Generated {args.rows} rows ({Path(file_path).stat().st_size / (1024 * 1024):.1f} MB)")
+        for dtype_profile in (DTYPE_PROFILE_DEFAULT, DTYPE_PROFILE_COMPACT):
+            output = subprocess.run([sys.executable, __file__, '--parse', file_path, '--profile', dtype_profile],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{dtype_profile:>8}: peak RSS {result['peak_rss_mb']} MB, "
+                  f"parse RSS {result['parse_rss_mb']} MB, DataFrame {result['dataframe_mb']} MB, "
+                  f"{result['seconds']} s")
+            print(f"{'':>10}dtypes={result['dtypes']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import csv
+import io
+import logging
+import os
+import tempfile
+from abc import ABC, abstractmethod
+
+import pandas as pd
+from sqlalchemy import Connection, Table, insert
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+logger = logging.getLogger("bulk_loader")
+
+
+class BulkLoader(ABC):
+    """
+    Strategy for writing rows from a ``DataFrame`` into an existing table. The ``DataFrame`` columns must be a subset
+    of the table's columns. Loaders run inside the caller's transaction, so the caller decides when to commit.
+    """
+
+    @abstractmethod
+    def load(self, conn: Connection, alchemy_table: Table, df: pd.DataFrame):
+        pass
+
+    def load_record_batch(self, conn: Connection, alchemy_table: Table, batch: 'pa.RecordBatch'):
+        """
+        Write rows from an Arrow ``RecordBatch``. Loaders that can consume Arrow data directly override this;
+        the default converts the batch to a ``DataFrame`` with nullable dtypes and calls ``load``.
+        """
+        self.load(conn, alchemy_table, batch.to_pandas(types_mapper=_ARROW_TO_PANDAS_NULLABLE_DTYPES.get))
+
+
+class InsertBulkLoader(BulkLoader):
+    """Generic fallback which works on every SQLAlchemy dialect by executing an ``INSERT`` per row."""
+
+    def load(self, conn: Connection, alchemy_table: Table, df: pd.DataFrame):
+        conn.execute(insert(alchemy_table), df.to_dict('records'))
+
+
+class SQLiteBulkLoader(BulkLoader):
+    """
+    Passes rows to the driver's ``executemany`` as plain tuples, which skips building a dictionary per row and
+    compiling the statement through SQLAlchemy for every batch.
+    """
+
+    def load(self, conn: Connection, alchemy_table: Table, df: pd.DataFrame):
+        stmt = self._insert_stmt(conn, alchemy_table, list(df.columns))
+        conn.exec_driver_sql(stmt, list(_to_python_rows(df)))
+
+    def load_record_batch(self, conn: Connection, alchemy_table: Table, batch: 'pa.RecordBatch'):
+        stmt = self._insert_stmt(conn, alchemy_table, batch.schema.names)
+        conn.exec_driver_sql(stmt, list(zip(*(column.to_pylist() for column in batch.columns))))
+
+    @staticmethod
+    def _insert_stmt(conn: Connection, alchemy_table: Table, column_names: list[str]) -> str:
+        preparer = conn.dialect.identifier_preparer
+        column_list = ", ".join(preparer.quote(column) for column in column_names)
+        placeholders = ", ".join("?" for _ in column_names)
+        return f"INSERT INTO {preparer.format_table(alchemy_table)} ({column_list}) VALUES ({placeholders})"
+
+
+class PostgreSQLCopyBulkLoader(BulkLoader):
+    """Streams rows to the server with ``COPY ... FROM STDIN``. Supports both ``psycopg2`` and ``psycopg`` (3)."""
+
+    def load(self, conn: Connection, alchemy_table: Table, df: pd.DataFrame):
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False, na_rep='\\N')
+        buffer.seek(0)
+        self._copy(conn, alchemy_table, list(df.columns), buffer, "NULL '\\N'")
+
+    def load_record_batch(self, conn: Connection, alchemy_table: Table, batch: 'pa.RecordBatch'):
+        # Arrow quotes every string and leaves nulls unquoted and empty, which is COPY's default CSV null
+        buffer = io.BytesIO()
+        pa_csv.write_csv(batch, buffer, pa_csv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        self._copy(conn, alchemy_table, batch.schema.names, buffer, "ENCODING 'UTF8'")
+
+    @staticmethod
+    def _copy(conn: Connection, alchemy_table: Table, column_names: list[str], buffer, options: str):
+        preparer = conn.dialect.identifier_preparer
+        column_list = ", ".join(preparer.quote(column) for column in column_names)
+        stmt = (f"COPY {preparer.format_table(alchemy_table)} ({column_list}) "
+                f"FROM STDIN WITH (FORMAT csv, {options})")
+        cursor = conn.connection.cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):
+                cursor.copy_expert(stmt, buffer)
+            else:
+                with cursor.copy(stmt) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+
+class MySQLLoadDataBulkLoader(BulkLoader):
+    """
+    Writes rows to a temporary file and loads it with ``LOAD DATA LOCAL INFILE``. The server must allow
+    ``local_infile`` and the client must enable it, for example with ``?local_infile=1`` in the ``DB_URL``.
+    """
+
+    def load(self, conn: Connection, alchemy_table: Table, df: pd.DataFrame):
+        # MySQL has no boolean literal in LOAD DATA, so booleans are written as 0/1
+        bool_columns = [column for column in df.columns if df[column].dtype == 'boolean']
+        if bool_columns:
+            df = df.astype({column: 'Int8' for column in bool_columns})
+
+        preparer = conn.dialect.identifier_preparer
+        column_list = ", ".join(preparer.quote(column) for column in df.columns)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False) as f:
+            df.to_csv(f, index=False, header=False, na_rep='NULL', quoting=csv.QUOTE_MINIMAL)
+            tmp_path = f.name
+        try:
+            file_name = tmp_path.replace('\\', '/').replace("'", "\\'")
+            stmt = (f"LOAD DATA LOCAL INFILE '{file_name}' INTO TABLE {preparer.format_table(alchemy_table)} "
+                    f"CHARACTER SET utf8mb4 "
+                    f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                    f"LINES TERMINATED BY '\\n' ({column_list})")
+            conn.exec_driver_sql(stmt)
+        finally:
+            os.remove(tmp_path)
+
+
+_ARROW_TO_PANDAS_NULLABLE_DTYPES = {
+    pa.int64(): pd.Int64Dtype(),
+    pa.bool_(): pd.BooleanDtype(),
+} if pa is not None else {}
+
+_NATIVE_BULK_LOADERS = {
+    'sqlite': SQLiteBulkLoader,
+    'postgresql': PostgreSQLCopyBulkLoader,
+    'mysql': MySQLLoadDataBulkLoader,
+    'mariadb': MySQLLoadDataBulkLoader,
+}
+
+
+def get_bulk_loader(dialect_name: str, native: bool = True) -> BulkLoader:
+    """
+    Return the fastest ``BulkLoader`` for a SQLAlchemy dialect, or the generic ``InsertBulkLoader`` if ``native`` is
+    ``False`` or the dialect has no native loader.
+    """
+    loader_class = _NATIVE_BULK_LOADERS.get(dialect_name) if native else None
+    if loader_class is None:
+        loader_class = InsertBulkLoader
+    logger.info(f"Using {loader_class.__name__} for dialect={dialect_name}")
+    return loader_class()
+
+
+def _to_python_rows(df: pd.DataFrame):
+    """Return an iterator over rows as tuples of Python values, with missing values as ``None``."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
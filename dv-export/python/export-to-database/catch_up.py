@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from visier_platform_sdk import DataVersionExportDTO
+
+from dv_export import DVExport
+
+logger = logging.getLogger("catch_up")
+
+
+class CatchUp:
+    """
+    Brings a data store up to date with a range of data versions by loading a chain of delta exports, each computed
+    from the previous data version. The export job for the next data version is scheduled and polled in the
+    background while the current one is loaded, so loading does not wait on export jobs after the first one.
+
+    Progress is recorded in a JSON state file after every data version, together with the export UUIDs of jobs
+    which already finished. An interrupted catch-up resumes after the last loaded data version and reuses those
+    exports instead of scheduling them again. The state file keeps the progress of each data store separately, so
+    that several data stores can be caught up with the same state file.
+    """
+
+    def __init__(self, dv_export: DVExport, state_file_path: str, target: str):
+        """
+        :param dv_export: ``DVExport`` used to schedule and load each export
+        :param state_file_path: Path of the JSON file which records catch-up progress
+        :param target: Identifies the data store being caught up in the state file, such as its URL without its
+            password
+        """
+        self.dv_export = dv_export
+        self.state_file_path = Path(state_file_path)
+        self.target = target
+        # The state is updated both by the loading thread and by the thread which schedules the next export
+        self._state_lock = threading.Lock()
+
+    def run(self, from_data_version: int, to_data_version: int):
+        """
+        Load every available data version after ``from_data_version`` up to and including ``to_data_version``.
+        ``from_data_version`` must already be loaded into the data store.
+        """
+        state = self._read_state()
+        last_loaded = state.get('last_loaded_data_version')
+        if last_loaded is not None and from_data_version <= last_loaded <= to_data_version:
+            logger.info(f"Resuming catch-up after data_version={last_loaded}")
+            from_data_version = last_loaded
+        else:
+            state = {'last_loaded_data_version': from_data_version, 'exports': {}}
+
+        data_versions = [data_version for data_version in self.dv_export.get_available_data_version_numbers()
+                         if from_data_version < data_version <= to_data_version]
+        if len(data_versions) == 0:
+            logger.info(f"Data versions up to {to_data_version} are already loaded")
+            return
+        steps = list(zip(data_versions, [from_data_version] + data_versions[:-1]))
+        logger.info(f"Catching up through {len(steps)} data versions: {data_versions}")
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='dv-catch-up') as executor:
+            next_export = executor.submit(self._get_export, state, *steps[0])
+            for i, (data_version, base_data_version) in enumerate(steps):
+                export_metadata = next_export.result()
+                if i + 1 < len(steps):
+                    next_export = executor.submit(self._get_export, state, *steps[i + 1])
+
+                logger.info(f"Loading data_version={data_version} from base_data_version={base_data_version} "
+                            f"({i + 1} out of {len(steps)}) with export_uuid={export_metadata.uuid}")
+                self.dv_export.process_metadata(export_metadata)
+
+                with self._state_lock:
+                    state['last_loaded_data_version'] = data_version
+                    state['exports'].pop(str(data_version), None)
+                    self._write_state(state)
+        logger.info(f"Caught up to data_version={data_versions[-1]}")
+
+    def _get_export(self, state: dict, data_version: int, base_data_version: int) -> DataVersionExportDTO:
+        """Reuse the export for a data version recorded by an earlier run, or schedule a new one."""
+        with self._state_lock:
+            export_uuid: Optional[str] = state['exports'].get(str(data_version))
+        if export_uuid is not None:
+            logger.info(f"Reusing export_uuid={export_uuid} for data_version={data_version}")
+            return self.dv_export.get_export_metadata(export_uuid)
+
+        export_metadata = self.dv_export.generate_data_version_export(data_version, base_data_version)
+        with self._state_lock:
+            state['exports'][str(data_version)] = export_metadata.uuid
+            self._write_state(state)
+        return export_metadata
+
+    def _read_state(self) -> dict:
+        return self._read_state_file().get(self.target, {})
+
+    def _write_state(self, state: dict):
+        # The progress of other data stores is kept as it is
+        states = self._read_state_file()
+        states[self.target] = state
+        tmp_path = self.state_file_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(states, f, indent=2)
+        os.replace(tmp_path, self.state_file_path)
+
+    def _read_state_file(self) -> dict:
+        if not self.state_file_path.exists():
+            return {}
+        with open(self.state_file_path) as f:
+            return json.load(f)
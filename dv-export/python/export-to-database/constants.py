@@ -1,16 +1,67 @@
 # Script related constants
 JOB_STATUS_NUM_POLLS = 'JOB_STATUS_NUM_POLLS'
 JOB_STATUS_POLL_INTERVAL_SECONDS = 'JOB_STATUS_POLL_INTERVAL_SECONDS'
+JOB_STATUS_INITIAL_POLL_INTERVAL_SECONDS = 'JOB_STATUS_INITIAL_POLL_INTERVAL_SECONDS'
 DELETE_BASE_DOWNLOAD_DIRECTORY_AFTER_EXPORT = 'DELETE_BASE_DOWNLOAD_DIRECTORY_AFTER_EXPORT'
 BASE_DOWNLOAD_DIRECTORY = 'BASE_DOWNLOAD_DIRECTORY'
+CATCH_UP_STATE_FILE = 'CATCH_UP_STATE_FILE'
+TELEMETRY_JSONL_FILE = 'TELEMETRY_JSONL_FILE'
+TELEMETRY_PROMETHEUS_FILE = 'TELEMETRY_PROMETHEUS_FILE'
+DOWNLOAD_CACHE_DIRECTORY = 'DOWNLOAD_CACHE_DIRECTORY'
+DOWNLOAD_CACHE_MAX_BYTES = 'DOWNLOAD_CACHE_MAX_BYTES'
+DOWNLOAD_CONCURRENCY = 'DOWNLOAD_CONCURRENCY'
+STREAM_DOWNLOADS = 'STREAM_DOWNLOADS'
+DOWNLOAD_CHUNK_SIZE_BYTES = 'DOWNLOAD_CHUNK_SIZE_BYTES'
+STAGING_COMPRESSION = 'STAGING_COMPRESSION'
+PIPELINE_QUEUE_SIZE = 'PIPELINE_QUEUE_SIZE'
+TABLE_CONCURRENCY = 'TABLE_CONCURRENCY'
+APPLY_DELTAS = 'APPLY_DELTAS'
+EVOLVE_SCHEMAS = 'EVOLVE_SCHEMAS'
+RESUME_FROM_CHECKPOINTS = 'RESUME_FROM_CHECKPOINTS'
+CSV_CHUNK_SIZE_ROWS = 'CSV_CHUNK_SIZE_ROWS'
+NATIVE_BULK_LOAD = 'NATIVE_BULK_LOAD'
+PARSE_ENGINE = 'PARSE_ENGINE'
+PARSE_WORKERS = 'PARSE_WORKERS'
+DTYPE_PROFILE = 'DTYPE_PROFILE'
+DEFER_INDEXES = 'DEFER_INDEXES'
+INDEX_BUILD_WORKERS = 'INDEX_BUILD_WORKERS'
+SHADOW_LOAD = 'SHADOW_LOAD'
+MEMORY_BUDGET_BYTES = 'MEMORY_BUDGET_BYTES'
+DELETE_LOADED_FILES = 'DELETE_LOADED_FILES'
+MIN_FREE_DISK_BYTES = 'MIN_FREE_DISK_BYTES'
+SCHEMA_CACHE_FILE = 'SCHEMA_CACHE_FILE'
 DB_URL = 'DB_URL'
+PARQUET_COMPRESSION = 'PARQUET_COMPRESSION'
 
 # Export metadata related constants
 DIFF_ACTION_COLUMN_NAME = '_DiffAction_'
 DIFF_ACTION_INSERT = '+'
+DIFF_ACTION_DELETE = '-'
 
 # Pandas DataFrame Dtype constants (see https://pandas.pydata.org/pandas-docs/stable/user_guide/basics.html#dtypes)
 PANDAS_DF_NULLABLE_INTEGER_INT64_DTYPE = 'Int64'
 PANDAS_DF_MIXED_DTYPE = 'object'
 PANDAS_DF_FLOAT64_DTYPE = 'float64'
 PANDAS_DF_BOOLEAN_DTYPE = 'boolean'
+PANDAS_DF_ARROW_STRING_DTYPE = 'string[pyarrow]'
+PANDAS_DF_CATEGORY_DTYPE = 'category'
+
+# Values pandas parses as missing by default (see https://pandas.pydata.org/docs/reference/api/pandas.read_csv.html)
+PANDAS_DEFAULT_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                            '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# DataFrame dtype profiles used by the pandas parse engine
+DTYPE_PROFILE_DEFAULT = 'default'
+DTYPE_PROFILE_COMPACT = 'compact'
+
+# DB_URL prefix which selects the Parquet data store instead of a SQLAlchemy database
+PARQUET_URL_PREFIX = 'parquet://'
+
+# Compression of downloaded part files in BASE_DOWNLOAD_DIRECTORY
+STAGING_COMPRESSION_NONE = 'none'
+STAGING_COMPRESSION_GZIP = 'gzip'
+STAGING_COMPRESSION_ZSTD = 'zstd'
+
+# Part file parse engines
+PARSE_ENGINE_PANDAS = 'pandas'
+PARSE_ENGINE_PYARROW = 'pyarrow'
@@ -1,41 +1,56 @@
+import hashlib
 import logging
+import os
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
-import pandas as pd
+from concurrent.futures import Future
+from contextlib import closing
+from typing import Iterable, Iterator, Optional
 
-from sqlalchemy import (Column, Table, create_engine, MetaData, Integer,
-                        String, Numeric, BigInteger, Boolean, insert, text)
-from dv_export_model import DVExportDataType, ColumnInfo, TableInfo
+from sqlalchemy import (Column, Connection, Table, create_engine, MetaData, Integer,
+                        String, Numeric, BigInteger, Boolean, DateTime, and_, delete, exists, func, insert,
+                        select, text, update, inspect)
+from arrow_csv import check_pyarrow_installed, read_record_batches
+from bulk_loader import BulkLoader, get_bulk_loader
+from memory_budget import MemoryBudget, estimate_parse_memory, reserve_memory
+from pandas_csv import read_data_frames
+from parse_pool import ParsePool, read_arrow_ipc_file
+from disk_guard import DiskGuard
+from dv_export_model import DVExportDataType, ColumnInfo, TableInfo, FileCheckpoint
+from schema_cache import SchemaCache
+from telemetry import Telemetry
 from constants import *
 
 logger = logging.getLogger("data_store")
 
-
-def convert_data_types_to_df_dtype_dict(column_infos) -> dict:
-    column_name_to_dtype = {}
-    for column in column_infos:
-        dtype = ''
-        if column.data_type == DVExportDataType.Date or column.data_type == DVExportDataType.Integer:
-            dtype = PANDAS_DF_NULLABLE_INTEGER_INT64_DTYPE
-        elif column.data_type == DVExportDataType.String:
-            dtype = PANDAS_DF_MIXED_DTYPE
-        elif column.data_type == DVExportDataType.Number:
-            dtype = PANDAS_DF_FLOAT64_DTYPE
-        elif column.data_type == DVExportDataType.Boolean:
-            dtype = PANDAS_DF_BOOLEAN_DTYPE
-        column_name_to_dtype[column.name] = dtype
-    return column_name_to_dtype
-
-
 class DataStore(ABC):
 
+    def begin_export(self, export_uuid: str, data_version_number: Optional[str]):
+        """Called before an export is processed. Data stores which organize data by export can override this."""
+        pass
+
     @abstractmethod
     def create_initial_table_definition(self, tbl: TableInfo):
         pass
 
+    def create_table_indexes(self, tbl: TableInfo):
+        """
+        Called after a new table was populated from all of its part files. Data stores which defer building
+        indexes until a table is loaded can override this.
+        """
+        pass
+
     @abstractmethod
     def drop_table(self, tbl_name: str):
         pass
 
+    @abstractmethod
+    def has_table(self, tbl_name: str) -> bool:
+        """Return whether a table exists, without changing the data store."""
+        pass
+
     @abstractmethod
     def get_data_store_data_type_from_dv_export_data_type(self, data_type: DVExportDataType):
         pass
@@ -44,19 +59,148 @@ class DataStore(ABC):
     def insert_from_files_into_table(self,
                                      tbl_name: str,
                                      column_infos: list[ColumnInfo],
-                                     file_paths_for_tbl: list[str]):
+                                     file_paths_for_tbl: Iterable[str],
+                                     checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        """
+        Insert the rows of part files into a table. Like the other methods that load files, this accepts a lazy
+        iterator of file paths which yields each file once it is downloaded, and takes each file's checkpoint
+        right after its path.
+        """
         pass
 
     @abstractmethod
     def drop_column(self, tbl_name: str, column_name: str):
         pass
 
+    @abstractmethod
+    def get_completed_file_ids(self, export_uuid: str, tbl_name: str) -> set[int]:
+        """
+        Return the IDs of the part files for a table which were already loaded for an export. Methods that load
+        files record each file as completed when they are passed ``checkpoints``, one per file path.
+        """
+        pass
+
+    @abstractmethod
+    def add_column(self, tbl_name: str, column_info: ColumnInfo):
+        pass
+
+    @abstractmethod
+    def update_columns_from_files(self,
+                                  tbl_name: str,
+                                  column_infos: list[ColumnInfo],
+                                  file_paths_for_tbl: Iterable[str],
+                                  checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        """
+        Set the non-key columns in ``column_infos`` on existing rows from the rows in the files, matching rows on
+        the primary key columns in ``column_infos``.
+        """
+        pass
+
+    @abstractmethod
+    def apply_delta_from_files_into_table(self,
+                                          tbl_name: str,
+                                          column_infos: list[ColumnInfo],
+                                          file_paths_for_tbl: Iterable[str],
+                                          checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        """
+        Apply every diff action in the files to an existing table, so that removed and changed rows are
+        reflected as well as added rows.
+        """
+        pass
+
 
 class SQLAlchemyDataStore(DataStore):
-    def __init__(self, url, echo=False):
-        self.engine = create_engine(url, echo=echo)
+    CHECKPOINT_TABLE_NAME = 'dv_export_checkpoints'
+
+    def __init__(self,
+                 url,
+                 echo=False,
+                 csv_chunk_size: Optional[int] = None,
+                 native_bulk_load: bool = False,
+                 bulk_loader: Optional[BulkLoader] = None,
+                 parse_engine: str = PARSE_ENGINE_PANDAS,
+                 dtype_profile: str = DTYPE_PROFILE_DEFAULT,
+                 pool_size: Optional[int] = None,
+                 checkpoints: bool = False,
+                 defer_indexes: bool = False,
+                 index_build_workers: Optional[int] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 schema_cache: Optional[SchemaCache] = None,
+                 parse_workers: Optional[int] = None,
+                 shadow_load: bool = False,
+                 memory_budget: Optional[MemoryBudget] = None,
+                 delete_loaded_files: bool = False,
+                 disk_guard: Optional[DiskGuard] = None):
+        """
+        :param url: SQLAlchemy database URL
+        :param echo: Whether SQLAlchemy should log all statements
+        :param csv_chunk_size: If provided, part files are read and inserted this many rows at a time
+            instead of all at once, so memory use is bounded by the chunk size rather than the file size
+        :param native_bulk_load: Whether to load rows with the dialect's native bulk load path, such as ``COPY`` on
+            PostgreSQL, instead of generic ``INSERT`` statements
+        :param bulk_loader: Optional ``BulkLoader`` to use instead of the one chosen for the dialect
+        :param parse_engine: ``pandas`` to parse part files into ``DataFrame`` objects, or ``pyarrow`` to parse them
+            with pyarrow's multithreaded CSV reader and hand Arrow record batches to the ``BulkLoader``
+        :param dtype_profile: ``default`` or ``compact``. With the pandas parse engine, ``compact`` stores string
+            columns as Arrow-backed strings, and low-cardinality string columns as categoricals, to reduce memory use
+        :param pool_size: Optional number of connections to keep in the connection pool. Set this to at least
+            the number of tables loaded concurrently
+        :param checkpoints: Whether to record every loaded part file in the ``dv_export_checkpoints`` table, so that
+            an interrupted export can be resumed without loading any file twice
+        :param defer_indexes: Whether to create new tables without primary keys and add them in
+            ``create_table_indexes`` once the tables are loaded, so that rows are loaded without index maintenance
+        :param index_build_workers: Optional number of parallel workers the database may use to build each index,
+            where the dialect supports it
+        :param telemetry: Optional ``Telemetry`` to record the time spent parsing and inserting each part file in
+        :param schema_cache: Optional ``SchemaCache`` to keep table definitions in between runs, so that tables do not
+            have to be reflected again
+        :param parse_workers: Optional number of worker processes which parse part files ahead of loading them, so
+            that this process only writes rows to the database
+        :param shadow_load: Whether to load new tables into a shadow table, which is unlogged on PostgreSQL, and
+            build its primary key once it is loaded. Then the shadow table replaces the live table in a single
+            transaction, so readers see the previous table until the new one is complete
+        :param memory_budget: Optional ``MemoryBudget`` to reserve the estimated memory of each part file from
+            before it is parsed, so that fewer files are parsed and loaded at the same time when memory is short
+        :param delete_loaded_files: Whether to delete each part file as soon as its rows are committed, so that
+            scratch space is only used by files which are not loaded yet
+        :param disk_guard: Optional ``DiskGuard`` which parse workers reserve disk space from before they write the
+            parsed rows of a part file
+        """
+        engine_kwargs = {'pool_size': pool_size} if pool_size else {}
+        self.engine = create_engine(url, echo=echo, **engine_kwargs)
+        # Tables are reflected one at a time when they are first used, see _get_table
         self.metadata = MetaData()
-        self.metadata.reflect(self.engine)
+        self.schema_cache = schema_cache
+        self.csv_chunk_size = csv_chunk_size
+        self.bulk_loader = bulk_loader or get_bulk_loader(self.engine.dialect.name, native_bulk_load)
+        if parse_engine not in (PARSE_ENGINE_PANDAS, PARSE_ENGINE_PYARROW):
+            raise ValueError(f"No such parse engine: {parse_engine}")
+        if parse_engine == PARSE_ENGINE_PYARROW:
+            check_pyarrow_installed()
+        self.parse_engine = parse_engine
+        if dtype_profile not in (DTYPE_PROFILE_DEFAULT, DTYPE_PROFILE_COMPACT):
+            raise ValueError(f"No such dtype profile: {dtype_profile}")
+        if dtype_profile == DTYPE_PROFILE_COMPACT:
+            check_pyarrow_installed()
+        self.dtype_profile = dtype_profile
+        # Guards changes to the shared MetaData when tables are created concurrently
+        self._metadata_lock = threading.Lock()
+        self.checkpoint_table = self._create_checkpoint_table() if checkpoints else None
+        self.defer_indexes = defer_indexes
+        self.index_build_workers = index_build_workers
+        self.telemetry = telemetry or Telemetry()
+        self.memory_budget = memory_budget
+        self.delete_loaded_files = delete_loaded_files
+        self.parse_pool = ParsePool(parse_workers, parse_engine, dtype_profile, csv_chunk_size,
+                                    memory_budget=memory_budget,
+                                    disk_guard=disk_guard) if parse_workers else None
+        self.shadow_load = shadow_load
+        # Shadow tables being loaded, by the name of the live table they replace
+        self._shadow_tables: dict[str, Table] = {}
+        self.export_uuid = None
+
+    def begin_export(self, export_uuid: str, data_version_number: Optional[str]):
+        self.export_uuid = export_uuid
 
     def get_data_store_data_type_from_dv_export_data_type(self, data_type: DVExportDataType):
         if data_type == DVExportDataType.String:
@@ -72,65 +216,583 @@ class SQLAlchemyDataStore(DataStore):
         else:
             raise NotImplementedError(f"data_type={data_type} has no corresponding data type for SQLAlchemy")
 
-    def get_list_of_sql_columns(self, column_infos: list[ColumnInfo]) -> list[Column]:
+    def get_list_of_sql_columns(self, column_infos: list[ColumnInfo], with_primary_key: bool = True) -> list[Column]:
+        """
+        :param with_primary_key: Whether to declare the primary key columns. If ``False``, they are only made
+            non-nullable so that the primary key can be added later.
+        """
         columns = []
         for column_info in column_infos:
             name = column_info.name
             sql_data_type = self.get_data_store_data_type_from_dv_export_data_type(column_info.data_type)
 
+            nullable = column_info.allows_null
+            if column_info.primary_key and not with_primary_key:
+                nullable = False
+
             columns.append(
                 Column(
                     name,
                     sql_data_type,
-                    primary_key=column_info.primary_key,
-                    nullable=column_info.allows_null
+                    primary_key=column_info.primary_key and with_primary_key,
+                    nullable=nullable
                 )
             )
         return columns
 
     def create_initial_table_definition(self, tbl: TableInfo):
+        if self.shadow_load:
+            self._create_shadow_table(tbl)
+            return
+
+        if self._get_table(tbl.name) is not None:
+            # Only a load of this export which was interrupted may continue into an existing table; otherwise its
+            # rows would be inserted alongside the rows already there
+            if len(self.get_completed_file_ids(self.export_uuid, tbl.name)) == 0:
+                raise Exception(f"Cannot create table={tbl.name} because it already exists. Drop it first, or enable "
+                                f"SHADOW_LOAD to replace it")
+            logger.info(f"Resuming the load of table={tbl.name} for export={self.export_uuid}")
+            return
+
         column_names = list(map(lambda column_info: column_info.name, tbl.columns.new_columns.column_infos))
         logger.info(f"Creating table={tbl.name} with columns={column_names}")
-        db_columns = self.get_list_of_sql_columns(tbl.columns.new_columns.column_infos)
-        Table(tbl.name, self.metadata, *db_columns)
-        self.metadata.create_all(self.engine)
+        db_columns = self.get_list_of_sql_columns(tbl.columns.new_columns.column_infos,
+                                                  with_primary_key=not self.defer_indexes)
+        with self._metadata_lock:
+            alchemy_table = Table(tbl.name, self.metadata, *db_columns)
+        alchemy_table.create(self.engine, checkfirst=True)
+        self._cache_table_definition(alchemy_table)
         logger.info(f"Created table={tbl.name}")
 
+    def create_table_indexes(self, tbl: TableInfo):
+        shadow_table = self._shadow_tables.get(tbl.name)
+        if shadow_table is not None:
+            self._build_primary_key(tbl, shadow_table)
+            self._swap_shadow_table(tbl.name, shadow_table)
+            return
+        if not self.defer_indexes:
+            return
+
+        if self._build_primary_key(tbl, self._get_table(tbl.name)):
+            self._refresh_table_definition(tbl.name)
+
+    def _build_primary_key(self, tbl: TableInfo, alchemy_table: Table) -> bool:
+        """Add the primary key to a table which was loaded without one. Returns whether a key was built."""
+        primary_key_names = [column_info.name for column_info in tbl.columns.new_columns.column_infos
+                             if column_info.primary_key]
+        index_name = _constraint_name('pk', alchemy_table.name)
+        if len(primary_key_names) == 0 or len(alchemy_table.primary_key.columns) > 0 \
+                or any(index.name == index_name for index in alchemy_table.indexes):
+            return False
+
+        logger.info(f"Building primary key on columns={primary_key_names} for table={alchemy_table.name}")
+        preparer = self.engine.dialect.identifier_preparer
+        column_list = ", ".join(preparer.quote(name) for name in primary_key_names)
+        with self.engine.connect() as conn:
+            if self.engine.dialect.name == 'sqlite':
+                # SQLite cannot add a primary key to an existing table, so a unique index enforces the key instead
+                stmt = (f"CREATE UNIQUE INDEX {preparer.quote(index_name)} "
+                        f"ON {preparer.format_table(alchemy_table)} ({column_list})")
+            else:
+                if self.engine.dialect.name == 'postgresql' and self.index_build_workers:
+                    # SET LOCAL lasts until the ALTER TABLE commits, so the pooled connection keeps its own setting
+                    conn.exec_driver_sql(f"SET LOCAL max_parallel_maintenance_workers = "
+                                         f"{int(self.index_build_workers)}")
+                stmt = (f"ALTER TABLE {preparer.format_table(alchemy_table)} "
+                        f"ADD CONSTRAINT {preparer.quote(index_name)} PRIMARY KEY ({column_list})")
+            with self.telemetry.phase('index', tbl.name):
+                conn.exec_driver_sql(stmt)
+                conn.commit()
+        logger.info(f"Built primary key for table={alchemy_table.name}")
+        return True
+
+    def _create_shadow_table(self, tbl: TableInfo):
+        """
+        Create the shadow table that a new table is loaded into before it replaces the live table. If this export
+        already loaded some of the table's files into a shadow table, loading resumes into it; any other leftover
+        shadow table is dropped.
+        """
+        shadow_table_name = _constraint_name('shadow', tbl.name)
+        resuming = self.checkpoint_table is not None and \
+            len(self.get_completed_file_ids(self.export_uuid, tbl.name)) > 0
+        with self._metadata_lock:
+            if shadow_table_name in self.metadata.tables:
+                self.metadata.remove(self.metadata.tables[shadow_table_name])
+        if resuming and inspect(self.engine).has_table(shadow_table_name):
+            logger.info(f"Resuming the load of table={tbl.name} into shadow table={shadow_table_name}")
+            with self._metadata_lock:
+                self._shadow_tables[tbl.name] = Table(shadow_table_name, self.metadata, autoload_with=self.engine)
+            return
+        if resuming:
+            # The shadow table already replaced the live table, or an earlier run without a shadow table loaded the
+            # checkpointed files into the live table
+            logger.info(f"Resuming the load of table={tbl.name} into the live table")
+            return
+
+        Table(shadow_table_name, MetaData()).drop(self.engine, checkfirst=True)
+        # SQLite cannot add a primary key to an existing table. Its key's index is renamed along with the table,
+        # unlike an index built afterwards, so the key is created with the table.
+        with_primary_key = self.engine.dialect.name == 'sqlite'
+        db_columns = self.get_list_of_sql_columns(tbl.columns.new_columns.column_infos,
+                                                  with_primary_key=with_primary_key)
+        # Unlogged tables skip the write-ahead log while they are loaded
+        prefixes = ['UNLOGGED'] if self.engine.dialect.name == 'postgresql' else []
+        with self._metadata_lock:
+            shadow_table = Table(shadow_table_name, self.metadata, *db_columns, prefixes=prefixes)
+        shadow_table.create(self.engine)
+        with self._metadata_lock:
+            self._shadow_tables[tbl.name] = shadow_table
+        logger.info(f"Created shadow table={shadow_table_name} for table={tbl.name}")
+
+    def _swap_shadow_table(self, tbl_name: str, shadow_table: Table):
+        """
+        Replace the live table with its loaded shadow table. On databases with transactional DDL, the live table is
+        dropped and the shadow table renamed in one transaction; MySQL renames both tables in one statement instead.
+        Readers of the live table see either the previous table or the new one.
+        """
+        dialect_name = self.engine.dialect.name
+        preparer = self.engine.dialect.identifier_preparer
+        live_table_exists = inspect(self.engine).has_table(tbl_name)
+        with self.engine.connect() as conn, self.telemetry.phase('swap', tbl_name):
+            if dialect_name == 'postgresql':
+                # Make the table crash safe before it goes live; this writes it to the write-ahead log once
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.format_table(shadow_table)} SET LOGGED")
+                conn.commit()
+            if dialect_name in ('mysql', 'mariadb'):
+                old_table_name = _constraint_name('old', tbl_name)
+                if live_table_exists:
+                    conn.exec_driver_sql(f"RENAME TABLE {preparer.quote(tbl_name)} TO {preparer.quote(old_table_name)}, "
+                                         f"{preparer.format_table(shadow_table)} TO {preparer.quote(tbl_name)}")
+                    conn.exec_driver_sql(f"DROP TABLE {preparer.quote(old_table_name)}")
+                else:
+                    conn.exec_driver_sql(f"RENAME TABLE {preparer.format_table(shadow_table)} "
+                                         f"TO {preparer.quote(tbl_name)}")
+            else:
+                if dialect_name == 'sqlite':
+                    # pysqlite does not start a transaction for DDL statements by itself
+                    conn.exec_driver_sql("BEGIN")
+                if live_table_exists:
+                    conn.exec_driver_sql(f"DROP TABLE {preparer.quote(tbl_name)}")
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.format_table(shadow_table)} "
+                                     f"RENAME TO {preparer.quote(tbl_name)}")
+                if dialect_name == 'postgresql':
+                    self._rename_primary_key(conn, tbl_name)
+            conn.commit()
+
+        with self._metadata_lock:
+            del self._shadow_tables[tbl_name]
+            self.metadata.remove(shadow_table)
+            if tbl_name in self.metadata.tables:
+                self.metadata.remove(self.metadata.tables[tbl_name])
+        self._refresh_table_definition(tbl_name)
+        logger.info(f"Replaced table={tbl_name} with shadow table={shadow_table.name}")
+
+    def _rename_primary_key(self, conn: Connection, tbl_name: str):
+        """
+        Name the primary key of a renamed table after the table again. Constraint names are unique per schema on
+        PostgreSQL, so a key which kept the shadow table's name would collide with the next shadow table's key.
+        """
+        primary_key_name = inspect(conn).get_pk_constraint(tbl_name).get('name')
+        if not primary_key_name:
+            return
+        preparer = self.engine.dialect.identifier_preparer
+        conn.exec_driver_sql(f"ALTER TABLE {preparer.quote(tbl_name)} RENAME CONSTRAINT "
+                             f"{preparer.quote(primary_key_name)} TO {preparer.quote(_constraint_name('pk', tbl_name))}")
+
     def insert_from_files_into_table(self,
                                      tbl_name: str,
                                      column_infos: list[ColumnInfo],
-                                     file_paths_for_tbl: list[str]):
-        logger.info(f"Begin processing data from files={file_paths_for_tbl} for table={tbl_name}")
-        clm_name_to_dtype = convert_data_types_to_df_dtype_dict(column_infos)
-        for file_path in file_paths_for_tbl:
-            with open(file_path) as f:
-                df = pd.read_csv(f, dtype=clm_name_to_dtype, on_bad_lines='warn')
-
-                # after loading the DF, replace NaN with empty string for string columns
-                str_columns = {
-                    clm_name for clm_name, dtype in clm_name_to_dtype.items() if dtype == PANDAS_DF_MIXED_DTYPE
-                }
-                for str_column in str_columns:
-                    df[str_column] = df[str_column].fillna('')
-
-                inserts = df[df[DIFF_ACTION_COLUMN_NAME] == DIFF_ACTION_INSERT]
-                if len(inserts.index) != 0:
-                    with self.engine.connect() as conn:
-                        alchemy_table = self.metadata.tables[tbl_name]
-                        conn.execute(
-                            insert(alchemy_table),
-                            inserts.to_dict('records')
+                                     file_paths_for_tbl: Iterable[str],
+                                     checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        logger.info(f"Begin processing data from {_describe_files(file_paths_for_tbl)} for table={tbl_name}")
+        alchemy_table = self._shadow_tables.get(tbl_name)
+        if alchemy_table is None:
+            alchemy_table = self._get_table(tbl_name)
+        with closing(self._iter_files(tbl_name, column_infos, file_paths_for_tbl, checkpoints,
+                                     only_inserts=True)) as files:
+            for file_path, checkpoint, parsed_file in files:
+                with self.engine.connect() as conn:
+                    num_inserted = self._load_file(conn, tbl_name, alchemy_table, column_infos, file_path,
+                                                   only_inserts=True, parsed_file=parsed_file)
+                    self._record_checkpoint(conn, tbl_name, checkpoint, num_inserted)
+                    conn.commit()
+                logger.info(f"Inserted {num_inserted} records into table={tbl_name} from file={file_path}")
+                self._delete_loaded_file(file_path)
+
+    def apply_delta_from_files_into_table(self,
+                                          tbl_name: str,
+                                          column_infos: list[ColumnInfo],
+                                          file_paths_for_tbl: Iterable[str],
+                                          checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        """
+        Each file is bulk loaded into a temporary staging table. Then, in the same transaction, rows are deleted and
+        inserted with three set-based statements:
+
+        - A removed row is deleted only if the table still holds it with exactly the removed values, comparing every
+          column so that NULLs match NULLs.
+        - A row to insert first deletes any row with the same primary key, and is then copied into the table.
+
+        A changed row appears in a delta as a removal of its old values and an insert of its new values with the
+        same key, and the two can be in different files. The insert replaces the old row whichever file is applied
+        first, and the removal never deletes the new row. Applying the same file twice leaves the table unchanged.
+        """
+        primary_key_names = [column_info.name for column_info in column_infos if column_info.primary_key]
+        if len(primary_key_names) == 0:
+            logger.warning(f"table={tbl_name} has no primary key, so only inserts can be applied")
+            self.insert_from_files_into_table(tbl_name, column_infos, file_paths_for_tbl, checkpoints)
+            return
+
+        logger.info(f"Begin applying deltas from {_describe_files(file_paths_for_tbl)} to table={tbl_name}")
+        alchemy_table = self._get_table(tbl_name)
+        column_names = [column_info.name for column_info in column_infos]
+        with closing(self._iter_files(tbl_name, column_infos, file_paths_for_tbl, checkpoints,
+                                     only_inserts=False)) as files:
+            for file_path, checkpoint, parsed_file in files:
+                with self.engine.connect() as conn:
+                    staging_table = self._create_staging_table(conn, tbl_name, column_infos)
+                    num_staged = self._load_file(conn, tbl_name, staging_table, column_infos, file_path,
+                                                 only_inserts=False, parsed_file=parsed_file)
+
+                    key_matches = and_(*[staging_table.c[name] == alchemy_table.c[name] for name in primary_key_names])
+                    # Keys are never NULL, so they are compared with = to let the database use the primary key
+                    row_matches = and_(key_matches,
+                                       *[staging_table.c[name].is_not_distinct_from(alchemy_table.c[name])
+                                         for name in column_names if name not in primary_key_names])
+                    diff_action = staging_table.c[DIFF_ACTION_COLUMN_NAME]
+                    with self.telemetry.phase('merge', tbl_name) as metrics:
+                        removed = conn.execute(
+                            delete(alchemy_table)
+                            .where(exists().where(and_(diff_action == DIFF_ACTION_DELETE, row_matches)))
+                        )
+                        replaced = conn.execute(
+                            delete(alchemy_table)
+                            .where(exists().where(and_(diff_action == DIFF_ACTION_INSERT, key_matches)))
+                        )
+                        inserted = conn.execute(
+                            insert(alchemy_table).from_select(
+                                column_names,
+                                select(*[staging_table.c[name] for name in column_names])
+                                .where(diff_action == DIFF_ACTION_INSERT)
+                            )
                         )
-                        conn.commit()
-                    logger.info(f"Inserted {len(inserts.index)} records into table={tbl_name}")
+                        metrics['rows'] = num_staged
+                    staging_table.drop(conn)
+                    self._record_checkpoint(conn, tbl_name, checkpoint, num_staged)
+                    conn.commit()
+                logger.info(f"Applied {num_staged} diff records to table={tbl_name} from file={file_path}: "
+                            f"removed {removed.rowcount}, replaced {replaced.rowcount}, "
+                            f"and inserted {inserted.rowcount} records")
+                self._delete_loaded_file(file_path)
+
+    def update_columns_from_files(self,
+                                  tbl_name: str,
+                                  column_infos: list[ColumnInfo],
+                                  file_paths_for_tbl: Iterable[str],
+                                  checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        """
+        Each file is bulk loaded into a temporary staging table, and the table is then updated from the staging
+        table with a single ``UPDATE ... FROM`` statement joined on the primary key.
+        """
+        primary_key_names = [column_info.name for column_info in column_infos if column_info.primary_key]
+        update_names = [column_info.name for column_info in column_infos if not column_info.primary_key]
+        if len(primary_key_names) == 0:
+            raise Exception(f"Cannot update columns={update_names} of table={tbl_name} "
+                            f"because the files have no primary key columns")
+
+        logger.info(f"Begin updating columns={update_names} from {_describe_files(file_paths_for_tbl)} "
+                    f"for table={tbl_name}")
+        alchemy_table = self._get_table(tbl_name)
+        with closing(self._iter_files(tbl_name, column_infos, file_paths_for_tbl, checkpoints,
+                                     only_inserts=True)) as files:
+            for file_path, checkpoint, parsed_file in files:
+                with self.engine.connect() as conn:
+                    staging_table = self._create_staging_table(conn, tbl_name, column_infos, with_diff_action=False)
+                    num_staged = self._load_file(conn, tbl_name, staging_table, column_infos, file_path,
+                                                 only_inserts=True, parsed_file=parsed_file)
+
+                    key_matches = and_(*[staging_table.c[name] == alchemy_table.c[name] for name in primary_key_names])
+                    with self.telemetry.phase('merge', tbl_name) as metrics:
+                        updated = conn.execute(
+                            update(alchemy_table)
+                            .values({name: staging_table.c[name] for name in update_names})
+                            .where(key_matches)
+                        )
+                        metrics['rows'] = num_staged
+                    staging_table.drop(conn)
+                    self._record_checkpoint(conn, tbl_name, checkpoint, num_staged)
+                    conn.commit()
+                logger.info(f"Updated {updated.rowcount} records in table={tbl_name} "
+                            f"from {num_staged} records in file={file_path}")
+                self._delete_loaded_file(file_path)
+
+    def _delete_loaded_file(self, file_path: str):
+        if self.delete_loaded_files:
+            os.remove(file_path)
+            logger.info(f"Deleted loaded file={file_path}")
+
+    def get_completed_file_ids(self, export_uuid: str, tbl_name: str) -> set[int]:
+        if self.checkpoint_table is None:
+            return set()
+        with self.engine.connect() as conn:
+            result = conn.execute(
+                select(self.checkpoint_table.c.file_id)
+                .where(self.checkpoint_table.c.export_uuid == export_uuid)
+                .where(self.checkpoint_table.c.table_name == tbl_name)
+            )
+            return {row.file_id for row in result}
+
+    def _create_checkpoint_table(self) -> Table:
+        """
+        Create the checkpoint manifest. It lives in the target database so that a file's rows and its checkpoint
+        are committed in the same transaction.
+        """
+        with self._metadata_lock:
+            if self.CHECKPOINT_TABLE_NAME in self.metadata.tables:
+                return self.metadata.tables[self.CHECKPOINT_TABLE_NAME]
+            checkpoint_table = Table(
+                self.CHECKPOINT_TABLE_NAME,
+                self.metadata,
+                Column('export_uuid', String(64), primary_key=True),
+                Column('file_id', BigInteger, primary_key=True),
+                Column('table_name', String(255), nullable=False),
+                Column('rows_loaded', BigInteger, nullable=False),
+                Column('checksum', String(64), nullable=False),
+                Column('completed_at', DateTime, nullable=False, server_default=func.current_timestamp()),
+            )
+        checkpoint_table.create(self.engine, checkfirst=True)
+        return checkpoint_table
+
+    def _record_checkpoint(self,
+                           conn: Connection,
+                           tbl_name: str,
+                           checkpoint: Optional[FileCheckpoint],
+                           rows_loaded: int):
+        if self.checkpoint_table is None or checkpoint is None:
+            return
+        conn.execute(
+            insert(self.checkpoint_table).values(export_uuid=checkpoint.export_uuid,
+                                                 file_id=checkpoint.file_id,
+                                                 table_name=tbl_name,
+                                                 rows_loaded=rows_loaded,
+                                                 checksum=checkpoint.checksum)
+        )
+
+    def _create_staging_table(self,
+                              conn: Connection,
+                              tbl_name: str,
+                              column_infos: list[ColumnInfo],
+                              with_diff_action: bool = True) -> Table:
+        """
+        Create a temporary table with the part file's columns and, optionally, its ``_DiffAction_``. Staging tables
+        have no keys or constraints, so they are cheap to bulk load.
+        """
+        staging_columns = [
+            Column(column_info.name, self.get_data_store_data_type_from_dv_export_data_type(column_info.data_type))
+            for column_info in column_infos
+        ]
+        if with_diff_action:
+            staging_columns.append(Column(DIFF_ACTION_COLUMN_NAME, String(1)))
+        staging_table_name = f"{tbl_name[:40]}_staging_{uuid.uuid4().hex[:8]}"
+        staging_table = Table(staging_table_name, MetaData(), *staging_columns, prefixes=['TEMPORARY'])
+        staging_table.create(conn)
+        return staging_table
+
+    def _iter_files(self,
+                    tbl_name: str,
+                    column_infos: list[ColumnInfo],
+                    file_paths: Iterable[str],
+                    checkpoints: Optional[Iterable[FileCheckpoint]],
+                    only_inserts: bool) -> Iterator[tuple[str, Optional[FileCheckpoint], Optional[Future]]]:
+        """
+        Yield each file path with its checkpoint and, if there is a parse pool, the future of the file being parsed
+        in a worker process. Later files are parsed as soon as they are downloaded while earlier ones are loaded.
+        Memory for each file is reserved from the memory budget until the next file is requested, so the generator
+        must be closed when it is not consumed to the end.
+        """
+        if self.parse_pool is None:
+            for file_path, checkpoint in _zip_checkpoints(file_paths, checkpoints):
+                with reserve_memory(self.memory_budget,
+                                    estimate_parse_memory(file_path, column_infos, self.csv_chunk_size),
+                                    tbl_name):
+                    yield file_path, checkpoint, None
+            return
+
+        parsed_files = self.parse_pool.parse_files(column_infos, file_paths, only_inserts, tbl_name)
+        try:
+            for (file_path, parsed_file), checkpoint in _zip_checkpoints(parsed_files, checkpoints):
+                yield file_path, checkpoint, parsed_file
+        finally:
+            parsed_files.close()
+
+    def _load_file(self,
+                   conn: Connection,
+                   tbl_name: str,
+                   target_table: Table,
+                   column_infos: list[ColumnInfo],
+                   file_path: str,
+                   only_inserts: bool,
+                   parsed_file: Optional[Future] = None) -> int:
+        """
+        Load rows from a part file for ``tbl_name`` into ``target_table`` and return the number of rows loaded.
+        The time spent parsing the file and inserting its rows is recorded separately in ``telemetry``.
+
+        :param only_inserts: If ``True``, load only the rows to insert. Otherwise, load every row along with its
+            ``_DiffAction_``, which ``target_table`` must have a column for.
+        :param parsed_file: Optional future of the file being parsed by the parse pool with the same ``only_inserts``
+        """
+        parse_secs = 0.0
+        if parsed_file is not None:
+            start = time.perf_counter()
+            ipc_path, parse_secs = parsed_file.result()
+            self.telemetry.record('parse_wait', time.perf_counter() - start, tbl_name)
+            batches = read_arrow_ipc_file(ipc_path)
+            if self.parse_engine == PARSE_ENGINE_PYARROW:
+                load_batch = self.bulk_loader.load_record_batch
+            else:
+                load_batch = self._load_parsed_data_frame
+        elif self.parse_engine == PARSE_ENGINE_PYARROW:
+            batches = read_record_batches(file_path,
+                                          column_infos,
+                                          streaming=self.csv_chunk_size is not None,
+                                          only_inserts=only_inserts)
+            load_batch = self.bulk_loader.load_record_batch
+        else:
+            batches = read_data_frames(file_path,
+                                       column_infos,
+                                       self.csv_chunk_size,
+                                       dtype_profile=self.dtype_profile,
+                                       only_inserts=only_inserts)
+            load_batch = self.bulk_loader.load
+
+        num_loaded = 0
+        insert_secs = 0.0
+        while True:
+            start = time.perf_counter()
+            batch = next(batches, None)
+            parse_secs += time.perf_counter() - start
+            if batch is None:
+                break
+
+            start = time.perf_counter()
+            load_batch(conn, target_table, batch)
+            insert_secs += time.perf_counter() - start
+            num_loaded += len(batch)
+
+        self.telemetry.record('parse', parse_secs, tbl_name, rows=num_loaded, bytes=os.path.getsize(file_path))
+        self.telemetry.record('insert', insert_secs, tbl_name, rows=num_loaded)
+        return num_loaded
+
+    def _load_parsed_data_frame(self, conn: Connection, target_table: Table, batch: 'pa.RecordBatch'):
+        # Batches parsed with pandas carry the DataFrame dtypes in their schema, so the DataFrame is restored as parsed
+        self.bulk_loader.load(conn, target_table, batch.to_pandas())
 
     def drop_table(self, tbl_name: str):
-        if tbl_name in self.metadata.tables.keys():
-            alchemy_table: Table = self.metadata.tables[tbl_name]
+        alchemy_table = self._get_table(tbl_name)
+        if alchemy_table is not None:
             alchemy_table.drop(self.engine, checkfirst=True)
+            with self._metadata_lock:
+                self.metadata.remove(alchemy_table)
+                if self.schema_cache is not None:
+                    self.schema_cache.remove(tbl_name)
+
+    def has_table(self, tbl_name: str) -> bool:
+        with self._metadata_lock:
+            if tbl_name in self.metadata.tables:
+                return True
+        return inspect(self.engine).has_table(tbl_name)
 
     def drop_column(self, tbl_name: str, column_name: str):
+        alchemy_table = self._get_table(tbl_name)
+        if column_name not in alchemy_table.c:
+            logger.info(f"Column={column_name} was already dropped from table={tbl_name}")
+            return
+
+        preparer = self.engine.dialect.identifier_preparer
+        with self.engine.connect() as conn:
+            stmt = text(f"ALTER TABLE {preparer.format_table(alchemy_table)} "
+                        f"DROP COLUMN {preparer.quote(column_name)}")
+            conn.execute(stmt)
+            conn.commit()
+        self._refresh_table_definition(tbl_name)
+
+    def add_column(self, tbl_name: str, column_info: ColumnInfo):
+        alchemy_table = self._get_table(tbl_name)
+        if column_info.name in alchemy_table.c:
+            logger.info(f"Column={column_info.name} already exists in table={tbl_name}")
+            return
+
+        # Existing rows have no value for the column until it is backfilled, so it is always nullable
+        preparer = self.engine.dialect.identifier_preparer
+        sql_data_type = self.get_data_store_data_type_from_dv_export_data_type(column_info.data_type)
         with self.engine.connect() as conn:
-            stmt = text(f"""ALTER TABLE {tbl_name} DROP COLUMN {column_name}""")
+            stmt = text(f"ALTER TABLE {preparer.format_table(alchemy_table)} "
+                        f"ADD COLUMN {preparer.quote(column_info.name)} "
+                        f"{sql_data_type.compile(dialect=self.engine.dialect)}")
             conn.execute(stmt)
             conn.commit()
+        self._refresh_table_definition(tbl_name)
+        logger.info(f"Added column={column_info.name} to table={tbl_name}")
+
+    def _get_table(self, tbl_name: str) -> Optional[Table]:
+        """
+        Return the definition of a table, or ``None`` if it does not exist. Rather than reflecting the whole database
+        up front, each table is looked up the first time it is used. If the schema cache has its definition, only
+        the table's existence is checked; otherwise the table is reflected on its own and added to the cache.
+        """
+        with self._metadata_lock:
+            if tbl_name in self.metadata.tables:
+                return self.metadata.tables[tbl_name]
+            if not inspect(self.engine).has_table(tbl_name):
+                if self.schema_cache is not None:
+                    self.schema_cache.remove(tbl_name)
+                return None
+
+            cached_table = self.schema_cache.get(tbl_name) if self.schema_cache is not None else None
+            if cached_table is not None:
+                return cached_table.to_metadata(self.metadata)
+            logger.info(f"Reflecting table={tbl_name}")
+            alchemy_table = Table(tbl_name, self.metadata, autoload_with=self.engine)
+            if self.schema_cache is not None:
+                self.schema_cache.put(alchemy_table)
+            return alchemy_table
+
+    def _cache_table_definition(self, alchemy_table: Table):
+        if self.schema_cache is not None:
+            with self._metadata_lock:
+                self.schema_cache.put(alchemy_table)
+
+    def _refresh_table_definition(self, tbl_name: str):
+        """Reflect a table again after its columns were changed."""
+        with self._metadata_lock:
+            if tbl_name in self.metadata.tables:
+                self.metadata.remove(self.metadata.tables[tbl_name])
+            alchemy_table = Table(tbl_name, self.metadata, autoload_with=self.engine)
+            if self.schema_cache is not None:
+                self.schema_cache.put(alchemy_table)
+
+
+def _constraint_name(prefix: str, tbl_name: str) -> str:
+    """Name a constraint, index, or shadow table for a table, within the 63 character limit of PostgreSQL and MySQL."""
+    name = f"{prefix}_{tbl_name}"
+    if len(name) <= 63:
+        return name
+    return f"{name[:54]}_{hashlib.sha1(tbl_name.encode()).hexdigest()[:8]}"
+
+
+def _zip_checkpoints(files: Iterable, checkpoints: Optional[Iterable[FileCheckpoint]]):
+    """
+    Pair each file with its checkpoint, or with ``None`` if no checkpoints were provided. Each checkpoint is taken
+    after its file, so lazily computed checkpoints can use the file.
+    """
+    if checkpoints is None:
+        return ((file, None) for file in files)
+    if isinstance(files, list) and isinstance(checkpoints, list) and len(checkpoints) != len(files):
+        raise ValueError(f"Expected one checkpoint per file, got {len(checkpoints)} for {len(files)} files")
+    return zip(files, checkpoints)
+
+
+def _describe_files(file_paths: Iterable[str]) -> str:
+    """Describe the files being loaded for a log message, without consuming a lazy iterator of them."""
+    if isinstance(file_paths, list):
+        return f"files={file_paths}"
+    return "files as they are downloaded"
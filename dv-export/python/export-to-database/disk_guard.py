@@ -0,0 +1,65 @@
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger("disk_guard")
+
+
+class DiskGuard:
+    """
+    Refuses to write scratch files that would leave less than ``min_free_bytes`` free on the disk they are written
+    to. Each writer reserves the bytes it is about to write to a file before it writes them. A file's bytes stop
+    being free as soon as they are written, so every check subtracts only the bytes which other files still have
+    to write: the bytes reserved for each file less the file's current size. A writer releases its reservation once
+    its file is written.
+    """
+
+    def __init__(self, min_free_bytes: int):
+        """
+        :param min_free_bytes: Free space to leave on the disk
+        """
+        self.min_free_bytes = min_free_bytes
+        # Bytes reserved for each file being written, by the file's path
+        self._reserved_bytes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, file_path: str, num_bytes: int, description: str) -> int:
+        """
+        Reserve ``num_bytes`` more to be written to ``file_path``, or raise if that would leave too little free
+        space. The file must be written from the start, not appended to. Returns the number of bytes reserved,
+        which must be passed to ``release``.
+
+        :param description: What is being written, for the error message
+        """
+        with self._lock:
+            free_bytes = shutil.disk_usage(os.path.dirname(os.path.abspath(file_path))).free
+            unwritten_bytes = self._unwritten_bytes()
+            if free_bytes - unwritten_bytes - num_bytes < self.min_free_bytes:
+                raise Exception(f"Refusing to write {description}: it takes {num_bytes} bytes, {free_bytes} bytes "
+                                f"are free, and {unwritten_bytes} bytes are still to be written by files being "
+                                f"written, which would leave less than {self.min_free_bytes} bytes free")
+            self._reserved_bytes[file_path] = self._reserved_bytes.get(file_path, 0) + num_bytes
+            return num_bytes
+
+    def release(self, file_path: str, num_bytes: int):
+        with self._lock:
+            reserved_bytes = self._reserved_bytes.get(file_path, 0) - num_bytes
+            if reserved_bytes > 0:
+                self._reserved_bytes[file_path] = reserved_bytes
+            else:
+                self._reserved_bytes.pop(file_path, None)
+
+    def _unwritten_bytes(self) -> int:
+        """
+        Bytes reserved for files being written which are not on disk yet. Compressed files are smaller than their
+        reservations, so they keep counting the difference until they are released.
+        """
+        unwritten_bytes = 0
+        for file_path, reserved_bytes in self._reserved_bytes.items():
+            try:
+                written_bytes = os.path.getsize(file_path)
+            except OSError:
+                written_bytes = 0
+            unwritten_bytes += max(0, reserved_bytes - written_bytes)
+        return unwritten_bytes
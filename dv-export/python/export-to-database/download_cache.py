@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger("download_cache")
+
+
+class DownloadCache:
+    """
+    Persistent, content-addressed cache of downloaded export part files, keyed by ``(export_uuid, file_id)``.
+
+    File contents are stored once under ``objects/`` by their SHA-256 checksum, and ``index.json`` maps each key to
+    its checksum, size, and last use time. Every cache hit is verified against its checksum before it is used.
+    If ``max_bytes`` is provided, the least recently used files are evicted when the cache grows past it.
+    """
+    INDEX_FILE_NAME = 'index.json'
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / 'objects'
+        self.index_path = self.cache_dir / self.INDEX_FILE_NAME
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._index = self._read_index()
+
+    def get(self, export_uuid: str, file_id: int, dest_path: str, variant: str = '') -> Optional[str]:
+        """
+        Place the cached contents of a part file at ``dest_path`` and return their SHA-256 checksum. Returns ``None``
+        if the file is not cached or its cached contents failed the integrity check, in which case the entry is
+        removed.
+
+        :param variant: Distinguishes different encodings of the same part file, such as the file suffix of its
+            compression
+        """
+        key = self._key(export_uuid, file_id, variant)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            sha256 = entry['sha256']
+
+        # The file is placed and verified without holding the lock, so that other downloads are not held up while
+        # it is hashed. A hard link keeps the contents even if the object is evicted in the meantime.
+        try:
+            _link_or_copy(self._object_path(sha256), Path(dest_path))
+            is_intact = sha256_of_file(dest_path) == sha256
+        except FileNotFoundError:
+            is_intact = False
+
+        with self._lock:
+            entry = self._index.get(key)
+            if not is_intact:
+                logger.warning(f"Cached file for {export_uuid=} {file_id=} failed its integrity check")
+                Path(dest_path).unlink(missing_ok=True)
+                if entry is not None and entry['sha256'] == sha256:
+                    self._remove_entry(key)
+                    self._write_index()
+                return None
+            if entry is not None:
+                entry['last_used'] = time.time()
+                self._write_index()
+        return sha256
+
+    def get_size(self, export_uuid: str, file_id: int, variant: str = '') -> Optional[int]:
+        """Return the size in bytes of a cached part file, or ``None`` if it is not cached."""
+        with self._lock:
+            entry = self._index.get(self._key(export_uuid, file_id, variant))
+            return entry['size'] if entry is not None else None
+
+    def put(self, export_uuid: str, file_id: int, src_path: str, variant: str = '', sha256: Optional[str] = None):
+        """
+        Add a downloaded part file to the cache, evicting the least recently used files if needed.
+
+        :param sha256: SHA-256 checksum of the file, if it is already known, so that the file is not read to compute it
+        """
+        sha256 = sha256 or sha256_of_file(src_path)
+        size = os.path.getsize(src_path)
+        object_path = self._object_path(sha256)
+        with self._lock:
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = object_path.with_suffix('.tmp')
+                _link_or_copy(Path(src_path), tmp_path)
+                os.replace(tmp_path, object_path)
+            self._index[self._key(export_uuid, file_id, variant)] = {
+                'sha256': sha256,
+                'size': size,
+                'last_used': time.time(),
+            }
+            self._evict()
+            self._write_index()
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        unique_objects = self._unique_objects()
+        total_bytes = sum(entry['size'] for entry in unique_objects.values())
+        if total_bytes <= self.max_bytes:
+            return
+        # Number of keys referring to each object, so that an object is deleted once its last key is evicted
+        num_keys = Counter(entry['sha256'] for entry in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_used']):
+            if total_bytes <= self.max_bytes:
+                break
+            del self._index[key]
+            num_keys[entry['sha256']] -= 1
+            if num_keys[entry['sha256']] == 0:
+                self._object_path(entry['sha256']).unlink(missing_ok=True)
+                total_bytes -= entry['size']
+                logger.info(f"Evicted file {key} ({entry['size']} bytes) from the download cache")
+
+    def _remove_entry(self, key: str):
+        entry = self._index.pop(key)
+        if entry['sha256'] not in self._unique_objects():
+            self._object_path(entry['sha256']).unlink(missing_ok=True)
+
+    def _unique_objects(self) -> dict:
+        return {entry['sha256']: entry for entry in self._index.values()}
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    def _read_index(self) -> dict:
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _write_index(self):
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _key(export_uuid: str, file_id: int, variant: str = '') -> str:
+        return f"{export_uuid}/{file_id}{variant}"
+
+
+def sha256_of_file(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _link_or_copy(src: Path, dest: Path):
+    """Hard link ``src`` to ``dest`` if they are on the same file system, otherwise copy it."""
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
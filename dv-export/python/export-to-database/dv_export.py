@@ -1,13 +1,26 @@
+import hashlib
 import logging
+import os
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_EXCEPTION
+from contextlib import closing
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, Optional
 
 from visier_platform_sdk import ApiClient, DataVersionExportApi, DataVersionExportScheduleJobRequestDTO, \
     DataVersionExportDTO, ApiException
 
 from data_store import DataStore
-from dv_export_model import FileInfo, TableInfo, ColumnInfoAndFileInfo, convert_table_metadata_into_table_infos
+from constants import STAGING_COMPRESSION_NONE
+from disk_guard import DiskGuard
+from download_cache import DownloadCache
+from job_poller import JobPoller
+from memory_budget import MemoryBudget, reserve_memory
+from staging_compression import check_staging_compression, get_staging_file_suffix, open_staging_file
+from telemetry import Telemetry
+from dv_export_model import FileInfo, TableInfo, ColumnInfoAndFileInfo, FileCheckpoint, \
+    convert_table_metadata_into_table_infos
 
 logger = logging.getLogger('dv_export')
 
@@ -16,27 +29,68 @@ class DVExport:
     """
     Orchestrates interactions between the ``DVExportApiClient`` and the output ``DataStore``
     """
-    def __init__(self, client: ApiClient, data_store: DataStore, base_download_dir: str):
+    def __init__(self,
+                 client: ApiClient,
+                 data_store: DataStore,
+                 base_download_dir: str,
+                 download_concurrency: int = 1,
+                 stream_downloads: bool = False,
+                 download_chunk_size: int = 1024 * 1024,
+                 staging_compression: str = STAGING_COMPRESSION_NONE,
+                 pipeline_queue_size: int = 0,
+                 table_concurrency: int = 1,
+                 apply_deltas: bool = False,
+                 evolve_schemas: bool = False,
+                 resume_from_checkpoints: bool = False,
+                 download_cache: Optional[DownloadCache] = None,
+                 job_poller: Optional[JobPoller] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 memory_budget: Optional[MemoryBudget] = None,
+                 disk_guard: Optional[DiskGuard] = None):
         self.client = DataVersionExportApi(client)
         self.data_store = data_store
         self.base_download_dir = base_download_dir
+        self.download_concurrency = max(1, download_concurrency)
+        self.stream_downloads = stream_downloads
+        self.download_chunk_size = download_chunk_size
+        check_staging_compression(staging_compression)
+        self.staging_compression = staging_compression
+        self.pipeline_queue_size = max(0, pipeline_queue_size)
+        self.table_concurrency = max(1, table_concurrency)
+        self.apply_deltas = apply_deltas
+        self.evolve_schemas = evolve_schemas
+        self.resume_from_checkpoints = resume_from_checkpoints
+        self.download_cache = download_cache
+        self.job_poller = job_poller or JobPoller(timeout_secs=20 * 60)
+        self.telemetry = telemetry or Telemetry()
+        self.memory_budget = memory_budget
+        self.disk_guard = disk_guard
+        # SHA-256 checksums of downloaded part files, by local path, until the files' checkpoints are created
+        self._file_checksums: dict[str, str] = {}
 
     def generate_data_version_export(self,
                                      data_version_number: int,
-                                     base_data_version_number: Optional[int],
-                                     mx_num_polls: int,
-                                     poll_interval_secs: int
-                                     ) -> DataVersionExportDTO:
+                                     base_data_version_number: Optional[int]) -> DataVersionExportDTO:
+        return self.generate_data_version_exports([(data_version_number, base_data_version_number)])[0]
 
-        # Schedule a new export job
-        dv_export_schedule_job_request_dto = DataVersionExportScheduleJobRequestDTO(
-            data_version_number=str(data_version_number),
-            base_data_version_number=str(base_data_version_number) if base_data_version_number else None
-        )
-
-        job_id = self._schedule_export_job(dv_export_schedule_job_request_dto)
-        export_id = self._get_export_id_when_job_finishes(job_id, mx_num_polls, poll_interval_secs)
-        return self.get_export_metadata(export_id)
+    def generate_data_version_exports(self,
+                                      data_version_pairs: list[tuple[int, Optional[int]]]
+                                      ) -> list[DataVersionExportDTO]:
+        """
+        Schedule an export job for each ``(data_version_number, base_data_version_number)`` pair, wait for all of
+        them with a single ``JobPoller`` loop, and return their export metadata in the same order.
+        """
+        job_ids = []
+        for data_version_number, base_data_version_number in data_version_pairs:
+            dv_export_schedule_job_request_dto = DataVersionExportScheduleJobRequestDTO(
+                data_version_number=str(data_version_number),
+                base_data_version_number=str(base_data_version_number) if base_data_version_number else None
+            )
+            job_ids.append(self._schedule_export_job(dv_export_schedule_job_request_dto))
+
+        with self.telemetry.phase('poll', jobs=len(job_ids)):
+            export_ids = self.job_poller.wait_for_jobs(self.client, job_ids)
+        return [self.get_export_metadata(export_ids[job_id]) for job_id in job_ids]
 
     def _schedule_export_job(self,
                              dv_export_schedule_job_request_dto: DataVersionExportScheduleJobRequestDTO
@@ -44,49 +98,26 @@ class DVExport:
         logger.info(f"Scheduling a data version export job for data_version_number={dv_export_schedule_job_request_dto.data_version_number} "
                     f"base_data_version_number={dv_export_schedule_job_request_dto.base_data_version_number}")
         try:
-            response = self.client.schedule_export_job(dv_export_schedule_job_request_dto)
+            with self.telemetry.phase('schedule'):
+                response = self.client.schedule_export_job(dv_export_schedule_job_request_dto)
             job_id = response.job_uuid
             logger.info(f"Scheduled data version export job with {job_id=}")
             return job_id
         except ApiException as e:
             raise Exception(f"Failed to schedule data version export job with {dv_export_schedule_job_request_dto=}\n{e.body}", e)
 
-    def _get_export_id_when_job_finishes(self,
-                                         job_id: str,
-                                         mx_num_polls: int,
-                                         poll_interval_secs: int) -> str:
-        export_id = None
-        counter = 1
-        while counter <= mx_num_polls:
-            try:
-                job_status = self.client.get_export_job_status(job_id)
-
-                if job_status.failed:
-                    raise Exception(f"Data version export {job_id=} failed")
-
-                if job_status.completed:
-                    export_id = job_status.export_uuid
-                    logger.info(f"Export {job_id=} completed with {export_id=}")
-                    break
-
-                repeat_msg = f"Trying again in {poll_interval_secs} seconds" if counter <= mx_num_polls else ""
-                logger.info(f"(Attempt {counter} out of {mx_num_polls}) {job_id=} is still running. {repeat_msg}")
-                if repeat_msg:
-                    time.sleep(poll_interval_secs)
-
-            except ApiException as e:
-                raise Exception(f"Failed to get export job status for {job_id=} response={repr(job_status)}\n{e.body}", e)
-
-            finally:
-                counter += 1
-
-        if export_id is None:
-            raise Exception(f"Failed to retrieve export_id after {mx_num_polls} attempts")
-        return export_id
+    def get_available_data_version_numbers(self) -> list[int]:
+        """Return the data version numbers which are available to export, in ascending order."""
+        try:
+            response = self.client.get_available_data_versions()
+            return sorted(int(data_version.data_version) for data_version in response.data_versions or [])
+        except ApiException as e:
+            raise Exception(f"Failed to get available data versions\n{e.body}", e)
 
     def get_export_metadata(self, export_id: str) -> DataVersionExportDTO:
         try:
-            response = self.client.get_export(export_id)
+            with self.telemetry.phase('metadata'):
+                response = self.client.get_export(export_id)
             logger.info(f"Successfully retrieved export metadata for {export_id=}")
             return response
         except ApiException as e:
@@ -97,24 +128,204 @@ class DVExport:
                                      tbl_name: str,
                                      file_infos: list[FileInfo],
                                      download_directory: str) -> list[str]:
-        file_paths = []
-        for file_info in file_infos:
-            logger.info(f"Downloading file={file_info.name} with id={file_info.file_id} for table={tbl_name}")
+        """
+        Download all part files for a table, using up to ``download_concurrency`` concurrent downloads.
+        The returned file paths are in the same order as ``file_infos``. If any download fails, downloads
+        that have not started yet are cancelled and the error is raised.
+        """
+        if self.download_concurrency == 1 or len(file_infos) <= 1:
+            return [self._download_file(export_uuid, tbl_name, file_info, download_directory)
+                    for file_info in file_infos]
+
+        with ThreadPoolExecutor(max_workers=min(self.download_concurrency, len(file_infos)),
+                                thread_name_prefix='dv-download') as executor:
+            futures = [executor.submit(self._download_file, export_uuid, tbl_name, file_info, download_directory)
+                       for file_info in file_infos]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                if future in done and future.exception() is not None:
+                    for pending in not_done:
+                        pending.cancel()
+                    raise future.exception()
+
+            return [future.result() for future in futures]
+
+    def _iter_downloaded_table_files(self,
+                                     export_uuid: str,
+                                     tbl_name: str,
+                                     file_infos: list[FileInfo],
+                                     download_directory: str) -> Iterator[str]:
+        """
+        Download part files for a table in the background and yield their local paths in export order.
+        At most ``pipeline_queue_size`` files are downloading or waiting to be consumed at any time, so
+        downloads pause while the consumer falls behind.
+        """
+        file_info_itr = iter(file_infos)
+        queued_downloads = deque()
+        with ThreadPoolExecutor(max_workers=min(self.download_concurrency, self.pipeline_queue_size),
+                                thread_name_prefix='dv-download') as executor:
+
+            def queue_next_download() -> bool:
+                file_info = next(file_info_itr, None)
+                if file_info is None:
+                    return False
+                queued_downloads.append(executor.submit(self._download_file,
+                                                        export_uuid,
+                                                        tbl_name,
+                                                        file_info,
+                                                        download_directory))
+                return True
+
+            try:
+                while len(queued_downloads) < self.pipeline_queue_size and queue_next_download():
+                    pass
+                while queued_downloads:
+                    # Time spent waiting here means loading is waiting on downloads rather than the other way round
+                    start = time.perf_counter()
+                    file_path = queued_downloads.popleft().result()
+                    self.telemetry.record('download_wait', time.perf_counter() - start, tbl_name)
+                    queue_next_download()
+                    self.telemetry.gauge('downloads_queued', len(queued_downloads), tbl_name)
+                    self.telemetry.gauge('downloads_ready', sum(future.done() for future in queued_downloads), tbl_name)
+                    yield file_path
+            finally:
+                for future in queued_downloads:
+                    future.cancel()
+
+    def _download_file(self,
+                       export_uuid: str,
+                       tbl_name: str,
+                       file_info: FileInfo,
+                       download_directory: str) -> str:
+        with self.telemetry.phase('download', tbl_name) as metrics:
+            suffix = get_staging_file_suffix(self.staging_compression)
+            file_path = self._get_download_path(file_info, download_directory)
+            cached_sha256 = None
+            if self.download_cache is not None:
+                cached_sha256 = self.download_cache.get(export_uuid, file_info.file_id, file_path, suffix)
+            metrics['cache_hit'] = cached_sha256 is not None
+            if metrics['cache_hit']:
+                logger.info(f"Using cached file={file_info.name} with id={file_info.file_id} "
+                            f"for table={tbl_name} at file={file_path}")
+                metrics['bytes'] = os.path.getsize(file_path)
+                self._record_checksum(file_path, cached_sha256)
+                return file_path
 
-            # Get the ApiResponse
-            api_response = self.client.call_1_alpha_download_file_with_http_info(export_uuid=export_uuid, file_id=file_info.file_id)
-            if api_response.status_code == 200:
-                file_path = download_directory + file_info.name
-                with open(file_path, 'wb') as f:
-                    f.write(api_response.data)
-                file_paths.append(file_path)
-                logger.info(f"Downloaded file={file_info.name} with id={file_info.file_id} "
-                            f"for table={tbl_name} to file={file_path}")
+            logger.info(f"Downloading file={file_info.name} with id={file_info.file_id} for table={tbl_name}")
+            # The file is hashed as it is written, for its checkpoint and the cache, instead of being read back
+            sha256 = hashlib.sha256() if self.resume_from_checkpoints or self.download_cache is not None else None
+            if self.stream_downloads:
+                metrics['bytes'] = self._stream_file_to_path(export_uuid, tbl_name, file_info, file_path, sha256)
             else:
+                metrics['bytes'] = self._read_file_to_path(export_uuid, tbl_name, file_info, file_path, sha256)
+            metrics['stored_bytes'] = os.path.getsize(file_path)
+
+            if self.download_cache is not None:
+                self.download_cache.put(export_uuid, file_info.file_id, file_path, suffix, sha256.hexdigest())
+            if sha256 is not None:
+                self._record_checksum(file_path, sha256.hexdigest())
+            logger.info(f"Downloaded file={file_info.name} with id={file_info.file_id} "
+                        f"for table={tbl_name} to file={file_path}")
+            return file_path
+
+    def _record_checksum(self, file_path: str, sha256: str):
+        if self.resume_from_checkpoints:
+            self._file_checksums[file_path] = sha256
+
+    def _get_download_path(self, file_info: FileInfo, download_directory: str) -> str:
+        # Part files are stored compressed if staging compression is on, and decompressed while they are parsed
+        return download_directory + file_info.name + get_staging_file_suffix(self.staging_compression)
+
+    def _stream_file_to_path(self,
+                             export_uuid: str,
+                             tbl_name: str,
+                             file_info: FileInfo,
+                             file_path: str,
+                             sha256=None) -> int:
+        """
+        Copy the response body to ``file_path`` in chunks of ``download_chunk_size`` bytes, so that
+        only one chunk of the part file is held in memory at a time. Returns the number of bytes downloaded.
+
+        :param sha256: Optional ``hashlib.sha256`` object to update with the bytes written to ``file_path``
+        """
+        response = self.client.call_1_alpha_download_file_without_preload_content(export_uuid=export_uuid,
+                                                                                  file_id=file_info.file_id)
+        try:
+            if response.status != 200:
+                raise Exception(f"Failed to download file={file_info.name} with id={file_info.file_id} "
+                                f"for table={tbl_name}. Status code: {response.status}")
+            content_length = response.headers.get('Content-Length')
+            num_bytes = 0
+            reserved_disk_bytes = 0
+            try:
+                if content_length:
+                    reserved_disk_bytes += self._reserve_disk(tbl_name, file_info, file_path, int(content_length))
+                with reserve_memory(self.memory_budget, self.download_chunk_size, tbl_name), \
+                        open_staging_file(file_path, self.staging_compression, sha256) as f:
+                    for chunk in response.stream(self.download_chunk_size):
+                        if not content_length:
+                            # Disk space for a body of unknown size is reserved one chunk at a time
+                            reserved_disk_bytes += self._reserve_disk(tbl_name, file_info, file_path, len(chunk))
+                        f.write(chunk)
+                        num_bytes += len(chunk)
+            finally:
+                self._release_disk(file_path, reserved_disk_bytes)
+            return num_bytes
+        finally:
+            response.release_conn()
+
+    def _read_file_to_path(self,
+                           export_uuid: str,
+                           tbl_name: str,
+                           file_info: FileInfo,
+                           file_path: str,
+                           sha256=None) -> int:
+        """
+        Read the whole response body into memory and write it to ``file_path``. Memory for the body is reserved
+        from the memory budget once its ``Content-Length`` is known, before the body is read. Returns the number of
+        bytes downloaded.
+
+        :param sha256: Optional ``hashlib.sha256`` object to update with the bytes written to ``file_path``
+        """
+        response = self.client.call_1_alpha_download_file_without_preload_content(export_uuid=export_uuid,
+                                                                                  file_id=file_info.file_id)
+        try:
+            if response.status != 200:
                 raise Exception(f"Failed to download file={file_info.name} with id={file_info.file_id} "
-                                f"for table={tbl_name}. Status code: {api_response.status_code}")
+                                f"for table={tbl_name}. Status code: {response.status}")
+            content_length = response.headers.get('Content-Length')
+            reserved_disk_bytes = 0
+            try:
+                # Disk space is checked before the body is read, unless the body's size is unknown until it is read
+                if content_length:
+                    reserved_disk_bytes = self._reserve_disk(tbl_name, file_info, file_path, int(content_length))
+                # A body of unknown size reserves the whole budget
+                with reserve_memory(self.memory_budget, int(content_length) if content_length else None, tbl_name):
+                    data = response.data
+                    if not content_length:
+                        reserved_disk_bytes = self._reserve_disk(tbl_name, file_info, file_path, len(data))
+                    with open_staging_file(file_path, self.staging_compression, sha256) as f:
+                        f.write(data)
+            finally:
+                self._release_disk(file_path, reserved_disk_bytes)
+            return len(data)
+        finally:
+            response.release_conn()
+
+    def _reserve_disk(self, tbl_name: str, file_info: FileInfo, file_path: str, num_bytes: int) -> int:
+        """
+        Reserve disk space for bytes about to be written to a part file, or raise if they would leave too little
+        free. The size before staging compression is reserved, so the check is conservative.
+        """
+        if self.disk_guard is None:
+            return 0
+        return self.disk_guard.reserve(file_path,
+                                       num_bytes,
+                                       f"file={file_info.name} with id={file_info.file_id} for table={tbl_name}")
 
-        return file_paths
+    def _release_disk(self, file_path: str, num_bytes: int):
+        if self.disk_guard is not None:
+            self.disk_guard.release(file_path, num_bytes)
 
     def _create_and_populate_new_table(self,
                                        table: TableInfo,
@@ -126,20 +337,66 @@ class DVExport:
                                                    column_and_file_info,
                                                    download_directory,
                                                    export_id)
+        self.data_store.create_table_indexes(table)
 
     def _download_files_and_insert_into_table(self,
                                               table_name: str,
                                               column_and_file_info: ColumnInfoAndFileInfo,
                                               download_directory: str,
-                                              export_id: str):
+                                              export_id: str,
+                                              load_files: Optional[Callable[..., None]] = None):
+        """
+        :param load_files: ``DataStore`` method that loads the downloaded files into the table, such as
+            ``apply_delta_from_files_into_table``. Defaults to ``insert_from_files_into_table``.
+        """
+        load_files = load_files or self.data_store.insert_from_files_into_table
+        file_infos = column_and_file_info.file_infos
+        if self.resume_from_checkpoints:
+            completed_file_ids = self.data_store.get_completed_file_ids(export_id, table_name)
+            file_infos = [file_info for file_info in file_infos if file_info.file_id not in completed_file_ids]
+            num_skipped = len(column_and_file_info.file_infos) - len(file_infos)
+            if num_skipped > 0:
+                logger.info(f"Skipping {num_skipped} files for table={table_name} "
+                            f"which were already loaded for export={export_id}")
+            if len(file_infos) == 0:
+                return
+
+        if self.pipeline_queue_size > 0:
+            # The data store takes each file as soon as it is downloaded while the next files download in the
+            # background, so it can parse files ahead of the one it is inserting
+            file_paths = [self._get_download_path(file_info, download_directory) for file_info in file_infos]
+            with closing(self._iter_downloaded_table_files(export_id,
+                                                           table_name,
+                                                           file_infos,
+                                                           download_directory)) as downloaded_files:
+                load_files(table_name,
+                           column_and_file_info.column_infos,
+                           downloaded_files,
+                           checkpoints=self._get_checkpoints(export_id, file_infos, file_paths))
+            return
+
         local_files_for_table = self._download_table_files_to_dir(export_id,
                                                                   table_name,
-                                                                  column_and_file_info.file_infos,
+                                                                  file_infos,
                                                                   download_directory)
 
-        self.data_store.insert_from_files_into_table(table_name,
-                                                     column_and_file_info.column_infos,
-                                                     local_files_for_table)
+        load_files(table_name,
+                   column_and_file_info.column_infos,
+                   local_files_for_table,
+                   checkpoints=self._get_checkpoints(export_id, file_infos, local_files_for_table))
+
+    def _get_checkpoints(self,
+                         export_id: str,
+                         file_infos: list[FileInfo],
+                         file_paths: list[str]) -> Optional[Iterator[FileCheckpoint]]:
+        """
+        Return the checkpoints of the files, which are created as they are requested from the checksums computed
+        while the files were downloaded. The data store requests each checkpoint after the file is downloaded.
+        """
+        if not self.resume_from_checkpoints:
+            return None
+        return (FileCheckpoint(export_id, file_info.file_id, self._file_checksums.pop(file_path))
+                for file_info, file_path in zip(file_infos, file_paths))
 
     def _create_and_populate_new_tables(self, tables: list[TableInfo], export_id: str):
         """
@@ -149,16 +406,45 @@ class DVExport:
         :param tables: List of ``TableInfo`` to create and populate tables for
         :param export_id: UUID of the export metadata from a DV export job
         """
-        itr = 1
-        for table in tables:
-            logger.info(f"Starting storage of table={table.name} ({itr} out of {len(tables)} tables) in data_store")
-            download_directory = self.base_download_dir + export_id + "/new-columns/" + table.name + "/"
-            Path(download_directory).mkdir(parents=True, exist_ok=True)
+        if self.table_concurrency == 1 or len(tables) <= 1:
+            itr = 1
+            for table in tables:
+                logger.info(f"Starting storage of table={table.name} ({itr} out of {len(tables)} tables) in data_store")
+                self._store_new_table(table, export_id)
+                itr += 1
+            return
+
+        logger.info(f"Storing {len(tables)} tables in data_store, {self.table_concurrency} tables at a time")
+        with ThreadPoolExecutor(max_workers=self.table_concurrency, thread_name_prefix='dv-table') as executor:
+            future_to_table = {}
+            for table in tables:
+                future_to_table[executor.submit(self._store_new_table, table, export_id)] = table
+            try:
+                num_completed = 0
+                for future in as_completed(future_to_table):
+                    future.result()
+                    num_completed += 1
+                    logger.info(f"Finished storage of table={future_to_table[future].name} "
+                                f"({num_completed} out of {len(tables)} tables completed)")
+            except BaseException:
+                for future in future_to_table:
+                    future.cancel()
+                raise
+
+    def _store_new_table(self, table: TableInfo, export_id: str):
+        """
+        Create a table and populate it from its part files. Tables are independent of each other, so this can run
+        concurrently for different tables; each call uses its own connections from the data store.
+        """
+        if self.table_concurrency > 1:
+            logger.info(f"Starting storage of table={table.name} in data_store")
+        download_directory = self.base_download_dir + export_id + "/new-columns/" + table.name + "/"
+        Path(download_directory).mkdir(parents=True, exist_ok=True)
+        with self.telemetry.phase('table', table.name):
             self._create_and_populate_new_table(table,
                                                 table.columns.new_columns,
                                                 download_directory,
                                                 export_id)
-            itr += 1
 
     def _handle_delta_export(self,
                              tables: list[TableInfo],
@@ -182,24 +468,60 @@ class DVExport:
 
         self._create_and_populate_new_tables(new_table_infos, export_id)
 
-        existing_tables = [tbl_info for tbl_info in tables if tbl_info not in new_tables]
+        existing_tables = [tbl_info for tbl_info in tables if tbl_info.name not in new_tables]
         itr = 1
         for existing_tbl in existing_tables:
             logger.info(f"Processing existing table={existing_tbl.name} "
                         f"({itr} out of {len(existing_tables)} tables)")
             new_column_and_file_info = existing_tbl.columns.new_columns
             deleted_columns = existing_tbl.columns.deleted_columns
+            has_schema_changes = len(new_column_and_file_info.column_infos) != 0 or len(deleted_columns) != 0
 
-            if len(new_column_and_file_info.column_infos) == 0 and len(deleted_columns) == 0:
+            if not has_schema_changes:
                 logger.info(f"There are no schema changes for table={existing_tbl.name}.")
-                download_directory = self.base_download_dir + export_id + "/common-columns/" + existing_tbl.name + "/"
+            elif self.evolve_schemas:
+                self._evolve_table_schema(existing_tbl)
+            else:
+                logger.warning(f"Skipping table={existing_tbl.name} because it has schema changes. "
+                               f"Run a full export or enable schema evolution to update it.")
+                itr += 1
+                continue
+
+            download_directory = self.base_download_dir + export_id + "/common-columns/" + existing_tbl.name + "/"
+            Path(download_directory).mkdir(parents=True, exist_ok=True)
+            load_files = self.data_store.apply_delta_from_files_into_table if self.apply_deltas else None
+            self._download_files_and_insert_into_table(existing_tbl.name,
+                                                       existing_tbl.columns.common_columns,
+                                                       download_directory,
+                                                       export_id,
+                                                       load_files=load_files)
+
+            if has_schema_changes and len(new_column_and_file_info.file_infos) != 0:
+                # Backfill the new columns for every row, including rows inserted from the common column files
+                download_directory = self.base_download_dir + export_id + "/new-columns/" + existing_tbl.name + "/"
                 Path(download_directory).mkdir(parents=True, exist_ok=True)
                 self._download_files_and_insert_into_table(existing_tbl.name,
-                                                           existing_tbl.columns.common_columns,
+                                                           new_column_and_file_info,
                                                            download_directory,
-                                                           export_id)
+                                                           export_id,
+                                                           load_files=self.data_store.update_columns_from_files)
             itr += 1
 
+    def _evolve_table_schema(self, table: TableInfo):
+        """
+        Drop deleted columns from an existing table and add its new columns, which are empty until they are
+        backfilled from the new column files.
+        """
+        deleted_columns = table.columns.deleted_columns
+        new_column_infos = [column_info for column_info in table.columns.new_columns.column_infos
+                            if not column_info.primary_key]
+        logger.info(f"Evolving schema of table={table.name}: dropping columns={deleted_columns}, "
+                    f"adding columns={[column_info.name for column_info in new_column_infos]}")
+        for column_name in deleted_columns:
+            self.data_store.drop_column(table.name, column_name)
+        for column_info in new_column_infos:
+            self.data_store.add_column(table.name, column_info)
+
     def process_metadata(self,
                          metadata: DataVersionExportDTO):
         """
@@ -210,10 +532,17 @@ class DVExport:
         """
         export_id = metadata.uuid
         tables = convert_table_metadata_into_table_infos(metadata.tables)
+        self.data_store.begin_export(export_id, metadata.data_version_number)
+
+        initial_export = is_initial_export(metadata)
+
+        with self.telemetry.phase('export', export_uuid=export_id, is_initial_export=initial_export):
+            if initial_export:
+                self._create_and_populate_new_tables(tables, export_id)
+            else:
+                self._handle_delta_export(tables, metadata, export_id)
 
-        is_initial_export = (len(metadata.tables) if metadata.tables else 0) == (len(metadata.new_tables) if metadata.new_tables else 0)
 
-        if is_initial_export:
-            self._create_and_populate_new_tables(tables, export_id)
-        else:
-            self._handle_delta_export(tables, metadata, export_id)
+def is_initial_export(metadata: DataVersionExportDTO) -> bool:
+    """An export is an initial export if every table in it is new."""
+    return (len(metadata.tables) if metadata.tables else 0) == (len(metadata.new_tables) if metadata.new_tables else 0)
@@ -13,6 +13,18 @@ class DVExportDataType(Enum):
     Boolean = 5
 
 
+# Approximate number of characters of each data type in a part file, used to estimate rows from file sizes
+ESTIMATED_VALUE_BYTES = {
+    DVExportDataType.String: 16,
+    DVExportDataType.Integer: 8,
+    DVExportDataType.Number: 10,
+    DVExportDataType.Date: 13,
+    DVExportDataType.Boolean: 5,
+}
+# The _DiffAction_ value, its separator, and the line break of each row
+ESTIMATED_ROW_OVERHEAD_BYTES = 3
+
+
 def string_to_data_type(string_value: str) -> DVExportDataType:
     try:
         return DVExportDataType[string_value]
@@ -34,6 +46,12 @@ class ColumnInfo:
     primary_key: bool
 
 
+def estimate_row_bytes(column_infos: list[ColumnInfo]) -> int:
+    """Estimate the average size of a row in a part file with ``column_infos``, including separators."""
+    return ESTIMATED_ROW_OVERHEAD_BYTES + sum(ESTIMATED_VALUE_BYTES[column_info.data_type] + 1
+                                              for column_info in column_infos)
+
+
 @dataclass
 class ColumnInfoAndFileInfo:
     column_infos: list[ColumnInfo]
@@ -47,6 +65,14 @@ class ColumnsMetadata:
     deleted_columns: list[str]
 
 
+@dataclass
+class FileCheckpoint:
+    """Identifies a downloaded part file so that its load can be recorded and skipped when an export is resumed."""
+    export_uuid: str
+    file_id: int
+    checksum: str
+
+
 @dataclass
 class TableInfo:
     name: str
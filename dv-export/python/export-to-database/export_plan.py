@@ -0,0 +1,263 @@
+import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from visier_platform_sdk import DataVersionExportDTO
+
+from data_store import SQLAlchemyDataStore
+from dv_export import DVExport, is_initial_export
+from dv_export_model import ColumnInfo, ColumnInfoAndFileInfo, FileInfo, TableInfo, \
+    convert_table_metadata_into_table_infos, estimate_row_bytes
+from memory_budget import STAGING_COMPRESSION_RATIO
+from staging_compression import get_staging_file_suffix
+
+logger = logging.getLogger("export_plan")
+
+# Upper bound of the recommended DOWNLOAD_CONCURRENCY, beyond which the API rather than the client limits downloads
+MAX_RECOMMENDED_DOWNLOAD_CONCURRENCY = 8
+
+ACTION_CREATE = 'create'
+ACTION_APPEND = 'append'
+ACTION_MERGE = 'merge'
+ACTION_EVOLVE = 'evolve'
+ACTION_SKIP = 'skip'
+ACTION_DROP = 'drop'
+
+
+@dataclass
+class TablePlan:
+    name: str
+    action: str
+    num_files: int = 0
+    estimated_bytes: int = 0
+    estimated_rows: int = 0
+    # Number of files whose size could not be determined, which are missing from the estimates
+    num_unsized_files: int = 0
+    new_columns: list[str] = field(default_factory=list)
+    deleted_columns: list[str] = field(default_factory=list)
+    notes: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ExportPlan:
+    export_uuid: str
+    data_version_number: Optional[str]
+    is_initial_export: bool
+    tables: list[TablePlan]
+    recommended_table_concurrency: int
+    recommended_download_concurrency: int
+
+    @property
+    def estimated_bytes(self) -> int:
+        return sum(table.estimated_bytes for table in self.tables)
+
+    @property
+    def estimated_rows(self) -> int:
+        return sum(table.estimated_rows for table in self.tables)
+
+    @property
+    def num_files(self) -> int:
+        return sum(table.num_files for table in self.tables)
+
+
+class ExportPlanner:
+    """
+    Describes what ``DVExport.process_metadata`` would do with an export without downloading or writing anything:
+    which tables would be created, dropped, appended to, merged, evolved, or skipped, how many part files and
+    roughly how many bytes and rows each would load, and which parallelism settings suit the export.
+
+    File sizes are taken from the ``DownloadCache`` index where possible, scaled up by the estimated compression
+    ratio if files are cached compressed. Otherwise each file's download is requested and only its
+    ``Content-Length`` header is read before the connection is closed.
+    """
+
+    def __init__(self, dv_export: DVExport, probe_concurrency: Optional[int] = None):
+        """
+        :param dv_export: The ``DVExport`` whose settings and data store the plan is for
+        :param probe_concurrency: Number of file sizes to request at a time. Defaults to the number of concurrent
+            downloads ``dv_export`` would make
+        """
+        self.dv_export = dv_export
+        self.probe_concurrency = probe_concurrency or dv_export.download_concurrency * dv_export.table_concurrency
+
+    def plan(self, metadata: DataVersionExportDTO) -> ExportPlan:
+        export_id = metadata.uuid
+        tables = convert_table_metadata_into_table_infos(metadata.tables)
+        initial_export = is_initial_export(metadata)
+
+        table_plans = []
+        if not initial_export:
+            for deleted_table in metadata.deleted_tables:
+                table_plans.append(TablePlan(deleted_table, ACTION_DROP))
+        new_tables = [table.name for table in tables] if initial_export else metadata.new_tables
+        table_files = []
+        for table in tables:
+            if table.name in new_tables:
+                table_plan = self._plan_new_table(table)
+                files_to_load = [table.columns.new_columns]
+            else:
+                table_plan = self._plan_existing_table(table)
+                files_to_load = self._files_to_load_into_existing_table(table, table_plan.action)
+            table_plans.append(table_plan)
+            for column_and_file_info in files_to_load:
+                for file_info in column_and_file_info.file_infos:
+                    table_files.append((table_plan, column_and_file_info.column_infos, file_info))
+
+        self._estimate_sizes(export_id, table_files)
+        table_concurrency, download_concurrency = recommend_parallelism(table_plans)
+        return ExportPlan(export_id,
+                          metadata.data_version_number,
+                          initial_export,
+                          table_plans,
+                          table_concurrency,
+                          download_concurrency)
+
+    def _plan_new_table(self, table: TableInfo) -> TablePlan:
+        data_store = self.dv_export.data_store
+        if not data_store.has_table(table.name):
+            return TablePlan(table.name, ACTION_CREATE)
+        if not isinstance(data_store, SQLAlchemyDataStore):
+            return TablePlan(table.name,
+                             ACTION_APPEND,
+                             notes=["table already exists, so rows are added to it rather than a new table"])
+        if data_store.shadow_load:
+            return TablePlan(table.name, ACTION_CREATE, notes=["replaces the existing table once it is loaded"])
+        # The checkpoint table is not read while planning, so whether this export was interrupted is unknown
+        if self.dv_export.resume_from_checkpoints:
+            return TablePlan(table.name,
+                             ACTION_APPEND,
+                             notes=["table already exists; loading resumes into it if this export was interrupted, "
+                                    "and fails otherwise"])
+        return TablePlan(table.name,
+                         ACTION_CREATE,
+                         notes=["table already exists, so loading it would fail; drop it or enable SHADOW_LOAD"])
+
+    def _plan_existing_table(self, table: TableInfo) -> TablePlan:
+        new_columns = [column_info.name for column_info in table.columns.new_columns.column_infos
+                       if not column_info.primary_key]
+        deleted_columns = list(table.columns.deleted_columns)
+        has_schema_changes = len(table.columns.new_columns.column_infos) != 0 or len(deleted_columns) != 0
+
+        if has_schema_changes and not self.dv_export.evolve_schemas:
+            action = ACTION_SKIP
+        elif has_schema_changes:
+            action = ACTION_EVOLVE
+        elif self.dv_export.apply_deltas:
+            action = ACTION_MERGE
+        else:
+            action = ACTION_APPEND
+        table_plan = TablePlan(table.name, action, new_columns=new_columns, deleted_columns=deleted_columns)
+
+        if action == ACTION_SKIP:
+            table_plan.notes.append("has schema changes; enable EVOLVE_SCHEMAS or run a full export to update it")
+        if not self.dv_export.data_store.has_table(table.name):
+            table_plan.notes.append("table does not exist in the data store, so loading it would fail")
+        return table_plan
+
+    def _estimate_sizes(self,
+                        export_id: str,
+                        table_files: list[tuple[TablePlan, list[ColumnInfo], FileInfo]]):
+        """
+        Fill in the number of files and estimated bytes and rows of each table from the files that would be
+        loaded into it, given as ``(table_plan, column_infos, file_info)`` tuples.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.probe_concurrency),
+                                thread_name_prefix='dv-plan') as executor:
+            file_sizes = executor.map(lambda table_file: self._get_file_size(export_id, table_file[2]), table_files)
+            for (table_plan, column_infos, file_info), file_size in zip(table_files, file_sizes):
+                table_plan.num_files += 1
+                if file_size is None:
+                    table_plan.num_unsized_files += 1
+                    continue
+                table_plan.estimated_bytes += file_size
+                table_plan.estimated_rows += file_size // estimate_row_bytes(column_infos)
+
+    @staticmethod
+    def _files_to_load_into_existing_table(table: TableInfo, action: str) -> list[ColumnInfoAndFileInfo]:
+        if action == ACTION_SKIP:
+            return []
+        if action == ACTION_EVOLVE:
+            # The common column files are loaded first, then the new column files backfill every row
+            return [table.columns.common_columns, table.columns.new_columns]
+        return [table.columns.common_columns]
+
+    def _get_file_size(self, export_id: str, file_info: FileInfo) -> Optional[int]:
+        """
+        Return the size of a part file in bytes before staging compression, or ``None`` if it is unknown. The
+        response body is never read; the connection is closed instead of being returned to the pool, so that the
+        body is discarded.
+        """
+        download_cache = self.dv_export.download_cache
+        if download_cache is not None:
+            # Files are cached as they were staged, so the cache has a separate entry for each staging compression
+            suffix = get_staging_file_suffix(self.dv_export.staging_compression)
+            cached_size = download_cache.get_size(export_id, file_info.file_id, suffix)
+            if cached_size is not None:
+                return cached_size * STAGING_COMPRESSION_RATIO if suffix else cached_size
+
+        response = self.dv_export.client.call_1_alpha_download_file_without_preload_content(
+            export_uuid=export_id,
+            file_id=file_info.file_id)
+        try:
+            if response.status != 200:
+                raise Exception(f"Failed to get the size of file={file_info.name} with id={file_info.file_id}. "
+                                f"Status code: {response.status}")
+            content_length = response.headers.get('Content-Length')
+            if content_length is None:
+                logger.warning(f"Size of file={file_info.name} with id={file_info.file_id} is unknown")
+                return None
+            return int(content_length)
+        finally:
+            response.close()
+
+
+def recommend_parallelism(table_plans: list[TablePlan]) -> tuple[int, int]:
+    """
+    Recommend ``TABLE_CONCURRENCY`` and ``DOWNLOAD_CONCURRENCY`` for the tables that would be loaded.
+
+    Tables load concurrently, so an export takes at least as long as its largest table. Loading more tables at a
+    time than fit alongside the largest one does not shorten the export, nor does loading more tables than there
+    are CPUs to parse them. Downloads within a table are limited by its number of files.
+    """
+    loaded_tables = [table_plan for table_plan in table_plans if table_plan.num_files > 0]
+    if len(loaded_tables) == 0:
+        return 1, 1
+
+    total_bytes = sum(table_plan.estimated_bytes for table_plan in loaded_tables)
+    largest_bytes = max(table_plan.estimated_bytes for table_plan in loaded_tables)
+    tables_alongside_largest = math.ceil(total_bytes / largest_bytes) if largest_bytes > 0 else len(loaded_tables)
+    table_concurrency = max(1, min(len(loaded_tables), os.cpu_count() or 1, tables_alongside_largest))
+    largest_num_files = max(table_plan.num_files for table_plan in loaded_tables)
+    download_concurrency = max(1, min(largest_num_files, MAX_RECOMMENDED_DOWNLOAD_CONCURRENCY))
+    return table_concurrency, download_concurrency
+
+
+def format_export_plan(plan: ExportPlan) -> str:
+    """Format an ``ExportPlan`` as a report with one line per table."""
+    lines = [
+        f"Plan for {'initial' if plan.is_initial_export else 'delta'} export={plan.export_uuid} "
+        f"of data_version={plan.data_version_number}",
+        f"{'Table':<40} {'Action':<7} {'Files':>6} {'Est. MB':>10} {'Est. rows':>12}  Schema changes",
+    ]
+    for table in plan.tables:
+        schema_changes = ', '.join([f"+{column}" for column in table.new_columns] +
+                                   [f"-{column}" for column in table.deleted_columns])
+        lines.append(f"{table.name:<40} {table.action:<7} {table.num_files:>6} "
+                     f"{table.estimated_bytes / (1024 * 1024):>10.1f} {table.estimated_rows:>12}  {schema_changes}")
+        if table.num_unsized_files > 0:
+            lines.append(f"    {table.num_unsized_files} files have an unknown size and are not in the estimates")
+        for note in table.notes:
+            lines.append(f"    {note}")
+
+    action_counts = {}
+    for table in plan.tables:
+        action_counts[table.action] = action_counts.get(table.action, 0) + 1
+    lines.append(f"Total: {plan.num_files} files, {plan.estimated_bytes / (1024 * 1024):.1f} MB, "
+                 f"about {plan.estimated_rows} rows; " +
+                 ', '.join(f"{count} to {action}" for action, count in action_counts.items()))
+    lines.append(f"Recommended: TABLE_CONCURRENCY={plan.recommended_table_concurrency} "
+                 f"DOWNLOAD_CONCURRENCY={plan.recommended_download_concurrency}")
+    return '\n'.join(lines)
@@ -0,0 +1,106 @@
+import heapq
+import logging
+import random
+import time
+from typing import Callable
+
+from visier_platform_sdk import DataVersionExportApi, ApiException
+
+logger = logging.getLogger("job_poller")
+
+# Status codes for which polling backs off and tries again instead of failing
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class JobPoller:
+    """
+    Waits for data version export jobs to finish by polling their status with exponential backoff and jitter.
+
+    Each job is first polled ``initial_interval_secs`` after polling starts. Every poll which finds the job still
+    running multiplies its interval by ``multiplier``, up to ``max_interval_secs``. Intervals are randomized by up to
+    ``jitter`` (a fraction of the interval) so that jobs scheduled together are not polled in lockstep. Any number of
+    jobs are tracked by a single loop which sleeps until the next job is due.
+    """
+
+    def __init__(self,
+                 timeout_secs: float,
+                 initial_interval_secs: float = 1,
+                 max_interval_secs: float = 60,
+                 multiplier: float = 2,
+                 jitter: float = 0.2,
+                 sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param timeout_secs: Maximum time to wait for all jobs to finish
+        :param initial_interval_secs: Time before the first poll of each job
+        :param max_interval_secs: Maximum time between polls of a job
+        :param multiplier: Factor the interval grows by after each poll which finds a job still running
+        :param jitter: Fraction of each interval by which it is randomly lengthened or shortened
+        :param sleep: Function used to wait between polls
+        :param clock: Monotonic clock used to schedule polls
+        """
+        self.timeout_secs = timeout_secs
+        self.initial_interval_secs = initial_interval_secs
+        self.max_interval_secs = max(initial_interval_secs, max_interval_secs)
+        self.multiplier = max(1, multiplier)
+        self.jitter = jitter
+        self._sleep = sleep
+        self._clock = clock
+
+    def wait_for_job(self, client: DataVersionExportApi, job_id: str) -> str:
+        """Wait for a single job to finish and return its export UUID."""
+        return self.wait_for_jobs(client, [job_id])[job_id]
+
+    def wait_for_jobs(self, client: DataVersionExportApi, job_ids: list[str]) -> dict[str, str]:
+        """
+        Wait for all jobs to finish and return a dictionary of job ID to export UUID. Raises as soon as any job fails,
+        or if the jobs are not all finished within ``timeout_secs``.
+        """
+        start = self._clock()
+        deadline = start + self.timeout_secs
+        # Heap of (next poll time, job ID, current interval, number of polls so far)
+        schedule = [(min(start + self._with_jitter(self.initial_interval_secs), deadline),
+                     job_id, self.initial_interval_secs, 0) for job_id in job_ids]
+        heapq.heapify(schedule)
+        export_ids = {}
+
+        while schedule:
+            due_at, job_id, interval, num_polls = heapq.heappop(schedule)
+            now = self._clock()
+            if due_at > now:
+                self._sleep(due_at - now)
+
+            num_polls += 1
+            try:
+                job_status = client.get_export_job_status(job_id)
+            except ApiException as e:
+                if e.status not in RETRYABLE_STATUS_CODES:
+                    raise Exception(f"Failed to get export job status for {job_id=}\n{e.body}", e)
+                logger.warning(f"(Attempt {num_polls}) Getting status for {job_id=} failed with status={e.status}")
+                job_status = None
+
+            if job_status is not None and job_status.failed:
+                raise Exception(f"Data version export {job_id=} failed")
+
+            if job_status is not None and job_status.completed:
+                export_ids[job_id] = job_status.export_uuid
+                logger.info(f"Export {job_id=} completed with export_id={job_status.export_uuid} "
+                            f"after {num_polls} polls and {self._clock() - start:.1f} seconds")
+                continue
+
+            now = self._clock()
+            if now >= deadline:
+                pending_job_ids = [job_id] + [job[1] for job in schedule]
+                raise Exception(f"Export jobs {pending_job_ids} did not finish within {self.timeout_secs} seconds")
+
+            # The last poll is moved up to the deadline so that a job finishing just before it is still seen
+            interval = min(interval * self.multiplier, self.max_interval_secs)
+            next_poll_at = min(now + self._with_jitter(interval), deadline)
+            logger.info(f"(Attempt {num_polls}) {job_id=} is still running. "
+                        f"Trying again in {next_poll_at - now:.1f} seconds")
+            heapq.heappush(schedule, (next_poll_at, job_id, interval, num_polls))
+
+        return export_ids
+
+    def _with_jitter(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -1,21 +1,32 @@
 import argparse
+import os
 import shutil
 
 from dotenv import dotenv_values
+from sqlalchemy.engine import make_url
 from visier_platform_sdk import ApiClient, Configuration, DataVersionExportScheduleJobRequestDTO
 
 from data_store import *
+from disk_guard import DiskGuard
+from download_cache import DownloadCache
+from catch_up import CatchUp
 from dv_export import DVExport
+from export_plan import ExportPlanner, format_export_plan
+from job_poller import JobPoller
+from memory_budget import MemoryBudget
+from parquet_data_store import ParquetDataStore
+from schema_cache import SchemaCache
+from telemetry import Telemetry
 
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+    format='%(asctime)s [%(levelname)s] [%(threadName)s] %(name)s: %(message)s',
     filename='app.log',
     filemode='w',
 )
 console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s'))
+console_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] [%(threadName)s] %(name)s: %(message)s'))
 logger = logging.getLogger()
 logger.addHandler(console_handler)
 
@@ -32,34 +43,139 @@ parser.add_argument('-b', '--base_data_version', type=int,
 parser.add_argument('-e', '--export_uuid', required=False, type=str,
                     help='Optional export UUID to retrieve export metadata for. '
                          'If provided, a DV export job will not be scheduled.')
+parser.add_argument('-c', '--catch_up', action='store_true',
+                    help='Load every data version after base_data_version up to data_version as a chain of '
+                         'delta exports. Progress is recorded in CATCH_UP_STATE_FILE so that an interrupted '
+                         'catch-up resumes where it stopped.')
+parser.add_argument('-p', '--plan', action='store_true',
+                    help='Report the tables the export would create, drop, append to, or skip, with their file counts '
+                         'and estimated sizes, and recommend parallelism settings, without downloading or loading '
+                         'anything.')
 
 args = parser.parse_args()
 if args.data_version is None and args.export_uuid is None:
     raise Exception(f"At least one of data_version or export_uuid must be provided")
+if args.catch_up and args.base_data_version is None:
+    raise Exception(f"base_data_version must be provided to catch up")
+if args.catch_up and args.data_version is None:
+    raise Exception(f"data_version must be provided to catch up")
+if args.catch_up and args.plan:
+    raise Exception(f"A catch-up cannot be planned; plan each export with --export_uuid instead")
 
 # Set up some parameters/objects from config used in the operation
 max_num_polls = int(config_dict[JOB_STATUS_NUM_POLLS])
 poll_interval_seconds = int(config_dict[JOB_STATUS_POLL_INTERVAL_SECONDS])
+# Polls back off up to the configured interval, and give up after the same total time as fixed interval polling
+job_poller = JobPoller(timeout_secs=max_num_polls * poll_interval_seconds,
+                       initial_interval_secs=float(config_dict.get(JOB_STATUS_INITIAL_POLL_INTERVAL_SECONDS, 2)),
+                       max_interval_secs=poll_interval_seconds)
 delete_downloaded_files = True if config_dict[DELETE_BASE_DOWNLOAD_DIRECTORY_AFTER_EXPORT].upper() == 'TRUE' else False
 base_download_directory = config_dict[BASE_DOWNLOAD_DIRECTORY]
-store = SQLAlchemyDataStore(config_dict[DB_URL])
+delete_loaded_files = config_dict.get(DELETE_LOADED_FILES, 'False').upper() == 'TRUE'
+disk_guard = DiskGuard(int(config_dict[MIN_FREE_DISK_BYTES])) if config_dict.get(MIN_FREE_DISK_BYTES) else None
+# A plan writes nothing, so it records no telemetry and only reads a download cache which already exists
+if args.plan:
+    telemetry = Telemetry()
+else:
+    telemetry = Telemetry(config_dict.get(TELEMETRY_JSONL_FILE), config_dict.get(TELEMETRY_PROMETHEUS_FILE))
+download_cache = None
+download_cache_directory = config_dict.get(DOWNLOAD_CACHE_DIRECTORY)
+if download_cache_directory and (not args.plan or os.path.isdir(download_cache_directory)):
+    cache_max_bytes = int(config_dict[DOWNLOAD_CACHE_MAX_BYTES]) if config_dict.get(DOWNLOAD_CACHE_MAX_BYTES) else None
+    download_cache = DownloadCache(download_cache_directory, cache_max_bytes)
+download_concurrency = int(config_dict.get(DOWNLOAD_CONCURRENCY, 1))
+stream_downloads = config_dict.get(STREAM_DOWNLOADS, 'False').upper() == 'TRUE'
+download_chunk_size = int(config_dict.get(DOWNLOAD_CHUNK_SIZE_BYTES, 1024 * 1024))
+staging_compression = config_dict.get(STAGING_COMPRESSION, STAGING_COMPRESSION_NONE)
+pipeline_queue_size = int(config_dict.get(PIPELINE_QUEUE_SIZE, 0))
+table_concurrency = int(config_dict.get(TABLE_CONCURRENCY, 1))
+apply_deltas = config_dict.get(APPLY_DELTAS, 'False').upper() == 'TRUE'
+evolve_schemas = config_dict.get(EVOLVE_SCHEMAS, 'False').upper() == 'TRUE'
+resume_from_checkpoints = config_dict.get(RESUME_FROM_CHECKPOINTS, 'False').upper() == 'TRUE'
+csv_chunk_size = int(config_dict[CSV_CHUNK_SIZE_ROWS]) if config_dict.get(CSV_CHUNK_SIZE_ROWS) else None
+native_bulk_load = config_dict.get(NATIVE_BULK_LOAD, 'False').upper() == 'TRUE'
+parse_engine = config_dict.get(PARSE_ENGINE, PARSE_ENGINE_PANDAS)
+parse_workers = int(config_dict[PARSE_WORKERS]) if config_dict.get(PARSE_WORKERS) else None
+dtype_profile = config_dict.get(DTYPE_PROFILE, DTYPE_PROFILE_DEFAULT)
+defer_indexes = config_dict.get(DEFER_INDEXES, 'False').upper() == 'TRUE'
+index_build_workers = int(config_dict[INDEX_BUILD_WORKERS]) if config_dict.get(INDEX_BUILD_WORKERS) else None
+shadow_load = config_dict.get(SHADOW_LOAD, 'False').upper() == 'TRUE'
+memory_budget = None
+if config_dict.get(MEMORY_BUDGET_BYTES):
+    memory_budget = MemoryBudget(int(config_dict[MEMORY_BUDGET_BYTES]), telemetry)
+if config_dict[DB_URL].startswith(PARQUET_URL_PREFIX):
+    store = ParquetDataStore(config_dict[DB_URL][len(PARQUET_URL_PREFIX):],
+                             compression=config_dict.get(PARQUET_COMPRESSION, 'zstd'),
+                             streaming=csv_chunk_size is not None,
+                             telemetry=telemetry,
+                             delete_loaded_files=delete_loaded_files)
+else:
+    schema_cache = None
+    if config_dict.get(SCHEMA_CACHE_FILE):
+        schema_cache = SchemaCache(config_dict[SCHEMA_CACHE_FILE],
+                                   make_url(config_dict[DB_URL]).render_as_string(hide_password=True))
+    store = SQLAlchemyDataStore(config_dict[DB_URL],
+                                csv_chunk_size=csv_chunk_size,
+                                native_bulk_load=native_bulk_load,
+                                parse_engine=parse_engine,
+                                dtype_profile=dtype_profile,
+                                pool_size=table_concurrency if table_concurrency > 1 else None,
+                                # A plan must not create the checkpoint table or start parse workers
+                                checkpoints=resume_from_checkpoints and not args.plan,
+                                defer_indexes=defer_indexes,
+                                index_build_workers=index_build_workers,
+                                telemetry=telemetry,
+                                schema_cache=schema_cache,
+                                parse_workers=None if args.plan else parse_workers,
+                                shadow_load=shadow_load,
+                                memory_budget=memory_budget,
+                                delete_loaded_files=delete_loaded_files,
+                                disk_guard=disk_guard)
 
 config = Configuration.from_dict(config_dict)
+# Make sure every concurrent download can hold its own connection
+config.connection_pool_maxsize = max(config.connection_pool_maxsize, download_concurrency * table_concurrency)
 client = ApiClient(config)
 
-dv_export = DVExport(client, store, base_download_directory)
+dv_export = DVExport(client,
+                     store,
+                     base_download_directory,
+                     download_concurrency=download_concurrency,
+                     stream_downloads=stream_downloads,
+                     download_chunk_size=download_chunk_size,
+                     staging_compression=staging_compression,
+                     pipeline_queue_size=pipeline_queue_size,
+                     table_concurrency=table_concurrency,
+                     apply_deltas=apply_deltas,
+                     evolve_schemas=evolve_schemas,
+                     resume_from_checkpoints=resume_from_checkpoints,
+                     download_cache=download_cache,
+                     job_poller=job_poller,
+                     telemetry=telemetry,
+                     memory_budget=memory_budget,
+                     disk_guard=disk_guard)
 
-if args.export_uuid is None:
-    export_metadata = dv_export.generate_data_version_export(args.data_version,
-                                                             args.base_data_version,
-                                                             max_num_polls,
-                                                             poll_interval_seconds)
-    logger.info(f"Export metadata generated with export_uuid={export_metadata.uuid}")
+try:
+    if args.catch_up:
+        catch_up = CatchUp(dv_export,
+                           config_dict.get(CATCH_UP_STATE_FILE, './dv_catch_up_state.json'),
+                           make_url(config_dict[DB_URL]).render_as_string(hide_password=True))
+        catch_up.run(args.base_data_version, args.data_version)
 
-else:
-    export_metadata = dv_export.get_export_metadata(args.export_uuid)
+    else:
+        if args.export_uuid is None:
+            export_metadata = dv_export.generate_data_version_export(args.data_version, args.base_data_version)
+            logger.info(f"Export metadata generated with export_uuid={export_metadata.uuid}")
+
+        else:
+            export_metadata = dv_export.get_export_metadata(args.export_uuid)
 
-dv_export.process_metadata(export_metadata)
+        if args.plan:
+            print(format_export_plan(ExportPlanner(dv_export).plan(export_metadata)))
+        else:
+            dv_export.process_metadata(export_metadata)
+finally:
+    telemetry.write_prometheus()
 
-if delete_downloaded_files:
+if delete_downloaded_files and not args.plan:
     shutil.rmtree(base_download_directory)
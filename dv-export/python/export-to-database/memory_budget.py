@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Iterator, Optional
+
+from dv_export_model import ColumnInfo, estimate_row_bytes
+from staging_compression import is_staging_file_compressed
+from telemetry import Telemetry
+
+logger = logging.getLogger("memory_budget")
+
+# Approximate ratio of the memory parsed rows take to their size in a part file
+PARSED_BYTES_PER_FILE_BYTE = 4
+# Approximate compression ratio of compressed staging files, used to estimate the size of their contents
+STAGING_COMPRESSION_RATIO = 5
+
+
+class MemoryBudget:
+    """
+    Bounds the memory that downloads, parsing, and inserts buffer at the same time. Before a stage buffers data it
+    reserves an estimate of the memory it needs, and it releases the reservation when it is done. A reservation that
+    does not fit waits until enough is released, so the stages run fewer files at a time while the budget is
+    exhausted. A reservation larger than the whole budget waits until nothing else is reserved and then runs alone,
+    so an oversized part file is loaded by itself instead of alongside others.
+
+    A thread must not wait for a reservation while it holds another, or it could wait on itself.
+    """
+
+    def __init__(self, max_bytes: int, telemetry: Optional[Telemetry] = None):
+        """
+        :param max_bytes: Memory that may be reserved at the same time
+        :param telemetry: Optional ``Telemetry`` to record time spent waiting for reservations and reserved memory in
+        """
+        if max_bytes <= 0:
+            raise ValueError(f"Memory budget must be positive, got {max_bytes}")
+        self.max_bytes = max_bytes
+        self.telemetry = telemetry or Telemetry()
+        self._reserved_bytes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, num_bytes: Optional[int], table: Optional[str] = None) -> int:
+        """
+        Wait until ``num_bytes`` can be reserved and reserve them. A size of ``None`` is unknown and reserves the
+        whole budget. Returns the number of bytes reserved, which must be passed to ``release``.
+        """
+        num_bytes = self._clamp(num_bytes)
+        start = time.perf_counter()
+        with self._condition:
+            self._condition.wait_for(lambda: self._reserved_bytes + num_bytes <= self.max_bytes)
+            self._reserved_bytes += num_bytes
+            reserved_bytes = self._reserved_bytes
+        self.telemetry.record('memory_wait', time.perf_counter() - start, table, bytes=num_bytes)
+        self.telemetry.gauge('memory_reserved_bytes', reserved_bytes)
+        return num_bytes
+
+    def try_acquire(self, num_bytes: Optional[int]) -> Optional[int]:
+        """Reserve ``num_bytes`` if they fit in the budget now. Returns the bytes reserved, or ``None`` if not."""
+        num_bytes = self._clamp(num_bytes)
+        with self._condition:
+            if self._reserved_bytes + num_bytes > self.max_bytes:
+                return None
+            self._reserved_bytes += num_bytes
+            reserved_bytes = self._reserved_bytes
+        self.telemetry.gauge('memory_reserved_bytes', reserved_bytes)
+        return num_bytes
+
+    def release(self, num_bytes: int):
+        with self._condition:
+            self._reserved_bytes -= num_bytes
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, num_bytes: Optional[int], table: Optional[str] = None) -> Iterator[int]:
+        """Hold a reservation of ``num_bytes`` for the duration of a block."""
+        reserved_bytes = self.acquire(num_bytes, table)
+        try:
+            yield reserved_bytes
+        finally:
+            self.release(reserved_bytes)
+
+    def _clamp(self, num_bytes: Optional[int]) -> int:
+        if num_bytes is None or num_bytes > self.max_bytes:
+            return self.max_bytes
+        return max(0, num_bytes)
+
+
+def reserve_memory(memory_budget: Optional[MemoryBudget],
+                   num_bytes: Optional[int],
+                   table: Optional[str] = None) -> ContextManager:
+    """Reserve memory from ``memory_budget`` for the duration of a block, or do nothing if there is no budget."""
+    if memory_budget is None:
+        return nullcontext()
+    return memory_budget.reserve(num_bytes, table)
+
+
+def estimate_parse_memory(file_path: str, column_infos: list[ColumnInfo], chunk_size: Optional[int]) -> int:
+    """
+    Estimate the memory needed to parse and load a part file. The whole file is held in memory at once unless it is
+    read ``chunk_size`` rows at a time.
+    """
+    file_bytes = os.path.getsize(file_path)
+    if is_staging_file_compressed(file_path):
+        file_bytes *= STAGING_COMPRESSION_RATIO
+    if chunk_size is not None:
+        file_bytes = min(file_bytes, chunk_size * estimate_row_bytes(column_infos))
+    return file_bytes * PARSED_BYTES_PER_FILE_BYTE
@@ -0,0 +1,146 @@
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from dv_export_model import DVExportDataType, ColumnInfo
+from constants import *
+
+# Number of rows sampled from each part file to find low-cardinality string columns for the compact dtype profile
+CARDINALITY_SAMPLE_ROWS = 10000
+# String columns with at most this ratio of distinct values to rows in the sample are stored as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def convert_data_types_to_df_dtype_dict(column_infos,
+                                        dtype_profile: str = DTYPE_PROFILE_DEFAULT,
+                                        low_cardinality_columns: frozenset = frozenset()) -> dict:
+    """
+    :param dtype_profile: ``default`` parses strings into ``object`` columns. ``compact`` parses them into
+        ``string[pyarrow]`` columns, or into dictionary-encoded ``category`` columns if they are in
+        ``low_cardinality_columns``
+    """
+    column_name_to_dtype = {}
+    for column in column_infos:
+        dtype = ''
+        if column.data_type == DVExportDataType.Date or column.data_type == DVExportDataType.Integer:
+            dtype = PANDAS_DF_NULLABLE_INTEGER_INT64_DTYPE
+        elif column.data_type == DVExportDataType.String:
+            if dtype_profile == DTYPE_PROFILE_COMPACT:
+                if column.name in low_cardinality_columns:
+                    dtype = PANDAS_DF_CATEGORY_DTYPE
+                else:
+                    dtype = PANDAS_DF_ARROW_STRING_DTYPE
+            else:
+                dtype = PANDAS_DF_MIXED_DTYPE
+        elif column.data_type == DVExportDataType.Number:
+            dtype = PANDAS_DF_FLOAT64_DTYPE
+        elif column.data_type == DVExportDataType.Boolean:
+            dtype = PANDAS_DF_BOOLEAN_DTYPE
+        column_name_to_dtype[column.name] = dtype
+    return column_name_to_dtype
+
+
+def read_data_frames(file_path: str,
+                     column_infos: list[ColumnInfo],
+                     chunk_size: Optional[int],
+                     dtype_profile: str = DTYPE_PROFILE_DEFAULT,
+                     only_inserts: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    Read a part file with pandas and yield its rows as ``DataFrame`` objects.
+
+    :param file_path: Path to the part file
+    :param column_infos: Columns in the part file
+    :param chunk_size: If provided, yield chunks of at most this many rows so memory is bounded by the chunk size.
+        Otherwise, read the whole file at once.
+    :param dtype_profile: ``default`` or ``compact``, see ``convert_data_types_to_df_dtype_dict``
+    :param only_inserts: If ``True``, yield only the rows to insert and drop the ``_DiffAction_`` column.
+        Otherwise, yield every row with its ``_DiffAction_``.
+    """
+    if dtype_profile == DTYPE_PROFILE_COMPACT:
+        yield from _read_compact_data_frames(file_path, column_infos, chunk_size, only_inserts)
+        return
+
+    clm_name_to_dtype = convert_data_types_to_df_dtype_dict(column_infos)
+    str_columns = {
+        clm_name for clm_name, dtype in clm_name_to_dtype.items() if dtype == PANDAS_DF_MIXED_DTYPE
+    }
+    column_names = [column_info.name for column_info in column_infos]
+    for df in _read_csv(file_path, clm_name_to_dtype, chunk_size):
+        # after loading the DF, replace NaN with empty string for string columns
+        for str_column in str_columns:
+            df[str_column] = df[str_column].fillna('')
+
+        if only_inserts:
+            rows = df.loc[df[DIFF_ACTION_COLUMN_NAME] == DIFF_ACTION_INSERT, column_names]
+        else:
+            rows = df[column_names + [DIFF_ACTION_COLUMN_NAME]]
+        if len(rows.index) != 0:
+            yield rows
+
+
+def _read_compact_data_frames(file_path: str,
+                              column_infos: list[ColumnInfo],
+                              chunk_size: Optional[int],
+                              only_inserts: bool) -> Iterator[pd.DataFrame]:
+    """
+    Read a part file with the ``compact`` dtype profile. String columns are parsed without treating any value as
+    missing, so empty values are already empty strings and no filled copy of each column is needed.
+    """
+    low_cardinality_columns = _find_low_cardinality_columns(column_infos, file_path)
+    clm_name_to_dtype = convert_data_types_to_df_dtype_dict(column_infos,
+                                                            DTYPE_PROFILE_COMPACT,
+                                                            low_cardinality_columns)
+    clm_name_to_dtype[DIFF_ACTION_COLUMN_NAME] = PANDAS_DF_CATEGORY_DTYPE
+    na_values = {
+        column_info.name: PANDAS_DEFAULT_NA_VALUES
+        for column_info in column_infos if column_info.data_type != DVExportDataType.String
+    }
+    column_names = [column_info.name for column_info in column_infos]
+    for df in _read_csv(file_path, clm_name_to_dtype, chunk_size, keep_default_na=False, na_values=na_values):
+        if only_inserts:
+            rows = df.loc[df[DIFF_ACTION_COLUMN_NAME] == DIFF_ACTION_INSERT, column_names]
+        else:
+            rows = df[column_names + [DIFF_ACTION_COLUMN_NAME]]
+        if len(rows.index) != 0:
+            yield rows
+
+
+def _find_low_cardinality_columns(column_infos: list[ColumnInfo], file_path: str) -> frozenset:
+    """
+    Return the non-key string columns whose values repeat enough in the first rows of a part file to be stored
+    as categoricals.
+    """
+    str_column_names = [column_info.name for column_info in column_infos
+                        if column_info.data_type == DVExportDataType.String and not column_info.primary_key]
+    if len(str_column_names) == 0:
+        return frozenset()
+
+    sample = pd.read_csv(file_path,
+                         usecols=str_column_names,
+                         dtype=str,
+                         keep_default_na=False,
+                         nrows=CARDINALITY_SAMPLE_ROWS)
+    if len(sample.index) == 0:
+        return frozenset()
+    return frozenset(name for name in str_column_names
+                     if sample[name].nunique() <= len(sample.index) * CATEGORY_MAX_UNIQUE_RATIO)
+
+
+def _read_csv(file_path: str,
+              clm_name_to_dtype: dict,
+              chunk_size: Optional[int],
+              **read_csv_kwargs) -> Iterator[pd.DataFrame]:
+    """
+    Yield the contents of a part file as one ``DataFrame``, or as ``DataFrame`` chunks of at most
+    ``chunk_size`` rows if a chunk size was provided.
+    """
+    if chunk_size is None:
+        yield pd.read_csv(file_path, dtype=clm_name_to_dtype, on_bad_lines='warn', **read_csv_kwargs)
+        return
+
+    with pd.read_csv(file_path,
+                     dtype=clm_name_to_dtype,
+                     on_bad_lines='warn',
+                     chunksize=chunk_size,
+                     **read_csv_kwargs) as reader:
+        yield from reader
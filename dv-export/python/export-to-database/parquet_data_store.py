@@ -0,0 +1,183 @@
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from itertools import repeat
+from typing import Iterable, Optional
+
+from arrow_csv import check_pyarrow_installed, convert_data_types_to_arrow_schema, get_arrow_data_type, \
+    read_record_batches
+from data_store import DataStore
+from dv_export_model import DVExportDataType, ColumnInfo, TableInfo, FileCheckpoint
+from constants import DIFF_ACTION_COLUMN_NAME
+from staging_compression import strip_staging_file_suffix
+from telemetry import Telemetry
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = logging.getLogger("parquet_data_store")
+
+# Directory in each table's directory for the values of columns added to the table by schema evolution
+NEW_COLUMNS_DIRECTORY_NAME = '_new_columns'
+
+
+class ParquetDataStore(DataStore):
+    """
+    Columnar ``DataStore`` for analytical replicas. Each table is a directory of compressed Parquet files
+    partitioned by data version::
+
+        <base_dir>/<table>/data_version=<data version number>/<file>.parquet
+
+    Files are only ever added, so a delta export appends a new partition instead of rewriting existing ones.
+    Partitions written from delta files for tables which existed before the export keep every row with its
+    ``_DiffAction_``, whether or not ``APPLY_DELTAS`` is set, so the change history can be replayed. Partitions of
+    tables created by the export only have the rows to insert. Tools like DuckDB can query a table directly, for example with
+    ``SELECT * FROM read_parquet('<base_dir>/Employee/*/*.parquet', hive_partitioning=true, union_by_name=true)``.
+
+    Values of columns added to an existing table are written with the table's primary key columns to a separate
+    dataset, which readers join to the table on the primary key::
+
+        <base_dir>/<table>/_new_columns/data_version=<data version number>/<file>.parquet
+    """
+
+    def __init__(self,
+                 base_dir: str,
+                 compression: str = 'zstd',
+                 streaming: bool = False,
+                 telemetry: Optional[Telemetry] = None,
+                 delete_loaded_files: bool = False):
+        """
+        :param base_dir: Directory to write tables to
+        :param compression: Parquet compression codec, such as ``zstd``, ``snappy``, or ``gzip``
+        :param streaming: Whether to read part files one block at a time so memory is bounded by the block size
+        :param telemetry: Optional ``Telemetry`` to record the time spent converting each part file in
+        :param delete_loaded_files: Whether to delete each part file as soon as its Parquet file is written
+        """
+        check_pyarrow_installed()
+        self.base_dir = Path(base_dir)
+        self.compression = compression
+        self.streaming = streaming
+        self.data_version_number = None
+        # Tables created by the current export, whose files only have rows to insert
+        self._new_tables: set[str] = set()
+        self.telemetry = telemetry or Telemetry()
+        self.delete_loaded_files = delete_loaded_files
+
+    def begin_export(self, export_uuid: str, data_version_number: Optional[str]):
+        self.data_version_number = data_version_number
+        self._new_tables = set()
+
+    def create_initial_table_definition(self, tbl: TableInfo):
+        self._table_dir(tbl.name).mkdir(parents=True, exist_ok=True)
+        self._new_tables.add(tbl.name)
+        logger.info(f"Created table={tbl.name}")
+
+    def drop_table(self, tbl_name: str):
+        shutil.rmtree(self._table_dir(tbl_name), ignore_errors=True)
+
+    def has_table(self, tbl_name: str) -> bool:
+        return self._table_dir(tbl_name).is_dir()
+
+    def get_data_store_data_type_from_dv_export_data_type(self, data_type: DVExportDataType):
+        return get_arrow_data_type(data_type)
+
+    def insert_from_files_into_table(self,
+                                     tbl_name: str,
+                                     column_infos: list[ColumnInfo],
+                                     file_paths_for_tbl: Iterable[str],
+                                     checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        # Dropping the removed rows of a delta would leave no record of them, since partitions are never rewritten
+        self._write_files(tbl_name, column_infos, file_paths_for_tbl, checkpoints,
+                          only_inserts=tbl_name in self._new_tables)
+
+    def apply_delta_from_files_into_table(self,
+                                          tbl_name: str,
+                                          column_infos: list[ColumnInfo],
+                                          file_paths_for_tbl: Iterable[str],
+                                          checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        self._write_files(tbl_name, column_infos, file_paths_for_tbl, checkpoints, only_inserts=False)
+
+    def update_columns_from_files(self,
+                                  tbl_name: str,
+                                  column_infos: list[ColumnInfo],
+                                  file_paths_for_tbl: Iterable[str],
+                                  checkpoints: Optional[Iterable[FileCheckpoint]] = None):
+        # New column values are kept out of the table's partitions, which have one row per row version, because
+        # each backfilled row only has the primary key and the new columns
+        self._write_files(tbl_name, column_infos, file_paths_for_tbl, checkpoints, only_inserts=True,
+                          dataset_dir=self._table_dir(tbl_name) / NEW_COLUMNS_DIRECTORY_NAME)
+
+    def drop_column(self, tbl_name: str, column_name: str):
+        logger.info(f"Partitions written from now on for table={tbl_name} will not have column={column_name}; "
+                    f"existing partitions are not rewritten")
+
+    def add_column(self, tbl_name: str, column_info: ColumnInfo):
+        logger.info(f"Partitions written from now on for table={tbl_name} will have column={column_info.name}")
+
+    def get_completed_file_ids(self, export_uuid: str, tbl_name: str) -> set[int]:
+        # Files are written under a temporary name and renamed into place, so every file with the export's
+        # prefix has been written completely
+        prefix = f"{export_uuid}_"
+        table_dir = self._table_dir(tbl_name)
+        return {int(path.stem[len(prefix):])
+                for pattern in (f"*/{prefix}*.parquet", f"{NEW_COLUMNS_DIRECTORY_NAME}/*/{prefix}*.parquet")
+                for path in table_dir.glob(pattern)}
+
+    def _write_files(self,
+                     tbl_name: str,
+                     column_infos: list[ColumnInfo],
+                     file_paths_for_tbl: Iterable[str],
+                     checkpoints: Optional[Iterable[FileCheckpoint]],
+                     only_inserts: bool,
+                     dataset_dir: Optional[Path] = None):
+        """
+        :param dataset_dir: Directory to write the data version's partition to. Defaults to the table's directory
+        """
+        partition_dir = (dataset_dir or self._table_dir(tbl_name)) / f"data_version={self.data_version_number}"
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        checkpoints = checkpoints if checkpoints is not None else repeat(None)
+        for file_path, checkpoint in zip(file_paths_for_tbl, checkpoints):
+            if checkpoint is not None:
+                output_name = f"{checkpoint.export_uuid}_{checkpoint.file_id}.parquet"
+            else:
+                # Part files may have a compression suffix after their .csv suffix
+                output_name = strip_staging_file_suffix(Path(file_path).name).removesuffix(".csv") + ".parquet"
+            output_path = partition_dir / output_name
+            start = time.perf_counter()
+            num_written = self._write_file(file_path, column_infos, output_path, checkpoint, only_inserts)
+            self.telemetry.record('write', time.perf_counter() - start, tbl_name,
+                                  rows=num_written, bytes=os.path.getsize(file_path))
+            logger.info(f"Wrote {num_written} records for table={tbl_name} from file={file_path} "
+                        f"to file={output_path}")
+            if self.delete_loaded_files:
+                os.remove(file_path)
+
+    def _write_file(self,
+                    file_path: str,
+                    column_infos: list[ColumnInfo],
+                    output_path: Path,
+                    checkpoint: Optional[FileCheckpoint],
+                    only_inserts: bool) -> int:
+        schema = convert_data_types_to_arrow_schema(column_infos)
+        if not only_inserts:
+            schema = schema.append(pa.field(DIFF_ACTION_COLUMN_NAME, pa.string()))
+        if checkpoint is not None:
+            schema = schema.with_metadata({'checksum': checkpoint.checksum})
+
+        # Write under a temporary name so that a partially written file is never mistaken for a completed one
+        tmp_path = output_path.with_suffix('.tmp')
+        num_written = 0
+        with pq.ParquetWriter(tmp_path, schema, compression=self.compression) as writer:
+            for batch in read_record_batches(file_path, column_infos, self.streaming, only_inserts=only_inserts):
+                writer.write_batch(batch)
+                num_written += batch.num_rows
+        os.replace(tmp_path, output_path)
+        return num_written
+
+    def _table_dir(self, tbl_name: str) -> Path:
+        return self.base_dir / tbl_name
@@ -0,0 +1,241 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from arrow_csv import check_pyarrow_installed, read_record_batches
+from pandas_csv import read_data_frames
+from disk_guard import DiskGuard
+from dv_export_model import ColumnInfo
+from memory_budget import MemoryBudget, estimate_parse_memory
+from constants import PARSE_ENGINE_PYARROW
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger("parse_pool")
+
+# Suffix of the Arrow IPC stream a worker writes next to each part file it parses
+ARROW_IPC_SUFFIX = '.arrows'
+
+
+class ParsePool:
+    """
+    Parses part files in worker processes, so that parsing and type conversion use several cores while the
+    loading process only writes to the database. A worker writes the parsed rows of a part file as an Arrow IPC
+    stream next to the part file, and the loading process memory-maps it, so rows are passed between processes
+    through the page cache without being serialized again.
+    """
+
+    def __init__(self,
+                 workers: int,
+                 parse_engine: str,
+                 dtype_profile: str,
+                 csv_chunk_size: Optional[int],
+                 memory_budget: Optional[MemoryBudget] = None,
+                 disk_guard: Optional[DiskGuard] = None):
+        """
+        :param workers: Number of worker processes, which is also the number of files parsed ahead of the loader
+        :param parse_engine: ``pandas`` or ``pyarrow``, the parser the workers use
+        :param dtype_profile: ``DataFrame`` dtype profile for the ``pandas`` parse engine
+        :param csv_chunk_size: If provided, workers parse and write part files this many rows at a time
+        :param memory_budget: Optional ``MemoryBudget`` to reserve the estimated memory of each file from before it
+            is parsed, until the loader has loaded it. Files are only parsed ahead while the budget has room
+        :param disk_guard: Optional ``DiskGuard`` to reserve the estimated size of each Arrow IPC stream from while
+            a worker writes it
+        """
+        check_pyarrow_installed()
+        # Workers are forked rather than spawned, because spawning imports main.py again in every worker
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise Exception("Parse workers require an OS which can fork processes, such as Linux or macOS")
+        self.workers = workers
+        self.parse_engine = parse_engine
+        self.dtype_profile = dtype_profile
+        self.csv_chunk_size = csv_chunk_size
+        self.memory_budget = memory_budget
+        self.disk_guard = disk_guard
+        self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        # Fork the workers now, before the export starts download threads which would be copied into them
+        self._executor.submit(os.getpid).result()
+        logger.info(f"Started {workers} parse workers")
+
+    def parse_files(self,
+                    column_infos: list[ColumnInfo],
+                    file_paths: Iterable[str],
+                    only_inserts: bool,
+                    tbl_name: Optional[str] = None) -> Iterator[tuple[str, Future]]:
+        """
+        Parse part files in the workers and yield each file path with a future for its parsed rows, in order. Each
+        future resolves to the path of the file's Arrow IPC stream, or ``None`` if it had no rows, and the seconds
+        spent parsing it.
+
+        ``file_paths`` may be a lazy iterator which downloads the files. A background thread takes each file from it
+        as soon as it is available and submits it to the workers, so files are parsed while later files download
+        and earlier files load. At most ``workers`` files are submitted ahead of the consumer. With a memory budget,
+        a file's reservation is taken before it is submitted and held until the consumer requests the next file.
+        """
+        # Files submitted to the workers, as (file path, future, reserved bytes), followed by None once every file
+        # is submitted, or by the error that stopped the submitting thread
+        submitted_files = queue.Queue()
+        # Slots for files submitted ahead of the consumer
+        free_slots = threading.Semaphore(self.workers)
+        stopped = threading.Event()
+
+        def submit_files():
+            try:
+                for file_path in file_paths:
+                    free_slots.acquire()
+                    if stopped.is_set():
+                        return
+                    reserved_bytes = 0
+                    if self.memory_budget is not None:
+                        # The consumer holds no reservation while it waits for a file, so this cannot wait on it
+                        reserved_bytes = self.memory_budget.acquire(
+                            estimate_parse_memory(file_path, column_infos, self.csv_chunk_size), tbl_name)
+                    if stopped.is_set():
+                        self._release_memory(reserved_bytes)
+                        return
+                    try:
+                        parsed_file = self._submit_file(file_path, column_infos, only_inserts)
+                    except BaseException:
+                        self._release_memory(reserved_bytes)
+                        raise
+                    submitted_files.put((file_path, parsed_file, reserved_bytes))
+                submitted_files.put(None)
+            except BaseException as e:
+                submitted_files.put(e)
+
+        submitter = threading.Thread(target=submit_files, name=f"dv-parse-submit-{tbl_name}", daemon=True)
+        submitter.start()
+        try:
+            while True:
+                submitted_file = submitted_files.get()
+                if submitted_file is None:
+                    return
+                if isinstance(submitted_file, BaseException):
+                    raise submitted_file
+                file_path, parsed_file, reserved_bytes = submitted_file
+                free_slots.release()
+                try:
+                    yield file_path, parsed_file
+                finally:
+                    self._release_memory(reserved_bytes)
+        finally:
+            stopped.set()
+            free_slots.release()
+            # Releasing the reservations of unconsumed files lets a submitting thread waiting for memory stop
+            self._cancel_submitted_files(submitted_files)
+            submitter.join()
+            self._cancel_submitted_files(submitted_files)
+
+    def _submit_file(self, file_path: str, column_infos: list[ColumnInfo], only_inserts: bool) -> Future:
+        reserved_disk_bytes = 0
+        ipc_path = file_path + ARROW_IPC_SUFFIX
+        if self.disk_guard is not None:
+            # The stream takes about as much space as the parsed rows take in memory. It no longer needs a
+            # reservation once it is written, because then it counts against the disk's free space
+            reserved_disk_bytes = self.disk_guard.reserve(ipc_path,
+                                                          estimate_parse_memory(file_path, column_infos, None),
+                                                          f"parsed rows of file={file_path}")
+        parsed_file = self._executor.submit(parse_file_to_arrow_ipc,
+                                            file_path,
+                                            column_infos,
+                                            only_inserts,
+                                            self.parse_engine,
+                                            self.dtype_profile,
+                                            self.csv_chunk_size)
+        if self.disk_guard is not None:
+            parsed_file.add_done_callback(lambda _: self.disk_guard.release(ipc_path, reserved_disk_bytes))
+        return parsed_file
+
+    def _cancel_submitted_files(self, submitted_files: queue.Queue):
+        while not submitted_files.empty():
+            submitted_file = submitted_files.get()
+            if isinstance(submitted_file, tuple):
+                file_path, parsed_file, reserved_bytes = submitted_file
+                parsed_file.cancel()
+                self._release_memory(reserved_bytes)
+
+    def _release_memory(self, reserved_bytes: int):
+        if self.memory_budget is not None:
+            self.memory_budget.release(reserved_bytes)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def parse_file_to_arrow_ipc(file_path: str,
+                            column_infos: list[ColumnInfo],
+                            only_inserts: bool,
+                            parse_engine: str,
+                            dtype_profile: str,
+                            csv_chunk_size: Optional[int]) -> tuple[Optional[str], float]:
+    """Runs in a worker process. Parse a part file and write its rows to an Arrow IPC stream."""
+    start = time.perf_counter()
+    if parse_engine == PARSE_ENGINE_PYARROW:
+        batches = read_record_batches(file_path,
+                                      column_infos,
+                                      streaming=csv_chunk_size is not None,
+                                      only_inserts=only_inserts)
+    else:
+        batches = _convert_data_frames(read_data_frames(file_path,
+                                                        column_infos,
+                                                        csv_chunk_size,
+                                                        dtype_profile=dtype_profile,
+                                                        only_inserts=only_inserts))
+
+    ipc_path = file_path + ARROW_IPC_SUFFIX
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pa.ipc.new_stream(ipc_path, batch.schema)
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return ipc_path if writer is not None else None, time.perf_counter() - start
+
+
+def read_arrow_ipc_file(ipc_path: Optional[str]) -> Iterator['pa.RecordBatch']:
+    """
+    Yield the record batches a worker wrote for a part file, then delete the file. The file is memory-mapped, so
+    each batch must be consumed before the next one is requested.
+    """
+    if ipc_path is None:
+        return
+    try:
+        with pa.memory_map(ipc_path) as source:
+            yield from pa.ipc.open_stream(source)
+    finally:
+        os.remove(ipc_path)
+
+
+def _convert_data_frames(dfs) -> Iterator['pa.RecordBatch']:
+    """
+    Convert ``DataFrame`` chunks to record batches with one schema. The schema carries the pandas dtypes, so
+    ``RecordBatch.to_pandas`` restores the same ``DataFrame`` in the loading process.
+    """
+    schema = None
+    for df in dfs:
+        batch = pa.RecordBatch.from_pandas(df, preserve_index=False)
+        if schema is None:
+            schema = _with_wide_dictionary_indices(batch.schema)
+        yield batch.cast(schema)
+
+
+def _with_wide_dictionary_indices(schema: 'pa.Schema') -> 'pa.Schema':
+    """
+    Categorical columns of different chunks can have more or fewer categories, and so narrower or wider
+    dictionary indices, but every batch in a stream must have the same schema.
+    """
+    for i, arrow_field in enumerate(schema):
+        if pa.types.is_dictionary(arrow_field.type):
+            schema = schema.set(i, arrow_field.with_type(pa.dictionary(pa.int32(), arrow_field.type.value_type)))
+    return schema
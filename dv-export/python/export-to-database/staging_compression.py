@@ -0,0 +1,78 @@
+import gzip
+import io
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+from constants import STAGING_COMPRESSION_NONE, STAGING_COMPRESSION_GZIP, STAGING_COMPRESSION_ZSTD
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Downloaded files are scratch data that is read back once, so fast compression levels are used
+GZIP_COMPRESS_LEVEL = 1
+ZSTD_COMPRESS_LEVEL = 3
+
+# Suffixes which both pandas and pyarrow use to detect the compression of a file when reading it
+_STAGING_FILE_SUFFIXES = {
+    STAGING_COMPRESSION_NONE: '',
+    STAGING_COMPRESSION_GZIP: '.gz',
+    STAGING_COMPRESSION_ZSTD: '.zst',
+}
+
+
+def check_staging_compression(compression: str):
+    if compression not in _STAGING_FILE_SUFFIXES:
+        raise ValueError(f"No such staging compression: {compression}")
+    if compression == STAGING_COMPRESSION_ZSTD and zstandard is None:
+        raise Exception("zstd staging compression requires zstandard. Install it with `pip install zstandard`")
+
+
+def get_staging_file_suffix(compression: str) -> str:
+    return _STAGING_FILE_SUFFIXES[compression]
+
+
+def is_staging_file_compressed(file_path: str) -> bool:
+    return any(suffix and file_path.endswith(suffix) for suffix in _STAGING_FILE_SUFFIXES.values())
+
+
+def strip_staging_file_suffix(file_path: str) -> str:
+    """Return ``file_path`` without the suffix of its staging compression, if it has one."""
+    for suffix in _STAGING_FILE_SUFFIXES.values():
+        if suffix and file_path.endswith(suffix):
+            return file_path[:-len(suffix)]
+    return file_path
+
+
+@contextmanager
+def open_staging_file(file_path: str, compression: str, sha256=None) -> Iterator[BinaryIO]:
+    """
+    Open a file to write a downloaded part file to, compressing whatever is written to it.
+
+    :param sha256: Optional ``hashlib.sha256`` object to update with the bytes written to the file, so that the
+        checksum of the file is known without reading it back
+    """
+    with _HashingFile(file_path, sha256) as f:
+        if compression == STAGING_COMPRESSION_GZIP:
+            with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_COMPRESS_LEVEL) as gzip_file:
+                yield gzip_file
+        elif compression == STAGING_COMPRESSION_ZSTD:
+            with zstandard.ZstdCompressor(level=ZSTD_COMPRESS_LEVEL).stream_writer(f, closefd=False) as zstd_file:
+                yield zstd_file
+        else:
+            yield f
+
+
+class _HashingFile(io.FileIO):
+    """A file opened for writing which updates an optional hash with every byte written to it."""
+
+    def __init__(self, file_path: str, sha256=None):
+        super().__init__(file_path, 'wb')
+        self.sha256 = sha256
+
+    def write(self, data) -> int:
+        num_bytes = super().write(data)
+        if self.sha256 is not None and num_bytes:
+            self.sha256.update(memoryview(data).cast('B')[:num_bytes])
+        return num_bytes
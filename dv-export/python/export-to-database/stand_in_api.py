@@ -0,0 +1,435 @@
+"""
+A local stand-in for the DV Export API, for benchmarking and testing the script without a Visier tenant.
+
+It serves the endpoints ``DVExport`` uses: the list of data versions, scheduling an export job, the job status,
+the export metadata, and part file downloads. It also serves the login endpoint, so the Visier API client can
+authenticate with any username and password. Exports are generated from a synthetic tenant whose tables change a
+little in every data version, so both initial and delta exports can be requested. Part files are generated when
+an export job runs and are served from disk.
+
+To point the script at the stand-in, run it and set ``VISIER_HOST`` to the URL it prints, with any
+``VISIER_USERNAME`` and ``VISIER_PASSWORD``:
+
+    python stand_in_api.py --port 8085 --tables 3 --rows 100000
+"""
+import argparse
+import json
+import logging
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from visier_platform_sdk import DataVersionExportColumnDTO, DataVersionExportDataVersionsDTO, \
+    DataVersionExportDataVersionSummaryDTO, DataVersionExportDTO, DataVersionExportFileDTO, \
+    DataVersionExportJobStatusDTO, DataVersionExportPartFileDTO, DataVersionExportScheduleJobResponseDTO, \
+    DataVersionExportTableDTO
+
+from constants import DIFF_ACTION_COLUMN_NAME, DIFF_ACTION_DELETE, DIFF_ACTION_INSERT
+
+logger = logging.getLogger("stand_in_api")
+
+# Export UUIDs are derived from the data version pair, so that the same export always has the same UUID
+EXPORT_UUID_NAMESPACE = uuid.UUID('0b5e8b8e-52a3-4c55-9b1c-3d7b1f0a6c21')
+VALIDITY_START_EPOCH_MILLIS = 1577836800000
+_MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+
+@dataclass
+class SyntheticTenant:
+    """
+    Shape of the synthetic data. Each table starts with ``rows`` rows in the first data version. Every later data
+    version changes about ``change_ratio`` of the existing rows and adds ``growth_ratio`` × ``rows`` new rows.
+
+    Every table has a two column primary key, ``ID`` and ``Validity_Start``, followed by a unique ``Name``,
+    ``string_columns`` low-cardinality string columns with ``cardinality`` distinct values each, and
+    ``numeric_columns`` integer and number columns. About ``null_ratio`` of the non-key values are empty.
+
+    With ``split_changes``, the delete and insert of a changed row are written to different part files of a delta
+    export, so loaders cannot rely on both halves of a change being in the same file.
+    """
+    tables: int = 3
+    rows: int = 100000
+    files_per_table: int = 4
+    string_columns: int = 4
+    numeric_columns: int = 2
+    cardinality: int = 50
+    null_ratio: float = 0.05
+    data_versions: int = 5
+    first_data_version: int = 1000001
+    change_ratio: float = 0.05
+    growth_ratio: float = 0.01
+    split_changes: bool = False
+    columns: list[tuple[str, str, bool, bool]] = field(init=False)
+
+    def __post_init__(self):
+        self.columns = [('ID', 'String', False, True), ('Validity_Start', 'Date', False, True), ('Name', 'String', True, False)]
+        self.columns += [(f"Attribute_{i}", 'String', True, False) for i in range(1, self.string_columns + 1)]
+        self.columns += [(f"Measure_{i}", 'Integer' if i % 2 else 'Number', True, False)
+                         for i in range(1, self.numeric_columns + 1)]
+        self.columns += [('Is_Active', 'Boolean', True, False)]
+
+    @property
+    def table_names(self) -> list[str]:
+        return [f"Table_{i}" for i in range(1, self.tables + 1)]
+
+    @property
+    def data_version_numbers(self) -> list[int]:
+        return list(range(self.first_data_version, self.first_data_version + self.data_versions))
+
+    def row_count(self, version: int) -> int:
+        """Number of rows in each table at the ``version``-th data version, counting from 0."""
+        return self.rows + version * int(self.rows * self.growth_ratio)
+
+    def write_part_files(self,
+                         table: int,
+                         version: int,
+                         base_version: Optional[int],
+                         file_paths: list[str]) -> int:
+        """
+        Write the rows of a table at ``version`` to ``file_paths``, round robin. Without a ``base_version``, every
+        row is written as an insert. Otherwise only changes since ``base_version`` are written: a changed row as a
+        delete of its old values followed by an insert of its new values, and an added row as an insert. The delete
+        and insert of a changed row are in the same file unless ``split_changes`` is set.
+        Returns the number of rows written.
+        """
+        header = ",".join([column[0] for column in self.columns] + [DIFF_ACTION_COLUMN_NAME]) + "\n"
+        files = [open(file_path, 'w', newline='') for file_path in file_paths]
+        try:
+            for f in files:
+                f.write(header)
+            num_rows = 0
+            for i in range(self.row_count(version)):
+                row_version = self._last_changed_version(table, i, version)
+                if base_version is None:
+                    lines = self._format_row(table, i, row_version, DIFF_ACTION_INSERT)
+                elif row_version <= base_version:
+                    continue
+                elif i < self.row_count(base_version):
+                    deleted_line = self._format_row(table, i, self._last_changed_version(table, i, base_version),
+                                                    DIFF_ACTION_DELETE)
+                    inserted_line = self._format_row(table, i, row_version, DIFF_ACTION_INSERT)
+                    if self.split_changes:
+                        files[(num_rows + 1) % len(files)].write(deleted_line)
+                        lines = inserted_line
+                    else:
+                        lines = deleted_line + inserted_line
+                else:
+                    lines = self._format_row(table, i, row_version, DIFF_ACTION_INSERT)
+                files[num_rows % len(files)].write(lines)
+                num_rows += 1
+            return num_rows
+        finally:
+            for f in files:
+                f.close()
+
+    def _is_changed(self, table: int, i: int, version: int) -> bool:
+        return _mix(table, i, version) % 1000000 < self.change_ratio * 1000000
+
+    def _last_changed_version(self, table: int, i: int, version: int) -> int:
+        """The latest data version, up to ``version``, in which row ``i`` was added or changed."""
+        for v in range(version, 0, -1):
+            if i >= self.row_count(v - 1) or self._is_changed(table, i, v):
+                return v
+        return 0
+
+    def _format_row(self, table: int, i: int, row_version: int, diff_action: str) -> str:
+        h = _mix(table, i, row_version, 1)
+        null_per_mille = int(self.null_ratio * 1000)
+        values = [f"T{table}-{i:09d}", str(VALIDITY_START_EPOCH_MILLIS + i * 1000), f"Name {i}"]
+        for c in range(self.string_columns):
+            h = _mix(h, c)
+            values.append('' if h % 1000 < null_per_mille else f"Value {(h >> 16) % self.cardinality}")
+        for c in range(1, self.numeric_columns + 1):
+            h = _mix(h, c)
+            if h % 1000 < null_per_mille:
+                values.append('')
+            elif c % 2:
+                values.append(str((h >> 16) % 100000))
+            else:
+                values.append(f"{(h >> 16) % 100000000 / 100:.2f}")
+        values.append('true' if h & 0x10000 else 'false')
+        values.append(diff_action)
+        return ",".join(values) + "\n"
+
+
+def _mix(*values: int) -> int:
+    """A fast deterministic 64 bit hash, so that the same row always has the same values."""
+    h = 0x9E3779B97F4A7C15
+    for value in values:
+        h = ((h ^ value) * 0xBF58476D1CE4E5B9) & _MASK_64
+        h ^= h >> 31
+    return h
+
+
+class StandInApiServer:
+    """
+    Serves exports of a ``SyntheticTenant`` over HTTP. Part files are written to ``data_dir`` when the export job
+    for them runs; if no ``data_dir`` is given, a temporary directory is used and removed when the server stops.
+    """
+
+    def __init__(self,
+                 tenant: SyntheticTenant,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 data_dir: Optional[str] = None,
+                 job_delay_secs: float = 0):
+        """
+        :param tenant: Shape of the synthetic data to export
+        :param host: Address to listen on
+        :param port: Port to listen on, or ``0`` to pick a free port
+        :param data_dir: Optional directory to write part files to
+        :param job_delay_secs: Minimum time an export job reports as running, to exercise job polling
+        """
+        self.tenant = tenant
+        self.job_delay_secs = job_delay_secs
+        self._owns_data_dir = data_dir is None
+        self.data_dir = Path(data_dir or tempfile.mkdtemp(prefix='dv-stand-in-'))
+        self._lock = threading.Lock()
+        self._jobs: dict[str, tuple[float, str, Future]] = {}
+        self._exports: dict[str, Future] = {}
+        self._files: dict[tuple[str, int], Path] = {}
+        # Export jobs run one at a time, like a tenant which is busy with other work
+        self._executor = ThreadPoolExecutor(1, 'stand-in-job')
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StandInApiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stand-in-api', daemon=True)
+        self._thread.start()
+        logger.info(f"Serving the stand-in DV Export API at {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._owns_data_dir:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def schedule_export_job(self, data_version: int, base_data_version: Optional[int]) -> str:
+        version = self._version_index(data_version)
+        base_version = self._version_index(base_data_version) if base_data_version is not None else None
+        if base_version is not None and base_version >= version:
+            raise ValueError(f"Base data version {base_data_version} must be before data version {data_version}")
+
+        export_uuid = str(uuid.uuid5(EXPORT_UUID_NAMESPACE, f"{data_version}:{base_data_version}"))
+        job_uuid = str(uuid.uuid4())
+        with self._lock:
+            if export_uuid not in self._exports:
+                self._exports[export_uuid] = self._executor.submit(self._generate_export, export_uuid, version,
+                                                                   base_version)
+            self._jobs[job_uuid] = (time.monotonic(), export_uuid, self._exports[export_uuid])
+        logger.info(f"Scheduled job={job_uuid} for export={export_uuid} of data_version={data_version} "
+                    f"base_data_version={base_data_version}")
+        return job_uuid
+
+    def get_job_status(self, job_uuid: str) -> DataVersionExportJobStatusDTO:
+        scheduled_at, export_uuid, export = self._jobs[job_uuid]
+        completed = export.done() and time.monotonic() - scheduled_at >= self.job_delay_secs
+        failed = completed and export.exception() is not None
+        return DataVersionExportJobStatusDTO(job_uuid=job_uuid,
+                                             completed=completed and not failed,
+                                             failed=failed,
+                                             export_uuid=export_uuid if completed and not failed else None)
+
+    def get_export(self, export_uuid: str) -> DataVersionExportDTO:
+        return self._exports[export_uuid].result()
+
+    def get_file_path(self, export_uuid: str, file_id: int) -> Path:
+        return self._files[(export_uuid, file_id)]
+
+    def _version_index(self, data_version: int) -> int:
+        if data_version not in self.tenant.data_version_numbers:
+            raise KeyError(f"No such data version: {data_version}")
+        return data_version - self.tenant.first_data_version
+
+    def _generate_export(self, export_uuid: str, version: int, base_version: Optional[int]) -> DataVersionExportDTO:
+        start = time.perf_counter()
+        export_dir = self.data_dir / export_uuid
+        export_dir.mkdir(parents=True, exist_ok=True)
+        columns = [DataVersionExportColumnDTO(name=name, data_type=data_type, allows_null=allows_null,
+                                              is_primary_key_component=is_primary_key_component)
+                   for name, data_type, allows_null, is_primary_key_component in self.tenant.columns]
+        no_columns = DataVersionExportFileDTO(columns=[], files=[])
+
+        tables = []
+        file_id = 1
+        for table, table_name in enumerate(self.tenant.table_names, start=1):
+            part_files = []
+            for part in range(self.tenant.files_per_table):
+                filename = f"{table_name}_{part:05d}.csv"
+                part_files.append(DataVersionExportPartFileDTO(file_id=file_id, filename=filename))
+                self._files[(export_uuid, file_id)] = export_dir / filename
+                file_id += 1
+            num_rows = self.tenant.write_part_files(table, version, base_version,
+                                                    [str(export_dir / f.filename) for f in part_files])
+            logger.info(f"Generated {num_rows} rows in {len(part_files)} files for table={table_name} "
+                        f"of export={export_uuid}")
+            file_columns = DataVersionExportFileDTO(columns=columns, files=part_files)
+            tables.append(DataVersionExportTableDTO(name=table_name,
+                                                    common_columns=file_columns if base_version is not None else no_columns,
+                                                    new_columns=no_columns if base_version is not None else file_columns,
+                                                    deleted_columns=[]))
+
+        logger.info(f"Generated export={export_uuid} in {time.perf_counter() - start:.1f}s")
+        return DataVersionExportDTO(
+            uuid=export_uuid,
+            timestamp=str(int(time.time() * 1000)),
+            data_version_number=str(self.tenant.first_data_version + version),
+            base_data_version_number=str(self.tenant.first_data_version + base_version)
+            if base_version is not None else None,
+            tables=tables,
+            new_tables=[] if base_version is not None else self.tenant.table_names,
+            deleted_tables=[])
+
+    def _create_handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+        api_prefix = '/v1alpha/data/data-version-exports'
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Clients which only need the Content-Length of a file, such as export plans, close the connection
+                    pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path == '/v1/admin/visierSecureToken':
+                    self._send(200, b'stand-in-token', 'text/plain')
+                elif self.path == f"{api_prefix}/jobs":
+                    request = json.loads(body)
+                    base_data_version = request.get('baseDataVersionNumber')
+                    try:
+                        job_uuid = server.schedule_export_job(int(request['dataVersionNumber']),
+                                                              int(base_data_version) if base_data_version else None)
+                    except (KeyError, ValueError) as e:
+                        self._send_error(400, str(e))
+                        return
+                    self._send_json(DataVersionExportScheduleJobResponseDTO(job_uuid=job_uuid).to_json())
+                else:
+                    self._send_error(404, f"No such endpoint: {self.path}")
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                try:
+                    if path == f"{api_prefix}/data-versions":
+                        data_versions = [DataVersionExportDataVersionSummaryDTO(data_version=str(data_version),
+                                                                                data_category='Production')
+                                         for data_version in server.tenant.data_version_numbers]
+                        self._send_json(DataVersionExportDataVersionsDTO(data_versions=data_versions).to_json())
+                    elif match := re.fullmatch(f"{api_prefix}/jobs/([^/]+)", path):
+                        self._send_json(server.get_job_status(match.group(1)).to_json())
+                    elif match := re.fullmatch(f"{api_prefix}/exports/([^/]+)", path):
+                        self._send_json(server.get_export(match.group(1)).to_json())
+                    elif match := re.fullmatch(f"{api_prefix}/exports/([^/]+)/files/([0-9]+)", path):
+                        self._send_file(server.get_file_path(match.group(1), int(match.group(2))))
+                    else:
+                        self._send_error(404, f"No such endpoint: {path}")
+                except KeyError as e:
+                    self._send_error(404, f"Not found: {e}")
+
+            def _send_file(self, file_path: Path):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(file_path.stat().st_size))
+                self.end_headers()
+                with open(file_path, 'rb') as f:
+                    shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+
+            def _send_json(self, body: str):
+                self._send(200, body.encode(), 'application/json')
+
+            def _send_error(self, status: int, message: str):
+                self._send(status, json.dumps({'message': message}).encode(), 'application/json')
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+
+def add_tenant_arguments(parser: argparse.ArgumentParser):
+    defaults = SyntheticTenant()
+    parser.add_argument('--tables', type=int, default=defaults.tables, help='Number of tables.')
+    parser.add_argument('--rows', type=int, default=defaults.rows,
+                        help='Number of rows in each table in the first data version.')
+    parser.add_argument('--files_per_table', type=int, default=defaults.files_per_table,
+                        help='Number of part files per table in each export.')
+    parser.add_argument('--string_columns', type=int, default=defaults.string_columns,
+                        help='Number of low-cardinality string columns per table.')
+    parser.add_argument('--numeric_columns', type=int, default=defaults.numeric_columns,
+                        help='Number of integer and number columns per table.')
+    parser.add_argument('--cardinality', type=int, default=defaults.cardinality,
+                        help='Number of distinct values in each low-cardinality string column.')
+    parser.add_argument('--data_versions', type=int, default=defaults.data_versions,
+                        help='Number of data versions in the tenant.')
+    parser.add_argument('--change_ratio', type=float, default=defaults.change_ratio,
+                        help='Fraction of rows changed in each data version.')
+    parser.add_argument('--growth_ratio', type=float, default=defaults.growth_ratio,
+                        help='Rows added in each data version, as a fraction of the initial rows.')
+    parser.add_argument('--split_changes', action='store_true',
+                        help='Write the delete and insert of a changed row to different part files.')
+
+
+def tenant_from_arguments(args: argparse.Namespace) -> SyntheticTenant:
+    return SyntheticTenant(tables=args.tables,
+                           rows=args.rows,
+                           files_per_table=args.files_per_table,
+                           string_columns=args.string_columns,
+                           numeric_columns=args.numeric_columns,
+                           cardinality=args.cardinality,
+                           data_versions=args.data_versions,
+                           change_ratio=args.change_ratio,
+                           growth_ratio=args.growth_ratio,
+                           split_changes=args.split_changes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a stand-in DV Export API with synthetic data.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on.')
+    parser.add_argument('--port', type=int, default=8085, help='Port to listen on.')
+    parser.add_argument('--data_dir', help='Directory to write part files to. Defaults to a temporary directory.')
+    parser.add_argument('--job_delay', type=float, default=0, help='Minimum seconds each export job runs for.')
+    add_tenant_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    tenant = tenant_from_arguments(args)
+    server = StandInApiServer(tenant, args.host, args.port, args.data_dir, args.job_delay).start()
+    print(f"Set VISIER_HOST={server.url}. Data versions: {tenant.data_version_numbers}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
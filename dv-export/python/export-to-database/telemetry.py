@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger("telemetry")
+
+PROMETHEUS_METRIC_PREFIX = 'dv_export'
+
+
+class Telemetry:
+    """
+    Collects structured performance metrics for each phase of an export, such as scheduling, polling, downloading,
+    parsing, and inserting. Every measurement is appended as one JSON object per line to ``jsonl_path``, and the
+    totals per phase and table are written to ``prometheus_path`` in the Prometheus text format, for the node
+    exporter's textfile collector. Both outputs are optional; without them, metrics are only kept in memory.
+
+    Measurements can be recorded from any thread.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        """
+        :param jsonl_path: Optional file to append one JSON line per measurement to
+        :param prometheus_path: Optional ``.prom`` file which ``write_prometheus`` replaces with the run's totals
+        """
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.run_id = str(uuid.uuid4())
+        self._lock = threading.Lock()
+        # Totals keyed by (phase, table), and the latest and largest value of each gauge keyed by (name, table)
+        self._totals = defaultdict(lambda: defaultdict(float))
+        self._gauges = {}
+
+    @contextmanager
+    def phase(self, phase: str, table: Optional[str] = None, **labels) -> Iterator[dict]:
+        """
+        Measure the duration of a block of code. The block can add counts such as ``rows`` and ``bytes`` to the
+        yielded dictionary; they are recorded along with the duration when the block exits, even if it raises.
+        """
+        metrics = {}
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield metrics
+            succeeded = True
+        finally:
+            self.record(phase, time.perf_counter() - start, table, succeeded=succeeded, **labels, **metrics)
+
+    def record(self,
+               phase: str,
+               duration_secs: float,
+               table: Optional[str] = None,
+               succeeded: bool = True,
+               **metrics):
+        """
+        Record a measurement of a phase which was timed by the caller. Throughput is derived from the ``rows`` and
+        ``bytes`` metrics if they are provided.
+        """
+        event = {
+            'timestamp': time.time(),
+            'run_id': self.run_id,
+            'phase': phase,
+            'table': table,
+            'duration_secs': round(duration_secs, 6),
+            'succeeded': succeeded,
+            **metrics,
+        }
+        if duration_secs > 0 and 'rows' in metrics:
+            event['rows_per_sec'] = round(metrics['rows'] / duration_secs, 1)
+        if duration_secs > 0 and 'bytes' in metrics:
+            event['mb_per_sec'] = round(metrics['bytes'] / duration_secs / (1024 * 1024), 3)
+
+        with self._lock:
+            totals = self._totals[(phase, table)]
+            totals['count'] += 1
+            totals['seconds'] += duration_secs
+            totals['failures'] += 0 if succeeded else 1
+            for name in ('rows', 'bytes'):
+                if name in metrics:
+                    totals[name] += metrics[name]
+            self._append_jsonl(event)
+
+    def gauge(self, name: str, value: float, table: Optional[str] = None):
+        """Record the current value of something that goes up and down, such as a queue depth."""
+        with self._lock:
+            _, max_value = self._gauges.get((name, table), (value, value))
+            self._gauges[(name, table)] = (value, max(value, max_value))
+            self._append_jsonl({
+                'timestamp': time.time(),
+                'run_id': self.run_id,
+                'gauge': name,
+                'table': table,
+                'value': value,
+            })
+
+    def write_prometheus(self):
+        """Replace ``prometheus_path`` with the totals so far. Does nothing if no path was provided."""
+        if self.prometheus_path is None:
+            return
+
+        with self._lock:
+            totals = {key: dict(values) for key, values in self._totals.items()}
+            gauges = dict(self._gauges)
+
+        lines = []
+
+        def add_metric(name: str, help_text: str, samples: list[tuple[dict, float]]):
+            metric_name = f"{PROMETHEUS_METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {metric_name} {help_text}")
+            lines.append(f"# TYPE {metric_name} gauge")
+            for labels, value in samples:
+                lines.append(f"{metric_name}{_format_labels(labels)} {value}")
+
+        def phase_labels(phase: str, table: Optional[str]) -> dict:
+            return {'phase': phase, 'table': table} if table is not None else {'phase': phase}
+
+        add_metric('phase_seconds', "Total time spent in a phase during the last run",
+                   [(phase_labels(*key), values['seconds']) for key, values in totals.items()])
+        add_metric('phase_count', "Number of times a phase ran during the last run",
+                   [(phase_labels(*key), values['count']) for key, values in totals.items()])
+        add_metric('phase_failures', "Number of times a phase failed during the last run",
+                   [(phase_labels(*key), values['failures']) for key, values in totals.items()])
+        add_metric('phase_rows', "Rows processed by a phase during the last run",
+                   [(phase_labels(*key), values['rows']) for key, values in totals.items() if 'rows' in values])
+        add_metric('phase_bytes', "Bytes processed by a phase during the last run",
+                   [(phase_labels(*key), values['bytes']) for key, values in totals.items() if 'bytes' in values])
+        add_metric('phase_rows_per_second', "Rows processed per second spent in a phase during the last run",
+                   [(phase_labels(*key), values['rows'] / values['seconds'])
+                    for key, values in totals.items() if 'rows' in values and values['seconds'] > 0])
+        add_metric('phase_megabytes_per_second', "Megabytes processed per second spent in a phase during the last run",
+                   [(phase_labels(*key), values['bytes'] / values['seconds'] / (1024 * 1024))
+                    for key, values in totals.items() if 'bytes' in values and values['seconds'] > 0])
+        add_metric('queue_depth_max', "Largest observed depth of a queue during the last run",
+                   [({'queue': name, 'table': table} if table is not None else {'queue': name}, max_value)
+                    for (name, table), (_, max_value) in gauges.items()])
+        add_metric('last_run_timestamp_seconds', "Time the metrics of the last run were written",
+                   [({}, time.time())])
+
+        # Write to a temporary file first so the textfile collector never reads a partially written file
+        prometheus_path = Path(self.prometheus_path)
+        tmp_path = prometheus_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, prometheus_path)
+        logger.info(f"Wrote metrics for run_id={self.run_id} to file={prometheus_path}")
+
+    def _append_jsonl(self, event: dict):
+        if self.jsonl_path is None:
+            return
+        with open(self.jsonl_path, 'a') as f:
+            f.write(json.dumps(event) + "\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
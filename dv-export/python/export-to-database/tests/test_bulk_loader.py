@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+from sqlalchemy import Boolean, Column, Integer, MetaData, String, Table, create_engine, select
+from sqlalchemy.dialects import postgresql
+
+from bulk_loader import (InsertBulkLoader, MySQLLoadDataBulkLoader, PostgreSQLCopyBulkLoader, SQLiteBulkLoader,
+                         get_bulk_loader, pa)
+
+
+def _make_table() -> Table:
+    return Table("Employee Data", MetaData(),
+                 Column("ID", String, primary_key=True),
+                 Column("Age", Integer),
+                 Column("Active", Boolean))
+
+
+def _make_df() -> pd.DataFrame:
+    return pd.DataFrame({
+        "ID": ["a", 'b,"quoted"'],
+        "Age": pd.array([30, None], dtype="Int64"),
+        "Active": pd.array([True, None], dtype="boolean"),
+    })
+
+
+class FakeCopyCursor:
+    """A psycopg2 cursor which records the statement and data passed to ``copy_expert``."""
+
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+        self.data: list[str | bytes] = []
+        self.closed = False
+
+    def copy_expert(self, stmt: str, buffer) -> None:
+        self.statements.append(stmt)
+        self.data.append(buffer.read())
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class GetBulkLoaderTests(unittest.TestCase):
+    def test_native_loader_per_dialect(self) -> None:
+        self.assertIsInstance(get_bulk_loader("sqlite"), SQLiteBulkLoader)
+        self.assertIsInstance(get_bulk_loader("postgresql"), PostgreSQLCopyBulkLoader)
+        self.assertIsInstance(get_bulk_loader("mysql"), MySQLLoadDataBulkLoader)
+        self.assertIsInstance(get_bulk_loader("mariadb"), MySQLLoadDataBulkLoader)
+
+    def test_falls_back_to_inserts(self) -> None:
+        self.assertIsInstance(get_bulk_loader("mssql"), InsertBulkLoader)
+        self.assertIsInstance(get_bulk_loader("postgresql", native=False), InsertBulkLoader)
+
+
+class SQLiteBulkLoaderTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite://")
+        self.table = _make_table()
+        self.table.metadata.create_all(self.engine)
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+
+    def _rows(self) -> list[tuple]:
+        with self.engine.connect() as conn:
+            return conn.execute(select(self.table).order_by(self.table.c.ID)).all()
+
+    def test_loads_data_frame_with_nulls(self) -> None:
+        with self.engine.begin() as conn:
+            SQLiteBulkLoader().load(conn, self.table, _make_df())
+
+        self.assertEqual(self._rows(), [("a", 30, True), ('b,"quoted"', None, None)])
+
+    @unittest.skipIf(pa is None, "record batches require pyarrow")
+    def test_loads_record_batch_with_nulls(self) -> None:
+        batch = pa.RecordBatch.from_pandas(_make_df(), preserve_index=False)
+        with self.engine.begin() as conn:
+            SQLiteBulkLoader().load_record_batch(conn, self.table, batch)
+
+        self.assertEqual(self._rows(), [("a", 30, True), ('b,"quoted"', None, None)])
+
+
+class PostgreSQLCopyBulkLoaderTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cursor = FakeCopyCursor()
+        self.conn = SimpleNamespace(dialect=postgresql.dialect(),
+                                    connection=SimpleNamespace(cursor=lambda: self.cursor))
+
+    def test_copies_data_frame_as_csv(self) -> None:
+        PostgreSQLCopyBulkLoader().load(self.conn, _make_table(), _make_df())
+
+        self.assertEqual(self.cursor.statements, [
+            'COPY "Employee Data" ("ID", "Age", "Active") FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'])
+        self.assertEqual(self.cursor.data, ['a,30,True\n"b,""quoted""",\\N,\\N\n'])
+        self.assertTrue(self.cursor.closed)
+
+    @unittest.skipIf(pa is None, "record batches require pyarrow")
+    def test_copies_record_batch_as_csv(self) -> None:
+        batch = pa.RecordBatch.from_pandas(_make_df(), preserve_index=False)
+        PostgreSQLCopyBulkLoader().load_record_batch(self.conn, _make_table(), batch)
+
+        self.assertEqual(self.cursor.statements, [
+            'COPY "Employee Data" ("ID", "Age", "Active") FROM STDIN WITH (FORMAT csv, ENCODING \'UTF8\')'])
+        # Strings are quoted and nulls are left empty and unquoted, which COPY reads as NULL
+        self.assertEqual(self.cursor.data, [b'"a",30,true\n"b,""quoted""",,\n'])
+        self.assertTrue(self.cursor.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+from sqlalchemy import text
+from visier_platform_sdk import ApiClient, Configuration
+
+from catch_up import CatchUp
+from data_store import SQLAlchemyDataStore
+from dv_export import DVExport
+from job_poller import JobPoller
+from stand_in_api import StandInApiServer, SyntheticTenant
+
+TENANT = SyntheticTenant(tables=2, rows=300, files_per_table=2, data_versions=4, change_ratio=0.2,
+                         split_changes=True)
+
+
+class RecordingDVExport(DVExport):
+    """A ``DVExport`` which records the exports it schedules and loads, and can fail before loading one of them."""
+
+    def __init__(self, *args, fail_at_data_version: int | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fail_at_data_version = fail_at_data_version
+        self.scheduled: list[tuple[int, int | None]] = []
+        self.loaded: list[tuple[int, str]] = []
+
+    def generate_data_version_export(self, data_version: int, base_data_version: int | None = None):
+        self.scheduled.append((data_version, base_data_version))
+        return super().generate_data_version_export(data_version, base_data_version)
+
+    def process_metadata(self, export_metadata) -> None:
+        data_version = int(export_metadata.data_version_number)
+        if data_version == self.fail_at_data_version:
+            raise RuntimeError("interrupted")
+        super().process_metadata(export_metadata)
+        self.loaded.append((data_version, export_metadata.uuid))
+
+
+class CatchUpTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.disable(logging.INFO)
+        cls.server = StandInApiServer(TENANT).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.stop()
+        logging.disable(logging.NOTSET)
+
+    def setUp(self) -> None:
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.state_file_path = str(Path(self.work_dir.name) / "catch_up_state.json")
+        self.stores: list[SQLAlchemyDataStore] = []
+
+    def tearDown(self) -> None:
+        for store in self.stores:
+            store.engine.dispose()
+        self.work_dir.cleanup()
+
+    def _create_export(self, db_name: str, fail_at_data_version: int | None = None) -> RecordingDVExport:
+        store = SQLAlchemyDataStore(f"sqlite:///{self.work_dir.name}/{db_name}.db")
+        self.stores.append(store)
+        return RecordingDVExport(ApiClient(Configuration(host=self.server.url, api_key='key', username='user',
+                                                         password='password')),
+                                 store,
+                                 str(Path(self.work_dir.name) / f'{db_name}-downloads') + '/',
+                                 apply_deltas=True,
+                                 job_poller=JobPoller(timeout_secs=60, initial_interval_secs=0.05,
+                                                      max_interval_secs=0.2),
+                                 fail_at_data_version=fail_at_data_version)
+
+    def _load_base(self, db_name: str) -> None:
+        dv_export = self._create_export(db_name)
+        dv_export.process_metadata(dv_export.generate_data_version_export(TENANT.data_version_numbers[0]))
+
+    def _rows(self, db_name: str) -> dict[str, list]:
+        store = SQLAlchemyDataStore(f"sqlite:///{self.work_dir.name}/{db_name}.db")
+        self.stores.append(store)
+        with store.engine.connect() as conn:
+            return {table: conn.execute(text(f'SELECT * FROM "{table}" ORDER BY "ID", "Validity_Start"')).all()
+                    for table in TENANT.table_names}
+
+    def _read_state(self) -> dict:
+        with open(self.state_file_path) as f:
+            return json.load(f)
+
+    def test_interrupted_catch_up_resumes_after_last_loaded_version(self) -> None:
+        first, second, third, fourth = TENANT.data_version_numbers
+        self._load_base("replica")
+
+        dv_export = self._create_export("replica", fail_at_data_version=third)
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            CatchUp(dv_export, self.state_file_path, "replica").run(first, fourth)
+        self.assertEqual([data_version for data_version, _ in dv_export.loaded], [second])
+        # The export of the next data version was scheduled while the one before it was loaded
+        self.assertEqual(dv_export.scheduled, [(second, first), (third, second), (fourth, third)])
+        state = self._read_state()["replica"]
+        self.assertEqual(state["last_loaded_data_version"], second)
+        self.assertEqual(sorted(state["exports"]), [str(third), str(fourth)])
+
+        resumed_export = self._create_export("replica")
+        CatchUp(resumed_export, self.state_file_path, "replica").run(first, fourth)
+
+        # The remaining data versions are loaded in order from the exports the interrupted run scheduled
+        self.assertEqual(resumed_export.loaded, [(third, state["exports"][str(third)]),
+                                                 (fourth, state["exports"][str(fourth)])])
+        self.assertEqual(resumed_export.scheduled, [])
+        self.assertEqual(self._read_state()["replica"], {"last_loaded_data_version": fourth, "exports": {}})
+
+        full_load_export = self._create_export("full-load")
+        full_load_export.process_metadata(full_load_export.generate_data_version_export(fourth))
+        self.assertEqual(self._rows("replica"), self._rows("full-load"))
+
+        # Running it again finds nothing left to load
+        caught_up_export = self._create_export("replica")
+        CatchUp(caught_up_export, self.state_file_path, "replica").run(first, fourth)
+        self.assertEqual(caught_up_export.loaded, [])
+
+    def test_state_is_kept_per_target(self) -> None:
+        first, second, third, fourth = TENANT.data_version_numbers
+        self._load_base("replica-a")
+        self._load_base("replica-b")
+
+        dv_export_a = self._create_export("replica-a")
+        CatchUp(dv_export_a, self.state_file_path, "replica-a").run(first, fourth)
+        dv_export_b = self._create_export("replica-b")
+        CatchUp(dv_export_b, self.state_file_path, "replica-b").run(first, third)
+
+        self.assertEqual([data_version for data_version, _ in dv_export_a.loaded], [second, third, fourth])
+        self.assertEqual([data_version for data_version, _ in dv_export_b.loaded], [second, third])
+        self.assertEqual(self._read_state(), {
+            "replica-a": {"last_loaded_data_version": fourth, "exports": {}},
+            "replica-b": {"last_loaded_data_version": third, "exports": {}},
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+
+from constants import DIFF_ACTION_COLUMN_NAME
+from data_store import SQLAlchemyDataStore
+from dv_export_model import ColumnInfo, ColumnInfoAndFileInfo, ColumnsMetadata, DVExportDataType, TableInfo
+
+TABLE_NAME = "Employee Data"
+ID = ColumnInfo("ID", DVExportDataType.String, allows_null=False, primary_key=True)
+NAME = ColumnInfo("Name", DVExportDataType.String, allows_null=True, primary_key=False)
+AGE = ColumnInfo("Age", DVExportDataType.Integer, allows_null=True, primary_key=False)
+
+
+class SchemaEvolutionTests(unittest.TestCase):
+    """Evolves the columns of an existing SQLite table as a delta export with schema changes would."""
+
+    def setUp(self) -> None:
+        logging.disable(logging.INFO)
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.store = SQLAlchemyDataStore(f"sqlite:///{self.work_dir.name}/replica.db")
+        self.store.begin_export("initial-export", "1000001")
+        self.store.create_initial_table_definition(TableInfo(
+            TABLE_NAME,
+            ColumnsMetadata(common_columns=ColumnInfoAndFileInfo([], []),
+                            new_columns=ColumnInfoAndFileInfo([ID, NAME], []),
+                            deleted_columns=[])))
+        self.store.insert_from_files_into_table(TABLE_NAME, [ID, NAME], [self._write_file(
+            "initial.csv", [ID, NAME], [("e1", "Ada"), ("e2", "Grace"), ("e3", "")])])
+
+    def tearDown(self) -> None:
+        self.store.engine.dispose()
+        self.work_dir.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def _write_file(self, filename: str, column_infos: list[ColumnInfo], rows: list[tuple]) -> str:
+        file_path = Path(self.work_dir.name) / filename
+        lines = [",".join([column_info.name for column_info in column_infos] + [DIFF_ACTION_COLUMN_NAME])]
+        lines += [",".join(list(row) + ["+"]) for row in rows]
+        file_path.write_text("\n".join(lines) + "\n")
+        return str(file_path)
+
+    def _column_names(self) -> list[str]:
+        return [column["name"] for column in inspect(self.store.engine).get_columns(TABLE_NAME)]
+
+    def _rows(self) -> list[tuple]:
+        with self.store.engine.connect() as conn:
+            return conn.execute(text(f'SELECT * FROM "{TABLE_NAME}" ORDER BY "ID"')).all()
+
+    def test_add_column(self) -> None:
+        self.store.add_column(TABLE_NAME, AGE)
+
+        self.assertEqual(self._column_names(), ["ID", "Name", "Age"])
+        self.assertEqual(self._rows(), [("e1", "Ada", None), ("e2", "Grace", None), ("e3", "", None)])
+        self.assertIn("Age", self.store._get_table(TABLE_NAME).c)
+
+    def test_add_existing_column_is_skipped(self) -> None:
+        self.store.add_column(TABLE_NAME, NAME)
+
+        self.assertEqual(self._column_names(), ["ID", "Name"])
+
+    def test_drop_column(self) -> None:
+        self.store.drop_column(TABLE_NAME, "Name")
+
+        self.assertEqual(self._column_names(), ["ID"])
+        self.assertEqual(self._rows(), [("e1",), ("e2",), ("e3",)])
+        self.assertNotIn("Name", self.store._get_table(TABLE_NAME).c)
+
+        # Dropping it again, as a resumed export would, does nothing
+        self.store.drop_column(TABLE_NAME, "Name")
+        self.assertEqual(self._column_names(), ["ID"])
+
+    def test_backfill_new_column_from_delta_file(self) -> None:
+        self.store.begin_export("delta-export", "1000002")
+        self.store.add_column(TABLE_NAME, AGE)
+        self.store.update_columns_from_files(TABLE_NAME, [ID, AGE], [
+            self._write_file("new_columns_0.csv", [ID, AGE], [("e1", "36"), ("e3", "")]),
+            self._write_file("new_columns_1.csv", [ID, AGE], [("e2", "45"), ("e4", "50")]),
+        ])
+
+        # Rows which are not in the table, such as e4, are left to the common column files to insert
+        self.assertEqual(self._rows(), [("e1", "Ada", 36), ("e2", "Grace", 45), ("e3", "", None)])
+
+    def test_evolve_table_with_quoted_names(self) -> None:
+        quoted_column = ColumnInfo('Cost "Center"', DVExportDataType.String, allows_null=True, primary_key=False)
+
+        self.store.add_column(TABLE_NAME, quoted_column)
+        self.store.update_columns_from_files(TABLE_NAME, [ID, quoted_column], [
+            self._write_file("new_columns.csv", [ID, quoted_column], [("e1", "Research")])])
+        self.assertEqual(self._rows()[0], ("e1", "Ada", "Research"))
+        self.store.drop_column(TABLE_NAME, quoted_column.name)
+
+        self.assertEqual(self._column_names(), ["ID", "Name"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from visier_platform_sdk import ApiClient, Configuration
+
+from disk_guard import DiskGuard
+from dv_export import DVExport
+from dv_export_model import FileInfo
+
+# A disk with room for this many bytes of files in the test's directory
+DISK_BYTES = 500
+MIN_FREE_BYTES = 100
+
+
+class FakeDownloadResponse:
+    """A download response whose body has no ``Content-Length``."""
+
+    def __init__(self, body: bytes, chunk_size: int) -> None:
+        self.status = 200
+        self.headers = {}
+        self.data = body
+        self.chunk_size = chunk_size
+
+    def stream(self, chunk_size: int):
+        for start in range(0, len(self.data), self.chunk_size):
+            yield self.data[start:start + self.chunk_size]
+
+    def release_conn(self) -> None:
+        pass
+
+
+class DiskGuardTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.work_dir = tempfile.TemporaryDirectory()
+        # Free space shrinks as files are written to the test's directory, like a real disk
+        patcher = mock.patch("disk_guard.shutil.disk_usage",
+                             side_effect=lambda path: SimpleNamespace(free=DISK_BYTES - self._written_bytes()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.disk_guard = DiskGuard(MIN_FREE_BYTES)
+
+    def tearDown(self) -> None:
+        self.work_dir.cleanup()
+
+    def _written_bytes(self) -> int:
+        return sum(path.stat().st_size for path in Path(self.work_dir.name).rglob("*") if path.is_file())
+
+    def _path(self, filename: str) -> str:
+        return str(Path(self.work_dir.name) / filename)
+
+    def _dv_export(self, **kwargs) -> DVExport:
+        return DVExport(ApiClient(Configuration(host="http://localhost")), None, self.work_dir.name + "/",
+                        download_chunk_size=10, disk_guard=self.disk_guard, **kwargs)
+
+    def _download(self, dv_export: DVExport, num_bytes: int, stream: bool) -> int:
+        response = FakeDownloadResponse(b"x" * num_bytes, dv_export.download_chunk_size)
+        dv_export.client = SimpleNamespace(call_1_alpha_download_file_without_preload_content=lambda **_: response)
+        download = dv_export._stream_file_to_path if stream else dv_export._read_file_to_path
+        return download("export", "Employee", FileInfo(1, "part.csv"), self._path("part.csv"))
+
+    def test_written_bytes_are_not_counted_twice(self) -> None:
+        self.disk_guard.reserve(self._path("a.csv"), 300, "a")
+        Path(self._path("a.csv")).write_bytes(b"a" * 200)
+
+        # 300 bytes are free, and file a still has 100 bytes to write
+        with self.assertRaisesRegex(Exception, "Refusing to write b"):
+            self.disk_guard.reserve(self._path("b.csv"), 101, "b")
+        self.assertEqual(self.disk_guard.reserve(self._path("b.csv"), 100, "b"), 100)
+
+        Path(self._path("a.csv")).write_bytes(b"a" * 300)
+        self.disk_guard.release(self._path("a.csv"), 300)
+        # 200 bytes are free, and file b has 100 bytes to write
+        self.assertEqual(self.disk_guard._unwritten_bytes(), 100)
+        with self.assertRaisesRegex(Exception, "Refusing to write c"):
+            self.disk_guard.reserve(self._path("c.csv"), 1, "c")
+        self.disk_guard.release(self._path("b.csv"), 100)
+        self.assertEqual(self.disk_guard._reserved_bytes, {})
+
+    def test_compressed_files_count_their_reservation(self) -> None:
+        self.disk_guard.reserve(self._path("a.csv.gz"), 300, "a")
+        Path(self._path("a.csv.gz")).write_bytes(b"a" * 60)
+
+        self.assertEqual(self.disk_guard._unwritten_bytes(), 240)
+
+    def test_reservations_add_up_per_file(self) -> None:
+        for _ in range(3):
+            self.disk_guard.reserve(self._path("a.csv"), 10, "a")
+        self.disk_guard.release(self._path("a.csv"), 30)
+
+        self.assertEqual(self.disk_guard._reserved_bytes, {})
+
+    def test_streamed_body_of_unknown_size_uses_all_headroom(self) -> None:
+        dv_export = self._dv_export(stream_downloads=True)
+
+        # Leaving exactly MIN_FREE_BYTES free is allowed
+        self.assertEqual(self._download(dv_export, DISK_BYTES - MIN_FREE_BYTES, stream=True), 400)
+        self.assertEqual(self.disk_guard._reserved_bytes, {})
+
+    def test_streamed_body_of_unknown_size_stops_at_headroom(self) -> None:
+        dv_export = self._dv_export(stream_downloads=True)
+
+        with self.assertRaisesRegex(Exception, "Refusing to write file=part.csv"):
+            self._download(dv_export, 450, stream=True)
+
+        self.assertEqual(self._written_bytes(), 400)
+        self.assertEqual(self.disk_guard._reserved_bytes, {})
+
+    def test_read_body_of_unknown_size(self) -> None:
+        dv_export = self._dv_export()
+
+        self.assertEqual(self._download(dv_export, 400, stream=False), 400)
+        Path(self._path("part.csv")).unlink()
+        with self.assertRaisesRegex(Exception, "Refusing to write file=part.csv"):
+            self._download(dv_export, 401, stream=False)
+        self.assertEqual(self.disk_guard._reserved_bytes, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
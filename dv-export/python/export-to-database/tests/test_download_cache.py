@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from download_cache import DownloadCache
+
+
+class DownloadCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.work_dir.name) / "cache"
+        self.download_dir = Path(self.work_dir.name) / "downloads"
+        self.download_dir.mkdir()
+        # Every use of the cache is a second later than the last, so that least recently used is well defined
+        clock = itertools.count(1000)
+        patcher = mock.patch("download_cache.time.time", side_effect=lambda: next(clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.work_dir.cleanup()
+
+    def _download(self, filename: str, contents: bytes) -> str:
+        file_path = self.download_dir / filename
+        file_path.write_bytes(contents)
+        return str(file_path)
+
+    def _dest(self, filename: str) -> str:
+        return str(self.download_dir / f"cached_{filename}")
+
+    def _object_files(self) -> list[Path]:
+        return [path for path in (self.cache_dir / "objects").rglob("*") if path.is_file()]
+
+    def test_hit_is_verified_and_returns_checksum(self) -> None:
+        cache = DownloadCache(str(self.cache_dir))
+        contents = b"ID,Name\ne1,Ada\n"
+        cache.put("export", 1, self._download("part_1.csv", contents))
+
+        sha256 = cache.get("export", 1, self._dest("part_1.csv"))
+
+        self.assertEqual(sha256, hashlib.sha256(contents).hexdigest())
+        self.assertEqual(Path(self._dest("part_1.csv")).read_bytes(), contents)
+        self.assertEqual(cache.get_size("export", 1), len(contents))
+
+    def test_miss(self) -> None:
+        cache = DownloadCache(str(self.cache_dir))
+        cache.put("export", 1, self._download("part_1.csv", b"a"))
+
+        self.assertIsNone(cache.get("export", 2, self._dest("part_2.csv")))
+        self.assertIsNone(cache.get("other-export", 1, self._dest("part_1.csv")))
+        self.assertIsNone(cache.get("export", 1, self._dest("part_1.csv"), variant=".gz"))
+        self.assertIsNone(cache.get_size("export", 2))
+
+    def test_index_persists_between_instances(self) -> None:
+        DownloadCache(str(self.cache_dir)).put("export", 1, self._download("part_1.csv", b"rows"))
+
+        cache = DownloadCache(str(self.cache_dir))
+
+        self.assertIsNotNone(cache.get("export", 1, self._dest("part_1.csv")))
+
+    def test_corrupt_entry_is_rejected_and_removed(self) -> None:
+        cache = DownloadCache(str(self.cache_dir))
+        cache.put("export", 1, self._download("part_1.csv", b"ID,Name\ne1,Ada\n"))
+        [object_file] = self._object_files()
+        object_file.write_bytes(b"ID,Name\ne1,Eve\n")
+
+        with self.assertLogs("download_cache", level="WARNING"):
+            self.assertIsNone(cache.get("export", 1, self._dest("part_1.csv")))
+
+        self.assertFalse(Path(self._dest("part_1.csv")).exists())
+        self.assertEqual(self._object_files(), [])
+        self.assertIsNone(cache.get_size("export", 1))
+        self.assertIsNone(DownloadCache(str(self.cache_dir)).get_size("export", 1))
+
+    def test_missing_object_is_a_miss(self) -> None:
+        cache = DownloadCache(str(self.cache_dir))
+        cache.put("export", 1, self._download("part_1.csv", b"rows"))
+        [object_file] = self._object_files()
+        object_file.unlink()
+
+        with self.assertLogs("download_cache", level="WARNING"):
+            self.assertIsNone(cache.get("export", 1, self._dest("part_1.csv")))
+        self.assertIsNone(cache.get_size("export", 1))
+
+    def test_evicts_least_recently_used_under_byte_cap(self) -> None:
+        cache = DownloadCache(str(self.cache_dir), max_bytes=250)
+        cache.put("export", 1, self._download("part_1.csv", b"1" * 100))
+        cache.put("export", 2, self._download("part_2.csv", b"2" * 100))
+        # Using file 1 makes file 2 the least recently used
+        self.assertIsNotNone(cache.get("export", 1, self._dest("part_1.csv")))
+
+        with self.assertLogs("download_cache", level="INFO") as logs:
+            cache.put("export", 3, self._download("part_3.csv", b"3" * 100))
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("export/2", logs.output[0])
+        self.assertIsNone(cache.get_size("export", 2))
+        self.assertEqual(cache.get_size("export", 1), 100)
+        self.assertEqual(cache.get_size("export", 3), 100)
+        self.assertEqual(len(self._object_files()), 2)
+        self.assertLessEqual(sum(path.stat().st_size for path in self._object_files()), 250)
+
+    def test_shared_contents_are_stored_once_and_kept_until_last_key_is_evicted(self) -> None:
+        cache = DownloadCache(str(self.cache_dir), max_bytes=250)
+        cache.put("export-1", 1, self._download("part_1.csv", b"s" * 100))
+        cache.put("export-2", 1, self._download("part_1.csv", b"s" * 100))
+        self.assertEqual(len(self._object_files()), 1)
+
+        logging.disable(logging.INFO)
+        try:
+            cache.put("export-2", 2, self._download("part_2.csv", b"2" * 100))
+            cache.put("export-2", 3, self._download("part_3.csv", b"3" * 100))
+        finally:
+            logging.disable(logging.NOTSET)
+
+        # Both keys of the shared contents are evicted before the contents are deleted
+        self.assertIsNone(cache.get_size("export-1", 1))
+        self.assertIsNone(cache.get_size("export-2", 1))
+        self.assertEqual(len(self._object_files()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+from sqlalchemy import text
+from visier_platform_sdk import ApiClient, Configuration
+
+from arrow_csv import pa
+from data_store import SQLAlchemyDataStore
+from disk_guard import DiskGuard
+from dv_export import DVExport
+from job_poller import JobPoller
+from memory_budget import MemoryBudget
+from stand_in_api import StandInApiServer, SyntheticTenant
+
+TENANT = SyntheticTenant(tables=2,
+                         rows=2000,
+                         files_per_table=3,
+                         data_versions=3,
+                         cardinality=20,
+                         null_ratio=0.2,
+                         change_ratio=0.2,
+                         split_changes=True)
+
+
+class EndToEndTests(unittest.TestCase):
+    """
+    Loads an initial export followed by a chain of delta exports from the stand-in API, and checks that the tables
+    end up the same as a fresh load of the last data version, with the loading features combined in different ways.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.disable(logging.INFO)
+        cls.server = StandInApiServer(TENANT).start()
+        cls.expected_rows = cls._run(cls, [(TENANT.data_version_numbers[-1], None)])
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.stop()
+        logging.disable(logging.NOTSET)
+
+    def _run(self,
+             exports: list[tuple[int, int | None]],
+             store_kwargs: dict | None = None,
+             export_kwargs: dict | None = None,
+             interrupt_at_file: int | None = None) -> dict[str, list]:
+        """
+        Load each ``(data_version, base_data_version)`` export into a new SQLite database and return the rows of
+        every table. With ``interrupt_at_file``, loading that part file fails once, and the load is resumed by
+        processing the same export again.
+        """
+        store_kwargs = store_kwargs or {}
+        export_kwargs = export_kwargs or {}
+        with tempfile.TemporaryDirectory() as work_dir:
+            def create_export() -> tuple[SQLAlchemyDataStore, DVExport]:
+                store = SQLAlchemyDataStore(f"sqlite:///{work_dir}/replica.db", **store_kwargs)
+                dv_export = DVExport(ApiClient(Configuration(host=self.server.url, api_key='key', username='user',
+                                                             password='password')),
+                                     store,
+                                     str(Path(work_dir) / 'downloads') + '/',
+                                     apply_deltas=True,
+                                     job_poller=JobPoller(timeout_secs=60, initial_interval_secs=0.05,
+                                                          max_interval_secs=0.2),
+                                     **export_kwargs)
+                return store, dv_export
+
+            store, dv_export = create_export()
+            try:
+                for data_version, base_data_version in exports:
+                    metadata = dv_export.generate_data_version_export(data_version, base_data_version)
+                    if interrupt_at_file is not None:
+                        self._interrupt_load(store, interrupt_at_file)
+                        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+                            dv_export.process_metadata(metadata)
+                        self._shutdown(store)
+                        store, dv_export = create_export()
+                        interrupt_at_file = None
+                    dv_export.process_metadata(metadata)
+
+                with store.engine.connect() as conn:
+                    return {table: conn.execute(text(f'SELECT * FROM "{table}" ORDER BY "ID", "Validity_Start"')).all()
+                            for table in TENANT.table_names}
+            finally:
+                self._shutdown(store)
+
+    @staticmethod
+    def _interrupt_load(store: SQLAlchemyDataStore, file_number: int) -> None:
+        load_file = store._load_file
+        num_files = 0
+
+        def interrupting_load_file(*args, **kwargs):
+            nonlocal num_files
+            num_files += 1
+            if num_files == file_number:
+                raise RuntimeError("interrupted")
+            return load_file(*args, **kwargs)
+
+        store._load_file = interrupting_load_file
+
+    @staticmethod
+    def _shutdown(store: SQLAlchemyDataStore) -> None:
+        if store.parse_pool is not None:
+            store.parse_pool.shutdown()
+        store.engine.dispose()
+
+    def _assert_deltas_match_full_load(self, **kwargs) -> None:
+        versions = TENANT.data_version_numbers
+        exports = [(versions[0], None)] + [(version, base) for base, version in zip(versions, versions[1:])]
+        rows = self._run(exports, **kwargs)
+        for table in TENANT.table_names:
+            self.assertEqual(len(rows[table]), len(self.expected_rows[table]))
+            self.assertEqual(rows[table], self.expected_rows[table], f"rows of table={table} differ")
+
+    def test_deltas_match_full_load(self) -> None:
+        self._assert_deltas_match_full_load()
+
+    def test_native_bulk_load(self) -> None:
+        self._assert_deltas_match_full_load(store_kwargs={'native_bulk_load': True})
+
+    @unittest.skipIf(pa is None, "the pyarrow parse engine requires pyarrow")
+    def test_native_bulk_load_of_record_batches(self) -> None:
+        self._assert_deltas_match_full_load(store_kwargs={'native_bulk_load': True,
+                                                          'parse_engine': 'pyarrow',
+                                                          'checkpoints': True},
+                                            export_kwargs={'resume_from_checkpoints': True},
+                                            interrupt_at_file=2)
+
+    def test_pipeline_with_concurrent_downloads(self) -> None:
+        self._assert_deltas_match_full_load(export_kwargs={'pipeline_queue_size': 2,
+                                                           'download_concurrency': 2,
+                                                           'stream_downloads': True,
+                                                           'staging_compression': 'gzip'})
+
+    def test_checkpoints_resume_interrupted_pipeline(self) -> None:
+        self._assert_deltas_match_full_load(store_kwargs={'checkpoints': True, 'delete_loaded_files': True},
+                                            export_kwargs={'pipeline_queue_size': 2,
+                                                           'resume_from_checkpoints': True},
+                                            interrupt_at_file=2)
+
+    def test_shadow_load_resumes_into_shadow_table(self) -> None:
+        self._assert_deltas_match_full_load(store_kwargs={'checkpoints': True,
+                                                          'shadow_load': True,
+                                                          'defer_indexes': True},
+                                            export_kwargs={'resume_from_checkpoints': True},
+                                            interrupt_at_file=2)
+
+    @unittest.skipIf(pa is None, "parse workers require pyarrow")
+    def test_parse_workers_with_pipeline_and_checkpoints(self) -> None:
+        memory_budget = MemoryBudget(4 * 1024 * 1024)
+        disk_guard = DiskGuard(0)
+        self._assert_deltas_match_full_load(store_kwargs={'parse_workers': 2,
+                                                          'checkpoints': True,
+                                                          'memory_budget': memory_budget,
+                                                          'disk_guard': disk_guard},
+                                            export_kwargs={'pipeline_queue_size': 2,
+                                                           'resume_from_checkpoints': True,
+                                                           'memory_budget': memory_budget,
+                                                           'disk_guard': disk_guard},
+                                            interrupt_at_file=3)
+        self.assertEqual(memory_budget._reserved_bytes, 0)
+        self.assertEqual(disk_guard._reserved_bytes, {})
+
+    @unittest.skipIf(pa is None, "parse workers require pyarrow")
+    def test_parse_workers_with_shadow_load(self) -> None:
+        self._assert_deltas_match_full_load(store_kwargs={'parse_workers': 2,
+                                                          'parse_engine': 'pyarrow',
+                                                          'shadow_load': True,
+                                                          'csv_chunk_size': 500},
+                                            export_kwargs={'pipeline_queue_size': 3, 'download_concurrency': 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
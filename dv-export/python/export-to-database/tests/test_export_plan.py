@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from visier_platform_sdk import DataVersionExportColumnDTO, DataVersionExportDTO, DataVersionExportFileDTO, \
+    DataVersionExportPartFileDTO, DataVersionExportTableDTO
+
+from dv_export_model import ColumnInfo, DVExportDataType, estimate_row_bytes
+from export_plan import (ACTION_APPEND, ACTION_CREATE, ACTION_DROP, ACTION_EVOLVE, ACTION_MERGE, ACTION_SKIP,
+                         ExportPlanner, TablePlan, format_export_plan, recommend_parallelism)
+from memory_budget import STAGING_COMPRESSION_RATIO
+
+ID_COLUMN = DataVersionExportColumnDTO(name="ID", data_type="String", allows_null=False,
+                                       is_primary_key_component=True)
+NAME_COLUMN = DataVersionExportColumnDTO(name="Name", data_type="String", allows_null=True,
+                                         is_primary_key_component=False)
+SCORE_COLUMN = DataVersionExportColumnDTO(name="Score", data_type="Integer", allows_null=True,
+                                          is_primary_key_component=False)
+ROW_BYTES = estimate_row_bytes([ColumnInfo("ID", DVExportDataType.String, False, True),
+                                ColumnInfo("Name", DVExportDataType.String, True, False)])
+
+
+def _files(columns: list, file_ids: list[int]) -> DataVersionExportFileDTO:
+    part_files = [DataVersionExportPartFileDTO(file_id=file_id, filename=f"part_{file_id}.csv") for file_id in file_ids]
+    return DataVersionExportFileDTO(columns=columns, files=part_files)
+
+
+def _table(name: str,
+           common_file_ids: list[int],
+           new_file_ids: list[int] = (),
+           new_columns: list = (),
+           deleted_columns: list[str] = ()) -> DataVersionExportTableDTO:
+    return DataVersionExportTableDTO(name=name,
+                                     common_columns=_files([ID_COLUMN, NAME_COLUMN], common_file_ids),
+                                     new_columns=_files(list(new_columns), list(new_file_ids)),
+                                     deleted_columns=list(deleted_columns))
+
+
+class FakeResponse:
+    def __init__(self, content_length: int | None) -> None:
+        self.status = 200
+        self.headers = {'Content-Length': str(content_length)} if content_length is not None else {}
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeDownloadClient:
+    """Reports a ``Content-Length`` for each file ID, or none for files missing from ``file_sizes``."""
+
+    def __init__(self, file_sizes: dict[int, int]) -> None:
+        self.file_sizes = file_sizes
+        self.responses: dict[int, FakeResponse] = {}
+        self._lock = threading.Lock()
+
+    def call_1_alpha_download_file_without_preload_content(self, export_uuid: str, file_id: int) -> FakeResponse:
+        response = FakeResponse(self.file_sizes.get(file_id))
+        with self._lock:
+            self.responses[file_id] = response
+        return response
+
+
+class FakeDownloadCache:
+    def __init__(self, sizes: dict[tuple[int, str], int]) -> None:
+        self.sizes = sizes
+
+    def get_size(self, export_uuid: str, file_id: int, variant: str = '') -> int | None:
+        return self.sizes.get((file_id, variant))
+
+
+class ExportPlannerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = FakeDownloadClient({1: 1000, 2: 3000, 3: 500, 6: 700})
+        self.existing_tables = {"Employee", "Applicant", "Position"}
+
+    def _planner(self, **settings) -> ExportPlanner:
+        dv_export = SimpleNamespace(client=self.client,
+                                    data_store=SimpleNamespace(has_table=lambda name: name in self.existing_tables),
+                                    download_cache=FakeDownloadCache({(4, '.gz'): 100, (5, ''): 400}),
+                                    staging_compression='gzip',
+                                    download_concurrency=2,
+                                    table_concurrency=1,
+                                    apply_deltas=False,
+                                    evolve_schemas=False,
+                                    resume_from_checkpoints=False)
+        vars(dv_export).update(settings)
+        return ExportPlanner(dv_export)
+
+    @staticmethod
+    def _delta_export() -> DataVersionExportDTO:
+        return DataVersionExportDTO(uuid="export",
+                                    timestamp="0",
+                                    data_version_number="1000002",
+                                    base_data_version_number="1000001",
+                                    tables=[_table("Employee", [1, 2]),
+                                            _table("Position", [], new_file_ids=[3, 4, 5],
+                                                   new_columns=[ID_COLUMN, NAME_COLUMN]),
+                                            _table("Applicant", [6], new_file_ids=[7],
+                                                   new_columns=[ID_COLUMN, SCORE_COLUMN])],
+                                    new_tables=["Position"],
+                                    deleted_tables=["Requisition"])
+
+    def test_plan_of_delta_export(self) -> None:
+        self.existing_tables = {"Employee", "Applicant"}
+        with mock.patch("export_plan.os.cpu_count", return_value=8):
+            plan = self._planner().plan(self._delta_export())
+
+        self.assertFalse(plan.is_initial_export)
+        self.assertEqual([(table.name, table.action) for table in plan.tables],
+                         [("Requisition", ACTION_DROP), ("Employee", ACTION_APPEND), ("Position", ACTION_CREATE),
+                          ("Applicant", ACTION_SKIP)])
+        employee, position, applicant = plan.tables[1:]
+
+        self.assertEqual((employee.num_files, employee.estimated_bytes, employee.num_unsized_files), (2, 4000, 0))
+        self.assertEqual(employee.estimated_rows, 1000 // ROW_BYTES + 3000 // ROW_BYTES)
+
+        # File 3 is not cached, file 4 is cached compressed, and file 5 is only cached uncompressed, so its size is
+        # requested and unknown
+        self.assertEqual((position.num_files, position.num_unsized_files), (3, 1))
+        self.assertEqual(position.estimated_bytes, 500 + 100 * STAGING_COMPRESSION_RATIO)
+
+        self.assertEqual((applicant.num_files, applicant.estimated_bytes), (0, 0))
+        self.assertEqual(applicant.new_columns, ["Score"])
+        self.assertIn("EVOLVE_SCHEMAS", applicant.notes[0])
+
+        # Only files that would be loaded and are not cached are requested, and every response is closed
+        self.assertEqual(sorted(self.client.responses), [1, 2, 3, 5])
+        self.assertTrue(all(response.closed for response in self.client.responses.values()))
+
+        self.assertEqual((plan.num_files, plan.estimated_bytes), (5, 5000))
+        # Position fits alongside Employee, and Position has the most files
+        self.assertEqual((plan.recommended_table_concurrency, plan.recommended_download_concurrency), (2, 3))
+
+    def test_plan_with_merges_and_schema_evolution(self) -> None:
+        plan = self._planner(apply_deltas=True, evolve_schemas=True).plan(self._delta_export())
+
+        actions = {table.name: table.action for table in plan.tables}
+        self.assertEqual(actions["Employee"], ACTION_MERGE)
+        self.assertEqual(actions["Applicant"], ACTION_EVOLVE)
+        # The common column files are loaded, then the new column files backfill the new columns
+        applicant = plan.tables[-1]
+        self.assertEqual((applicant.num_files, applicant.num_unsized_files), (2, 1))
+        self.assertEqual(applicant.estimated_bytes, 700)
+        # Position is new in the export but already exists in a data store which only adds files, such as Parquet
+        position = plan.tables[2]
+        self.assertEqual(position.action, ACTION_APPEND)
+        self.assertIn("already exists", position.notes[0])
+
+    def test_format_export_plan(self) -> None:
+        self.existing_tables = {"Employee", "Applicant"}
+        report = format_export_plan(self._planner().plan(self._delta_export()))
+
+        lines = report.splitlines()
+        self.assertEqual(lines[0], "Plan for delta export=export of data_version=1000002")
+        self.assertIn("1 files have an unknown size and are not in the estimates", report)
+        self.assertIn("Total: 5 files", lines[-2])
+        self.assertIn("1 to drop, 1 to append, 1 to create, 1 to skip", lines[-2])
+        self.assertTrue(lines[-1].startswith("Recommended: TABLE_CONCURRENCY="))
+
+
+class RecommendParallelismTests(unittest.TestCase):
+    def _recommend(self, tables: list[tuple[int, int]], cpu_count: int = 8) -> tuple[int, int]:
+        """Recommend parallelism for tables given as ``(num_files, estimated_bytes)``."""
+        table_plans = [TablePlan(f"table_{i}", ACTION_CREATE, num_files=num_files, estimated_bytes=estimated_bytes)
+                       for i, (num_files, estimated_bytes) in enumerate(tables)]
+        with mock.patch("export_plan.os.cpu_count", return_value=cpu_count):
+            return recommend_parallelism(table_plans)
+
+    def test_nothing_to_load(self) -> None:
+        self.assertEqual(self._recommend([]), (1, 1))
+        self.assertEqual(self._recommend([(0, 0), (0, 0)]), (1, 1))
+
+    def test_tables_fit_alongside_largest_table(self) -> None:
+        # The other tables load in the time of the largest table with one more table at a time
+        self.assertEqual(self._recommend([(20, 900), (2, 100), (2, 100), (2, 100)]), (2, 8))
+
+    def test_similar_tables_are_limited_by_cpus(self) -> None:
+        self.assertEqual(self._recommend([(3, 100)] * 4, cpu_count=2), (2, 3))
+        self.assertEqual(self._recommend([(3, 100)] * 4), (4, 3))
+
+    def test_unknown_sizes_load_every_table_at_once(self) -> None:
+        self.assertEqual(self._recommend([(1, 0), (1, 0), (1, 0)]), (3, 1))
+
+    def test_downloads_are_limited_by_files(self) -> None:
+        self.assertEqual(self._recommend([(5, 100), (1, 100)]), (2, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
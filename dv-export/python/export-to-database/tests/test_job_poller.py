@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+
+from visier_platform_sdk import ApiException
+
+from job_poller import JobPoller
+
+
+class FakeClock:
+    """A clock which only moves forward when the poller sleeps."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, secs: float) -> None:
+        self.sleeps.append(secs)
+        self.now += secs
+
+
+class FakeExportClient:
+    """
+    Returns scripted statuses for each job. A status is ``'running'``, ``'completed'``, ``'failed'``, or an HTTP
+    status code to raise an ``ApiException`` with. The last status of a job repeats once its script runs out.
+    """
+
+    def __init__(self, clock: FakeClock, statuses: dict[str, list]) -> None:
+        self.clock = clock
+        self.statuses = {job_id: list(job_statuses) for job_id, job_statuses in statuses.items()}
+        self.polls: list[tuple[str, float]] = []
+
+    def get_export_job_status(self, job_id: str) -> SimpleNamespace:
+        self.polls.append((job_id, self.clock()))
+        job_statuses = self.statuses[job_id]
+        status = job_statuses.pop(0) if len(job_statuses) > 1 else job_statuses[0]
+        if isinstance(status, int):
+            raise ApiException(status=status, reason="error")
+        return SimpleNamespace(completed=status == "completed",
+                               failed=status == "failed",
+                               export_uuid=f"export-{job_id}")
+
+
+class JobPollerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+
+    def _poller(self, timeout_secs: float = 1000, jitter: float = 0, **kwargs) -> JobPoller:
+        return JobPoller(timeout_secs,
+                         jitter=jitter,
+                         sleep=self.clock.sleep,
+                         clock=self.clock,
+                         **kwargs)
+
+    def test_interval_grows_by_multiplier_up_to_max(self) -> None:
+        client = FakeExportClient(self.clock, {"job": ["running"] * 6 + ["completed"]})
+        poller = self._poller(initial_interval_secs=1, max_interval_secs=10, multiplier=2)
+
+        self.assertEqual(poller.wait_for_job(client, "job"), "export-job")
+
+        self.assertEqual(self.clock.sleeps, [1, 2, 4, 8, 10, 10, 10])
+        self.assertEqual(len(client.polls), 7)
+
+    def test_jitter_stays_within_bounds(self) -> None:
+        client = FakeExportClient(self.clock, {"job": ["running"] * 50 + ["completed"]})
+        poller = self._poller(initial_interval_secs=10, max_interval_secs=10, multiplier=1, jitter=0.2)
+
+        poller.wait_for_job(client, "job")
+
+        self.assertEqual(len(self.clock.sleeps), 51)
+        for secs in self.clock.sleeps:
+            self.assertGreaterEqual(secs, 8)
+            self.assertLessEqual(secs, 12)
+        self.assertGreater(len(set(self.clock.sleeps)), 1)
+
+    def test_raises_once_deadline_passes(self) -> None:
+        client = FakeExportClient(self.clock, {"job": ["running"]})
+        poller = self._poller(timeout_secs=20, initial_interval_secs=1, max_interval_secs=8, multiplier=2)
+
+        with self.assertRaisesRegex(Exception, "did not finish within 20 seconds"):
+            poller.wait_for_job(client, "job")
+
+        # Polls at 1, 3, 7, and 15 seconds, then the last poll is moved up to the deadline
+        self.assertEqual([poll_time for _, poll_time in client.polls], [1, 3, 7, 15, 20])
+
+    def test_job_finishing_at_deadline_is_seen(self) -> None:
+        client = FakeExportClient(self.clock, {"job": ["running"] * 4 + ["completed"]})
+        poller = self._poller(timeout_secs=20, initial_interval_secs=1, max_interval_secs=8, multiplier=2)
+
+        self.assertEqual(poller.wait_for_job(client, "job"), "export-job")
+        self.assertEqual(client.polls[-1][1], 20)
+
+    def test_retries_rate_limit_and_server_errors(self) -> None:
+        for status in (429, 500, 502, 503, 504):
+            with self.subTest(status=status):
+                clock = FakeClock()
+                client = FakeExportClient(clock, {"job": [status, status, "completed"]})
+                poller = JobPoller(1000, jitter=0, sleep=clock.sleep, clock=clock)
+
+                with self.assertLogs("job_poller", level="WARNING") as logs:
+                    self.assertEqual(poller.wait_for_job(client, "job"), "export-job")
+
+                self.assertEqual(len(client.polls), 3)
+                self.assertEqual(len(logs.records), 2)
+                self.assertIn(f"status={status}", logs.output[0])
+
+    def test_retryable_errors_back_off(self) -> None:
+        client = FakeExportClient(self.clock, {"job": [503, 429, 503, "completed"]})
+        poller = self._poller(initial_interval_secs=1, max_interval_secs=60, multiplier=2)
+
+        with self.assertLogs("job_poller", level="WARNING"):
+            poller.wait_for_job(client, "job")
+
+        self.assertEqual(self.clock.sleeps, [1, 2, 4, 8])
+
+    def test_other_errors_are_raised_immediately(self) -> None:
+        client = FakeExportClient(self.clock, {"job": [404]})
+        poller = self._poller()
+
+        with self.assertRaisesRegex(Exception, "Failed to get export job status"):
+            poller.wait_for_job(client, "job")
+
+        self.assertEqual(len(client.polls), 1)
+
+    def test_failed_job_raises(self) -> None:
+        client = FakeExportClient(self.clock, {"job": ["running", "failed"]})
+        poller = self._poller()
+
+        with self.assertRaisesRegex(Exception, "failed"):
+            poller.wait_for_job(client, "job")
+
+    def test_waits_for_several_jobs_in_one_loop(self) -> None:
+        client = FakeExportClient(self.clock, {
+            "slow": ["running"] * 3 + ["completed"],
+            "fast": ["completed"],
+        })
+        poller = self._poller(initial_interval_secs=1, max_interval_secs=60, multiplier=2)
+
+        export_ids = poller.wait_for_jobs(client, ["slow", "fast"])
+
+        self.assertEqual(export_ids, {"slow": "export-slow", "fast": "export-fast"})
+        self.assertEqual([job_id for job_id, _ in client.polls], ["fast", "slow", "slow", "slow", "slow"])
+        # Jobs due at the same time are polled without sleeping in between
+        self.assertEqual(self.clock.sleeps, [1, 2, 4, 8])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from visier_platform_sdk import ApiClient, Configuration
+
+from constants import DIFF_ACTION_COLUMN_NAME, DIFF_ACTION_DELETE, DIFF_ACTION_INSERT
+from dv_export import DVExport
+from job_poller import JobPoller
+from parquet_data_store import pa, ParquetDataStore
+from stand_in_api import StandInApiServer, SyntheticTenant
+
+if pa is not None:
+    import pyarrow.parquet as pq
+
+TENANT = SyntheticTenant(tables=2, rows=500, files_per_table=2, data_versions=2, change_ratio=0.2,
+                         split_changes=True)
+
+
+@unittest.skipIf(pa is None, "the Parquet data store requires pyarrow")
+class ParquetDataStoreTests(unittest.TestCase):
+    """Writes an initial export and a delta export from the stand-in API as Parquet partitions."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.disable(logging.INFO)
+        cls.server = StandInApiServer(TENANT).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.stop()
+        logging.disable(logging.NOTSET)
+
+    def setUp(self) -> None:
+        self.work_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.work_dir.cleanup()
+
+    def _load(self, replica_name: str, exports: list[tuple[int, int | None]], apply_deltas: bool) -> Path:
+        replica_dir = Path(self.work_dir.name) / replica_name
+        dv_export = DVExport(ApiClient(Configuration(host=self.server.url, api_key='key', username='user',
+                                                     password='password')),
+                             ParquetDataStore(str(replica_dir)),
+                             str(Path(self.work_dir.name) / f'{replica_name}-downloads') + '/',
+                             apply_deltas=apply_deltas,
+                             job_poller=JobPoller(timeout_secs=60, initial_interval_secs=0.05, max_interval_secs=0.2))
+        for data_version, base_data_version in exports:
+            dv_export.process_metadata(dv_export.generate_data_version_export(data_version, base_data_version))
+        return replica_dir
+
+    @staticmethod
+    def _read_partition(partition_dir: Path) -> 'pa.Table':
+        return pa.concat_tables([pq.read_table(path) for path in sorted(partition_dir.glob('*.parquet'))])
+
+    @staticmethod
+    def _row_counts(table: 'pa.Table') -> Counter:
+        return Counter(tuple(row.values()) for row in table.to_pylist())
+
+    def _assert_delta_partitions(self, apply_deltas: bool) -> None:
+        base_version, version = TENANT.data_version_numbers
+        replica_dir = self._load('replica', [(base_version, None), (version, base_version)], apply_deltas)
+        full_load_dir = self._load('full-load', [(version, None)], apply_deltas)
+
+        for table_name in TENANT.table_names:
+            table_dir = replica_dir / table_name
+            self.assertEqual(sorted(path.name for path in table_dir.iterdir()),
+                             [f"data_version={base_version}", f"data_version={version}"])
+
+            base = self._read_partition(table_dir / f"data_version={base_version}")
+            self.assertNotIn(DIFF_ACTION_COLUMN_NAME, base.column_names)
+            self.assertEqual(base.num_rows, TENANT.row_count(0))
+
+            delta = self._read_partition(table_dir / f"data_version={version}")
+            diff_actions = Counter(delta.column(DIFF_ACTION_COLUMN_NAME).to_pylist())
+            self.assertEqual(set(diff_actions), {DIFF_ACTION_DELETE, DIFF_ACTION_INSERT})
+
+            # Replaying the delta onto the base partition gives the same rows as a full load of the data version
+            rows = self._row_counts(base)
+            for row in delta.to_pylist():
+                diff_action = row.pop(DIFF_ACTION_COLUMN_NAME)
+                rows[tuple(row.values())] += 1 if diff_action == DIFF_ACTION_INSERT else -1
+            expected = self._row_counts(self._read_partition(full_load_dir / table_name / f"data_version={version}"))
+            self.assertEqual(+rows, expected)
+            self.assertEqual(sum(rows.values()), TENANT.row_count(1))
+
+    def test_delta_partitions_keep_removed_rows(self) -> None:
+        self._assert_delta_partitions(apply_deltas=False)
+
+    def test_delta_partitions_keep_removed_rows_when_applying_deltas(self) -> None:
+        self._assert_delta_partitions(apply_deltas=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
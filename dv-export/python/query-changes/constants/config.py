@@ -3,6 +3,7 @@ DV_EXPORT_FILES_PATH = 'DV_EXPORT_FILES_PATH'
 DV_JOB_STATUS_POLL_INTERVAL_SECONDS = 'DV_JOB_STATUS_POLL_INTERVAL_SECONDS'
 DV_JOB_TIMEOUT_SECONDS = 'DV_JOB_TIMEOUT_SECONDS'
 DV_SAVE_EXPORT_FILES_ON_DISK = 'DV_SAVE_EXPORT_FILES_ON_DISK'
+SCHEMA_CACHE_FILE = 'SCHEMA_CACHE_FILE'
 
 VISIER_HOST = 'VISIER_HOST'
 VISIER_APIKEY = 'VISIER_APIKEY'
@@ -1,12 +1,16 @@
 import logging
-from typing import Set, List
+import threading
+from typing import Set, List, Optional
 
-from sqlalchemy import String, Float, Integer, BigInteger, Boolean, insert, create_engine, Column, Table, MetaData
+from sqlalchemy import String, Float, Integer, BigInteger, Boolean, insert, create_engine, Column, Table, MetaData, \
+    inspect
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import database_exists, create_database
 from visier_api_analytic_model import PropertiesDTO
 from visier_api_data_out import GoogleProtobufAny, PropertyColumnDTO
 
+from schema_cache import SchemaCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,24 +25,46 @@ class DataStore:
         'Boolean': Boolean
     }
 
-    def __init__(self, db_url: str, echo: bool = False) -> None:
+    def __init__(self, db_url: str, echo: bool = False, schema_cache_path: Optional[str] = None) -> None:
         # Create the database if it does not exist
         if not database_exists(db_url):
             create_database(db_url)
 
         self.engine = create_engine(db_url, echo=echo)
+        # Only the tables used by the queries are reflected, when they are first accessed
         self.metadata = MetaData()
-        self.metadata.reflect(self.engine)
+        self._metadata_lock = threading.Lock()
+        self.schema_cache = None
+        if schema_cache_path:
+            self.schema_cache = SchemaCache(schema_cache_path, self.engine.url.render_as_string(hide_password=True))
         self.session_make = sessionmaker(bind=self.engine)
 
     def table_exists(self, table_name: str) -> bool:
         """Checks if a table exists in the database."""
-        return table_name in self.metadata.tables
+        return self._get_table(table_name) is not None
+
+    def _get_table(self, table_name: str) -> Optional[Table]:
+        """Returns a table's definition, reflecting it or loading it from the schema cache on first access."""
+        with self._metadata_lock:
+            if table_name in self.metadata.tables:
+                return self.metadata.tables[table_name]
+            if not inspect(self.engine).has_table(table_name):
+                if self.schema_cache is not None:
+                    self.schema_cache.remove(table_name)
+                return None
+
+            cached_table = self.schema_cache.get(table_name) if self.schema_cache is not None else None
+            if cached_table is not None:
+                return cached_table.to_metadata(self.metadata)
+            table = Table(table_name, self.metadata, autoload_with=self.engine)
+            if self.schema_cache is not None:
+                self.schema_cache.put(table)
+            return table
 
     def delete_rows(self, table_name: str, column_name: str, values: Set[str]) -> None:
         """Deletes rows from a table based on the column name and values."""
         with self.session_make() as session:
-            table = self.metadata.tables[table_name]
+            table = self._get_table(table_name)
             delete_stmt = table.delete().where(table.c[column_name].in_(values))
             result = session.execute(delete_stmt)
             session.commit()
@@ -58,14 +84,17 @@ class DataStore:
             column: Column = Column(query_column.column_name, self.VISIER_TO_SQL_TYPES[prop.primitive_data_type])
             columns.append(column)
 
-        Table(analytic_object_name, self.metadata, *columns)
-        self.metadata.create_all(self.engine)
+        with self._metadata_lock:
+            table = Table(analytic_object_name, self.metadata, *columns)
+            table.create(self.engine, checkfirst=True)
+            if self.schema_cache is not None:
+                self.schema_cache.put(table)
         logger.info(f"Created table {analytic_object_name}.")
 
     def save_to_db(self, table_name: str, protobuf_changes: List[GoogleProtobufAny], chunk_size: int = 1000) -> None:
         """Saves a list of rows to the database in chunks."""
         with self.session_make() as session:
-            table = self.metadata.tables[table_name]
+            table = self._get_table(table_name)
             insert_stmt = insert(table)
 
             # Convert the list of rows into a list of dictionaries
@@ -115,7 +115,7 @@ def create_command_handler(config: Dict[str, Any]) -> CommandHandler:
     query_api = DataQueryApi(api_client)
     change_fetcher = ChangeFetcher(model_api, query_api)
 
-    data_store = DataStore(config['DB_URL'])
+    data_store = DataStore(config['DB_URL'], schema_cache_path=config.get(SCHEMA_CACHE_FILE))
 
     return CommandHandler(dv_manager, change_fetcher, data_store)
 
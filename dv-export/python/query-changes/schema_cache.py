@@ -0,0 +1,70 @@
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import sqlalchemy
+from sqlalchemy import MetaData, Table
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaCache:
+    """
+    Stores reflected table definitions in a pickle file so they survive between runs. The file is only used for
+    the same database URL and SQLAlchemy version it was written with.
+    """
+
+    def __init__(self, cache_path: str, url: str):
+        """
+        :param cache_path: Path of the pickle file to keep table definitions in
+        :param url: Database URL, without its password, that the cached definitions belong to
+        """
+        self.cache_path = Path(cache_path)
+        self.url = url
+        self.metadata = self._read()
+
+    def get(self, tbl_name: str) -> Optional[Table]:
+        return self.metadata.tables.get(tbl_name)
+
+    def put(self, table: Table):
+        self._remove_table(table.name)
+        table.to_metadata(self.metadata)
+        self._write()
+
+    def remove(self, tbl_name: str):
+        if self._remove_table(tbl_name):
+            self._write()
+
+    def _remove_table(self, tbl_name: str) -> bool:
+        if tbl_name not in self.metadata.tables:
+            return False
+        self.metadata.remove(self.metadata.tables[tbl_name])
+        return True
+
+    def _read(self) -> MetaData:
+        if not self.cache_path.exists():
+            return MetaData()
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable schema cache file={self.cache_path}: {e}")
+            return MetaData()
+        if cached.get('url') != self.url or cached.get('sqlalchemy_version') != sqlalchemy.__version__:
+            logger.info(f"Ignoring schema cache file={self.cache_path} for a different database or SQLAlchemy version")
+            return MetaData()
+        logger.info(f"Loaded {len(cached['metadata'].tables)} table definitions from file={self.cache_path}")
+        return cached['metadata']
+
+    def _write(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'url': self.url,
+                'sqlalchemy_version': sqlalchemy.__version__,
+                'metadata': self.metadata,
+            }, f)
+        os.replace(tmp_path, self.cache_path)